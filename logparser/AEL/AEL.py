@@ -23,6 +23,11 @@ from datetime import datetime
 from collections import defaultdict
 from functools import reduce
 from tqdm import tqdm
+from ..utils import logloader
+from ..utils import logwriter
+from ..utils import masking
+from ..utils import parameters
+from ..utils import profiler
 
 
 class Event:
@@ -47,11 +52,14 @@ class LogParser:
         merge_percent=1,
         rex=[],
         keep_para=True,
+        output_format="csv",
+        single_pass=False,
     ):
         self.logformat = log_format
         self.path = indir
         self.savePath = outdir
         self.rex = rex
+        self.single_pass = single_pass
         self.minEventCount = minEventCount
         self.merge_percent = merge_percent
         self.df_log = None
@@ -59,16 +67,25 @@ class LogParser:
         self.merged_events = []
         self.bins = defaultdict(dict)
         self.keep_para = keep_para
+        self.output_format = output_format
 
     def parse(self, logname):
         start_time = datetime.now()
         print("Parsing file: " + os.path.join(self.path, logname))
         self.logname = logname
-        self.load_data()
-        self.tokenize()
-        self.categorize()
-        self.reconcile()
-        self.dump()
+        self.profiler = profiler.start("AEL")
+        with self.profiler.phase("load"):
+            self.load_data()
+        with self.profiler.phase("tokenize"):
+            self.tokenize()
+        with self.profiler.phase("categorize"):
+            self.categorize()
+        with self.profiler.phase("reconcile"):
+            self.reconcile()
+        self.profiler.count("lines", len(self.df_log))
+        self.profiler.count("templates", len(self.merged_events))
+        with self.profiler.phase("output"):
+            self.dump()
         print("Parsing done. [Time taken: {!s}]".format(datetime.now() - start_time))
 
     def tokenize(self):
@@ -160,11 +177,12 @@ class LogParser:
         self.df_log["EventTemplate"] = templateL
         self.df_log.drop("Content_", axis=1, inplace=True)
         if self.keep_para:
-            self.df_log["ParameterList"] = self.df_log.apply(
-                self.get_parameter_list, axis=1
-            )
-        self.df_log.to_csv(
-            os.path.join(self.savePath, self.logname + "_structured.csv"), index=False
+            self.df_log["ParameterList"] = parameters.extract_parameters(self.df_log)
+        logwriter.write_output(
+            self.df_log,
+            os.path.join(self.savePath, self.logname + "_structured.csv"),
+            self.output_format,
+            index=False,
         )
 
         occ_dict = dict(self.df_log["EventTemplate"].value_counts())
@@ -174,8 +192,10 @@ class LogParser:
             lambda x: hashlib.md5(x.encode("utf-8")).hexdigest()[0:8]
         )
         df_event["Occurrences"] = df_event["EventTemplate"].map(occ_dict)
-        df_event.to_csv(
+        logwriter.write_output(
+            df_event,
             os.path.join(self.savePath, self.logname + "_templates.csv"),
+            self.output_format,
             index=False,
             columns=["EventId", "EventTemplate", "Occurrences"],
         )
@@ -198,66 +218,20 @@ class LogParser:
         return True if 0 < diff * 1.0 / len(tokens1) <= self.merge_percent else False
 
     def load_data(self):
-        def preprocess(log):
-            for currentRex in self.rex:
-                log = re.sub(currentRex, "<*>", log)
-            return log
-
         headers, regex = self.generate_logformat_regex(self.logformat)
         self.df_log = self.log_to_dataframe(
             os.path.join(self.path, self.logname), regex, headers, self.logformat
         )
-        self.df_log["Content_"] = self.df_log["Content"].map(preprocess)
+        masker = masking.get_masker(self.rex, single_pass=self.single_pass)
+        self.df_log["Content_"] = self.df_log["Content"].map(masker.mask)
 
     def log_to_dataframe(self, log_file, regex, headers, logformat):
         """Function to transform log file to dataframe"""
-        log_messages = []
-        linecount = 0
-        with open(log_file, "r") as fin:
-            for line in fin.readlines():
-                try:
-                    match = regex.search(line.strip())
-                    message = [match.group(header) for header in headers]
-                    log_messages.append(message)
-                    linecount += 1
-                except Exception as e:
-                    print("Skip line: " + line)
-        logdf = pd.DataFrame(log_messages, columns=headers)
-        logdf.insert(0, "LineId", None)
-        logdf["LineId"] = [i + 1 for i in range(linecount)]
-        return logdf
+        return logloader.log_to_dataframe(log_file, regex, headers, logformat=logformat)
 
     def generate_logformat_regex(self, logformat):
-        """
-        Function to generate regular expression to split log messages
-
-        """
-        headers = []
-        splitters = re.split(r"(<[^<>]+>)", logformat)
-        regex = ""
-        for k in range(len(splitters)):
-            if k % 2 == 0:
-                splitter = re.sub(" +", "\s+", splitters[k])
-                regex += splitter
-            else:
-                header = splitters[k].strip("<").strip(">")
-                regex += "(?P<%s>.*?)" % header
-                headers.append(header)
-        regex = re.compile("^" + regex + "$")
-        return headers, regex
+        """Function to generate regular expression to split log messages"""
+        return logloader.generate_logformat_regex(logformat)
 
     def get_parameter_list(self, row):
-        template_regex = re.sub(r"<.{1,5}>", "<*>", row["EventTemplate"])
-        if "<*>" not in template_regex:
-            return []
-        template_regex = re.sub(r"([^A-Za-z0-9])", r"\\\1", template_regex)
-        template_regex = re.sub(r"\\ +", r"\\s+", template_regex)
-        template_regex = "^" + template_regex.replace("\<\*\>", "(.*?)") + "$"
-        parameter_list = re.findall(template_regex, row["Content"])
-        parameter_list = parameter_list[0] if parameter_list else ()
-        parameter_list = (
-            list(parameter_list)
-            if isinstance(parameter_list, tuple)
-            else [parameter_list]
-        )
-        return parameter_list
+        return parameters.get_parameter_list(row["EventTemplate"], row["Content"])
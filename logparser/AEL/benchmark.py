@@ -19,6 +19,7 @@ import sys
 sys.path.append("../../")
 from logparser.AEL import LogParser
 from logparser.utils import evaluator
+from logparser.utils import profiler
 from logparser.utils import const
 import os
 import pandas as pd
@@ -154,6 +155,7 @@ benchmark_settings = {
 
 def bencmark_accuracy():
     bechmark_result = []
+    phase_reports = []
     for dataset, setting in benchmark_settings.items():
         print("\n=== Evaluation on %s ===" % dataset)
         indir = os.path.join(const.corrected_input_dir, os.path.dirname(setting["log_file"]))
@@ -166,8 +168,10 @@ def bencmark_accuracy():
             minEventCount=setting["minEventCount"],
             merge_percent=setting["merge_percent"],
             rex=setting["regex"],
+            single_pass=True,
         )
         parser.parse(log_file)
+        phase_reports.append((dataset, parser.profiler.report()))
 
         F1_measure, accuracy = evaluator.evaluate(
             groundtruth=os.path.join(indir, log_file + const.corrected_file_suffix),
@@ -180,6 +184,8 @@ def bencmark_accuracy():
     df_result.set_index("Dataset", inplace=True)
     print(df_result)
     df_result.to_csv("AEL_bechmark_result.csv", float_format="%.6f")
+    if profiler.ENABLED:
+        profiler.write_reports(phase_reports, "AEL_bechmark_phases.csv")
 
 def benchmark_time():
     benchmark_result = []
@@ -18,8 +18,13 @@
 from datetime import datetime
 from collections import Counter
 import os
+import numpy as np
 import pandas as pd
 import regex as re
+from ..utils import logloader
+from ..utils import logwriter
+from ..utils import masking
+from ..utils import profiler
 
 RED = "\033[31m"
 RESET = "\033[0m"
@@ -36,51 +41,61 @@ class LogParser:
         threshold=2,
         delimeter=[],
         rex=[],
+        output_format="csv",
+        single_pass=False,
     ):
         self.logformat = log_format
         self.path = indir
         self.savePath = outdir
         self.rex = rex
+        self.single_pass = single_pass
         self.df_log = None
         self.logname = logname
         self.threshold = threshold
         self.delimeter = delimeter
+        self.output_format = output_format
 
     def parse(self, logName):
         print("Parsing file: " + os.path.join(self.path, logName))
         starttime = datetime.now()
         self.logName = logName
+        self.profiler = profiler.start("Brain")
 
-        self.load_data()
-
-        sentences = self.df_log["Content"].tolist()
-
-        group_len, tuple_vector, frequency_vector = self.get_frequecy_vector(
-            sentences, self.rex, self.delimeter, self.logname
-        )
+        with self.profiler.phase("load"):
+            self.load_data()
 
-        (
-            sorted_tuple_vector,
-            word_combinations,
-            word_combinations_reverse,
-        ) = self.tuple_generate(group_len, tuple_vector, frequency_vector)
+        with self.profiler.phase("vectorize"):
+            sentences = self.df_log["Content"].tolist()
 
-        template_set = {}
-        for key in group_len.keys():
-            Tree = tupletree(
-                sorted_tuple_vector[key],
-                word_combinations[key],
-                word_combinations_reverse[key],
-                tuple_vector[key],
-                group_len[key],
+            group_len, tuple_vector, frequency_vector = self.get_frequecy_vector(
+                sentences, self.rex, self.delimeter, self.logname
             )
-            root_set_detail_ID, root_set, root_set_detail = Tree.find_root(0)
 
-            root_set_detail_ID = Tree.up_split(root_set_detail_ID, root_set)
-            parse_result = Tree.down_split(
-                root_set_detail_ID, self.threshold, root_set_detail
-            )
-            template_set.update(output_result(parse_result))
+            (
+                sorted_tuple_vector,
+                word_combinations,
+                word_combinations_reverse,
+            ) = self.tuple_generate(group_len, tuple_vector, frequency_vector)
+
+        with self.profiler.phase("tree"):
+            template_set = {}
+            for key in group_len.keys():
+                Tree = tupletree(
+                    sorted_tuple_vector[key],
+                    word_combinations[key],
+                    word_combinations_reverse[key],
+                    tuple_vector[key],
+                    group_len[key],
+                )
+                root_set_detail_ID, root_set, root_set_detail = Tree.find_root(0)
+
+                root_set_detail_ID = Tree.up_split(root_set_detail_ID, root_set)
+                parse_result = Tree.down_split(
+                    root_set_detail_ID, self.threshold, root_set_detail
+                )
+                template_set.update(output_result(parse_result))
+        self.profiler.count("lines", len(sentences))
+        self.profiler.count("templates", len(template_set))
         endtime = datetime.now()
         print("Parsing done...")
         print("Time taken   =   " + PINK + str(endtime - starttime) + RESET)
@@ -88,7 +103,8 @@ class LogParser:
         if not os.path.exists(self.savePath):
             os.makedirs(self.savePath)
 
-        self.generateresult(template_set, sentences)
+        with self.profiler.phase("output"):
+            self.generateresult(template_set, sentences)
 
     def generateresult(self, template_set, sentences):
         template_ = len(sentences) * [0]
@@ -106,23 +122,26 @@ class LogParser:
 
         self.df_log["EventId"] = EventID
         self.df_log["EventTemplate"] = template_
-        self.df_log.to_csv(
-            os.path.join(self.savePath, self.logName + "_structured.csv"), index=False
+        logwriter.write_output(
+            self.df_log,
+            os.path.join(self.savePath, self.logName + "_structured.csv"),
+            self.output_format,
+            index=False,
         )
 
         df_event = pd.DataFrame(
             df_out, columns=["EventId", "EventTemplate", "Occurrences"]
         )
-        df_event.to_csv(
+        logwriter.write_output(
+            df_event,
             os.path.join(self.savePath, self.logName + "_templates.csv"),
+            self.output_format,
             index=False,
             columns=["EventId", "EventTemplate", "Occurrences"],
         )
 
     def preprocess(self, line):
-        for currentRex in self.rex:
-            line = re.sub(currentRex, "<*>", line)
-        return line
+        return masking.get_masker(self.rex, single_pass=self.single_pass).mask(line)
 
     def load_data(self):
         headers, regex = self.generate_logformat_regex(self.logformat)
@@ -132,37 +151,11 @@ class LogParser:
 
     def generate_logformat_regex(self, logformat):
         """Function to generate regular expression to split log messages"""
-        headers = []
-        splitters = re.split(r"(<[^<>]+>)", logformat)
-        regex = ""
-        for k in range(len(splitters)):
-            if k % 2 == 0:
-                splitter = re.sub(" +", "\\\s+", splitters[k])
-                regex += splitter
-            else:
-                header = splitters[k].strip("<").strip(">")
-                regex += "(?P<%s>.*?)" % header
-                headers.append(header)
-        regex = re.compile("^" + regex + "$")
-        return headers, regex
+        return logloader.generate_logformat_regex(logformat)
 
     def log_to_dataframe(self, log_file, regex, headers, logformat):
         """Function to transform log file to dataframe"""
-        log_messages = []
-        linecount = 0
-        with open(log_file, "r") as fin:
-            for line in fin.readlines():
-                try:
-                    match = regex.search(line.strip())
-                    message = [match.group(header) for header in headers]
-                    log_messages.append(message)
-                    linecount += 1
-                except Exception as e:
-                    pass
-        logdf = pd.DataFrame(log_messages, columns=headers)
-        logdf.insert(0, "LineId", None)
-        logdf["LineId"] = [i + 1 for i in range(linecount)]
-        return logdf
+        return logloader.log_to_dataframe(log_file, regex, headers, logformat=logformat)
 
     def tuple_generate(self, group_len, tuple_vector, frequency_vector):
         """
@@ -203,11 +196,10 @@ class LogParser:
 
         """
         group_len = {}
-        set = {}
         line_id = 0
-        for s in sentences:  # using delimiters to get split words
-            for rgex in filter:
-                s = re.sub(rgex, "<*>", s)
+        masker = masking.get_masker(filter, single_pass=self.single_pass)
+        for s in masker.mask_lines(sentences):
+            # using delimiters to get split words
             for de in delimiter:
                 s = re.sub(de, "", s)
             # if dataset == "HealthApp":
@@ -253,57 +245,49 @@ class LogParser:
             # if dataset == "Zookeeper":
             #     s = re.sub(":", ": ", s)
             #     s = re.sub("=", "= ", s)
-            new_delimiter = [":","=","[", "]", "(",")","-","|"]
+            new_delimiter = [":", "=", "[", "]", "(", ")", "-", "|", ","]
             for de in new_delimiter:
-                s = s.replace(de, de + ' ')
-            s = re.sub(",", ", ", s)
-            s = re.sub(" +", " ", s).split(" ")
+                s = s.replace(de, de + " ")
+            # Collapse runs of spaces, faster than re.sub(" +", " ", s)
+            while "  " in s:
+                s = s.replace("  ", " ")
+            s = s.split(" ")
             s.insert(0, str(line_id))
-            lenth = 0
-            for token in s:
-                set.setdefault(str(lenth), []).append(token)
-                lenth += 1
-            lena = len(s)
-            group_len.setdefault(lena, []).append(
+            group_len.setdefault(len(s), []).append(
                 s
             )  # first grouping: logs with the same length
             line_id += 1
+
+        # Intern the words of all logs, the line id in front is left out
+        words = [
+            word for key in group_len for s in group_len[key] for word in s[1:]
+        ]
+        word_ids, _ = pd.factorize(np.array(words, dtype=object))
+        del words
+        max_len = max(group_len.keys()) - 1
+        # Each word's frequency at its position, counted over all logs at once
+        positions = np.concatenate(
+            [np.tile(np.arange(key - 1), len(group_len[key])) for key in group_len]
+        )
+        _, inverse, counts = np.unique(
+            word_ids * max_len + positions, return_inverse=True, return_counts=True
+        )
+        frequencies = counts[inverse.reshape(-1)]
+
         tuple_vector = {}
         frequency_vector = {}
-        a = max(group_len.keys())  # a: the biggest length of the log in this dataset
-        i = 0
-        fre_set = {}  # saving each word's frequency
-        while i < a:
-            for word in set[str(i)]:  # counting each word's frequency
-                word = str(i) + " " + word
-                if word in fre_set.keys():  # check if the "word" in fre_set
-                    fre_set[word] = fre_set[word] + 1  # frequency of "word" + 1
-                else:
-                    fre_set[word] = 1
-            i += 1
-        for (
-            key
-        ) in group_len.keys():  # using fre_set to generate frequency vector for the log
-            for s in group_len[key]:  # in each log group with the same length
-                position = 0
-                fre = []
-                fre_common = []
-                skip_lineid = 1
-                for word_character in s:
-                    if skip_lineid == 1:
-                        skip_lineid = 0
-                        continue
-                    frequency_word = fre_set[str(position + 1) + " " + word_character]
-                    tuple = (
-                        (frequency_word),
-                        word_character,
-                        position,
-                    )  # tuple=(frequency,word_character, position)
-                    fre.append(tuple)
-                    fre_common.append((frequency_word))
-                    position += 1
-                tuple_vector.setdefault(key, []).append(fre)
-                frequency_vector.setdefault(key, []).append(fre_common)
+        offset = 0
+        for key in group_len.keys():
+            # using frequencies to generate frequency vector for the log
+            size = len(group_len[key]) * (key - 1)
+            fre_rows = frequencies[offset : offset + size].reshape(-1, key - 1).tolist()
+            offset += size
+            tuple_vector[key] = [
+                # tuple=(frequency,word_character, position)
+                list(zip(fre_common, s[1:], range(key - 1)))
+                for s, fre_common in zip(group_len[key], fre_rows)
+            ]
+            frequency_vector[key] = fre_rows
         return group_len, tuple_vector, frequency_vector
 
 
@@ -492,37 +476,13 @@ class format_log:  # this part of code is from LogPai https://github.com/LogPai
 
     def generate_logformat_regex(self, logformat):
         """Function to generate regular expression to split log messages"""
-        headers = []
-        splitters = re.split(r"(<[^<>]+>)", logformat)
-        regex = ""
-        for k in range(len(splitters)):
-            if k % 2 == 0:
-                splitter = re.sub(" +", "\\\s+", splitters[k])
-                regex += splitter
-            else:
-                header = splitters[k].strip("<").strip(">")
-                regex += "(?P<%s>.*?)" % header
-                headers.append(header)
-        regex = re.compile("^" + regex + "$")
-        return headers, regex
+        return logloader.generate_logformat_regex(logformat)
 
     def log_to_dataframe(self, log_file, regex, headers, logformat):
         """Function to transform log file to dataframe"""
-        log_messages = []
-        linecount = 0
-        with open(log_file, "r", encoding="UTF-8") as fin:
-            for line in fin.readlines():
-                try:
-                    match = regex.search(line.strip())
-                    message = [match.group(header) for header in headers]
-                    log_messages.append(message)
-                    linecount += 1
-                except Exception as e:
-                    print("[Warning] Skip line: " + line)
-        logdf = pd.DataFrame(log_messages, columns=headers)
-        logdf.insert(0, "LineId", None)
-        logdf["LineId"] = [i + 1 for i in range(linecount)]
-        return logdf
+        return logloader.log_to_dataframe(
+            log_file, regex, headers, logformat=logformat, encoding="UTF-8"
+        )
 
     def load_data(self):
         headers, regex = self.generate_logformat_regex(self.log_format)
@@ -18,6 +18,7 @@ import sys
 sys.path.append("../../")
 from logparser import Brain
 from logparser.utils import evaluator
+from logparser.utils import profiler
 from logparser.utils import const
 import pandas as pd
 import os
@@ -217,6 +218,7 @@ hdfs_benchmark_settings = {
 
 def benchmark_accuracy():
     benchmark_result = []
+    phase_reports = []
 
     for dataset, setting in benchmark_settings.items():
         print("\n=== Evaluation on %s ===" % dataset)
@@ -227,6 +229,7 @@ def benchmark_accuracy():
             indir=indir,
             outdir=output_dir,
             rex=setting['regex'],
+            single_pass=True,
             # rex = general_regex,
             delimeter=setting['delimiter'],
             threshold=setting['theshold'],
@@ -234,6 +237,7 @@ def benchmark_accuracy():
             logname=dataset,
         )
         parser.parse(log_file)
+        phase_reports.append((dataset, parser.profiler.report()))
 
         F1_measure, accuracy = evaluator.evaluate(
             groundtruth=os.path.join(indir, log_file + const.corrected_file_suffix),
@@ -248,6 +252,8 @@ def benchmark_accuracy():
     df_result.set_index("Dataset", inplace=True)
     print(df_result)
     df_result.to_csv("Brain_bechmark_result.csv", float_format="%.6f")
+    if profiler.ENABLED:
+        profiler.write_reports(phase_reports, "Brain_bechmark_phases.csv")
 
 def benchmark_time():
     benchmark_result = []
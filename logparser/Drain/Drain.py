@@ -17,26 +17,192 @@
 
 import regex as re
 import os
+import sys
+import json
+import zlib
+import pickle
+import multiprocessing as mp
+import numpy as np
 import pandas as pd
 import hashlib
+from array import array
+from collections import OrderedDict
 from datetime import datetime
+from ..utils import logloader
+from ..utils import logwriter
+from ..utils import masking
+from ..utils import parameters
+from ..utils import profiler
+
+
+SNAPSHOT_MAGIC = b"DRAINSNAPSHOT"
+SNAPSHOT_VERSION = 1
+
+
+# Type code of the arrays of line ids, unsigned 64-bit integers, so that the
+# line ids of concatenated batches of billions of lines still fit
+LOGID_TYPECODE = "Q"
+
+# Number of clusters from which a leaf indexes the tokens of their templates
+LEAF_INDEX_SIZE = 8
+
+# Id of the `<*>` wildcard in the vocabulary of integer token ids
+WILDCARD_ID = 0
 
 
 class Logcluster:
-    def __init__(self, logTemplate="", logIDL=None):
+    """A cluster of log messages, with the ids of its lines stored compactly
+
+    Attributes are slots and `logIDL` is an array of unsigned 64-bit ints, a
+    list would take a pointer and an int object per line.
+    """
+
+    __slots__ = ("logTemplate", "logIDL", "clusterId", "size")
+
+    def __init__(self, logTemplate="", logIDL=None, clusterId=None):
         self.logTemplate = logTemplate
         if logIDL is None:
-            logIDL = []
+            logIDL = array(LOGID_TYPECODE)
         self.logIDL = logIDL
+        self.clusterId = clusterId
+        self.size = 0
+
+
+class LeafTemplates:
+    """The templates of the clusters of a leaf as rows of a matrix of token ids"""
+
+    __slots__ = ("ids", "numOfPara", "size")
+
+    def __init__(self, seqLen, capacity=LEAF_INDEX_SIZE):
+        self.ids = np.zeros((capacity, seqLen), dtype=np.int32)
+        self.numOfPara = np.zeros(capacity, dtype=np.int32)
+        self.size = 0
+
+    def append(self, templateIds):
+        if self.size == len(self.ids):
+            self.ids = np.concatenate([self.ids, np.zeros_like(self.ids)])
+            self.numOfPara = np.concatenate(
+                [self.numOfPara, np.zeros_like(self.numOfPara)]
+            )
+        self.ids[self.size] = templateIds
+        self.numOfPara[self.size] = np.count_nonzero(templateIds == WILDCARD_ID)
+        self.size += 1
+
+    def match(self, seqIds):
+        """Return the position of the most similar template and its similarity
+
+        Similarity and ties are the same as in `LogParser.fastMatch`.
+        """
+        ids = self.ids[: self.size]
+        simTokens = np.count_nonzero((ids == seqIds) & (ids != WILDCARD_ID), axis=1)
+        # argmax returns the first of the templates with the highest score
+        scores = simTokens * (len(seqIds) + 1) + self.numOfPara[: self.size]
+        idx = int(scores.argmax())
+        return idx, float(simTokens[idx]) / len(seqIds)
+
+    def generalize(self, idx, seqIds):
+        """Replace the tokens of template `idx` that differ from `seqIds`
+
+        Returns
+        -------
+            changed : bool, whether the template has changed
+        """
+        templateIds = self.ids[idx]
+        diff = (templateIds != seqIds) & (templateIds != WILDCARD_ID)
+        if not diff.any():
+            return False
+        templateIds[diff] = WILDCARD_ID
+        self.numOfPara[idx] += np.count_nonzero(diff)
+        return True
 
 
 class Node:
+    """A node of the parse tree, the `childD` of a leaf is a list of clusters
+
+    Leaves with many clusters also keep `postings`, one dict per token
+    position mapping each constant token of the templates to the positions
+    of the clusters in `childD`, see `LogParser.leafMatch`. With integer
+    token ids, they keep `templateIds` instead.
+    """
+
+    __slots__ = ("childD", "depth", "digitOrtoken", "postings", "templateIds")
+
     def __init__(self, childD=None, depth=0, digitOrtoken=None):
         if childD is None:
             childD = dict()
         self.childD = childD
         self.depth = depth
         self.digitOrtoken = digitOrtoken
+        self.postings = None
+        self.templateIds = None
+
+
+class TemplateStore:
+    """Versioned templates of the clusters of a parser
+
+    Every creation or generalization of a template is an event
+    `(clusterId, oldTemplate, newTemplate, lineId)`, `oldTemplate` is None
+    for a new cluster. `clusterId` is the 1-based id of the cluster, i.e.
+    `logCluL[clusterId - 1]` of the parser. Events are kept per cluster,
+    where the template of version `v` is the template after the `v`-th
+    change, passed to `callback` and appended to `filepath` as JSON lines,
+    e.g. to update an index of the structured logs incrementally.
+
+    With `n_workers` > 1, the events of `LogParser.parse` are replayed in the
+    order of their line ids after all shards are parsed, they are not passed
+    to `callback` while the lines are parsed.
+    """
+
+    def __init__(self, filepath=None, callback=None):
+        self.filepath = filepath
+        self.callback = callback
+        self.history = {}
+        self._file = None
+
+    def update(self, clusterId, oldTemplate, newTemplate, lineId=None):
+        lineId = None if lineId is None else int(lineId)
+        self.history.setdefault(clusterId, []).append((lineId, newTemplate))
+        if self.filepath is not None:
+            if self._file is None:
+                self._file = open(self.filepath, "a", encoding="utf-8")
+            event = {
+                "cluster_id": clusterId,
+                "old_template": oldTemplate,
+                "new_template": newTemplate,
+                "line_id": lineId,
+            }
+            self._file.write(json.dumps(event) + "\n")
+        if self.callback is not None:
+            self.callback(clusterId, oldTemplate, newTemplate, lineId)
+
+    def version(self, clusterId):
+        """Return the current version of a cluster, 0 for a new cluster"""
+        return len(self.history[clusterId]) - 1
+
+    def template(self, clusterId, version=None):
+        """Return the current template of a cluster, or that of `version`"""
+        versions = self.history[clusterId]
+        return versions[-1 if version is None else version][1]
+
+    def events(self):
+        """Return all events in the order of their line ids"""
+        events = []
+        for clusterId, versions in self.history.items():
+            oldTemplate = None
+            for lineId, template in versions:
+                events.append((clusterId, oldTemplate, template, lineId))
+                oldTemplate = template
+        events.sort(key=lambda event: event[3])
+        return events
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
 
 
 class LogParser:
@@ -50,6 +216,12 @@ class LogParser:
         maxChild=100,
         rex=[],
         keep_para=True,
+        output_format="csv",
+        n_workers=1,
+        cache_size=100000,
+        token_ids=False,
+        template_store=None,
+        single_pass=False,
     ):
         """
         Attributes
@@ -61,6 +233,18 @@ class LogParser:
             maxChild : max number of children of an internal node
             logName : the name of the input file containing raw log messages
             savePath : the output path stores the file containing structured logs
+            output_format : format of the result files, `csv`, `parquet` or `arrow`
+            n_workers : number of processes of `parse`, lines are sharded by
+                their number of tokens, see `parse_sharded`
+            cache_size : max number of token sequences whose cluster is cached,
+                0 to always search the tree, see `cache_info`
+            token_ids : compare log messages with the templates of leaves with
+                many clusters as arrays of integer token ids, see `leafMatch`
+            template_store : TemplateStore, optional, receives the creation and
+                generalization of every template, after the parse with
+                `n_workers` > 1
+            single_pass : mask all expressions of `rex` in a single scan, only
+                if the result is the same, see `masking`
         """
         self.path = indir
         self.depth = depth - 2
@@ -71,17 +255,69 @@ class LogParser:
         self.df_log = None
         self.log_format = log_format
         self.rex = rex
+        self.single_pass = single_pass
+        self.masker = masking.get_masker(rex, single_pass=single_pass)
         self.keep_para = keep_para
+        self.output_format = output_format
+        self.n_workers = n_workers
+        self.cache_size = cache_size
+        self.token_ids = token_ids
+        self.template_store = template_store
+        self.reset()
+
+    def reset(self):
+        """Forget all clusters, e.g. before parsing a new file"""
+        self.rootNode = Node()
+        self.logCluL = []
+        self.lineCount = 0
+        self.pendingL = []
+        self.flushCount = 0
+        self.matchCache = OrderedDict()
+        self.lengthVersions = {}
+        self.cacheHits = 0
+        self.cacheLookups = 0
+        self.vocab = {"<*>": WILDCARD_ID}
+        self.vocabTokens = ["<*>"]
+
+    def encodeTokens(self, seq):
+        """Map tokens to integer ids, unseen tokens are added to the vocabulary"""
+        vocab = self.vocab
+        ids = np.empty(len(seq), dtype=np.int32)
+        for pos, token in enumerate(seq):
+            tokenId = vocab.get(token)
+            if tokenId is None:
+                tokenId = vocab[token] = len(self.vocabTokens)
+                self.vocabTokens.append(sys.intern(token))
+            ids[pos] = tokenId
+        return ids
+
+    def decodeTokens(self, ids):
+        return [self.vocabTokens[tokenId] for tokenId in ids.tolist()]
+
+    def cache_info(self):
+        """Return the hits, lookups, hit rate and size of the match cache"""
+        lookups = self.cacheLookups
+        return {
+            "hits": self.cacheHits,
+            "lookups": lookups,
+            "hit_rate": self.cacheHits / lookups if lookups else 0.0,
+            "size": len(self.matchCache),
+        }
 
     def hasNumbers(self, s):
         return any(char.isdigit() for char in s)
 
     def treeSearch(self, rn, seq):
-        retLogClust = None
+        leaf = self.leafSearch(rn, seq)
+        if leaf is None:
+            return None
+        return self.leafMatch(leaf, seq)[1]
 
+    def leafSearch(self, rn, seq):
+        """Return the node whose clusters a log message is compared with"""
         seqLen = len(seq)
         if seqLen not in rn.childD:
-            return retLogClust
+            return None
 
         parentn = rn.childD[seqLen]
 
@@ -95,14 +331,89 @@ class LogParser:
             elif "<*>" in parentn.childD:
                 parentn = parentn.childD["<*>"]
             else:
-                return retLogClust
+                return None
             currentDepth += 1
 
-        logClustL = parentn.childD
+        return parentn
 
-        retLogClust = self.fastMatch(logClustL, seq)
+    def leafMatch(self, leaf, seq, seqIds=None):
+        """Find the most similar cluster of a leaf, the same as `fastMatch`
 
-        return retLogClust
+        With `postings`, the constant tokens a cluster shares with `seq` are
+        counted from the postings of the tokens of `seq`, instead of comparing
+        `seq` with every template of the leaf. With `templateIds`, `seq` is
+        compared with all templates at once as arrays of token ids.
+
+        Returns
+        -------
+            idx : int, position of the cluster in the leaf, None without index
+            logClust : Logcluster, None if no cluster is similar enough
+        """
+        if leaf.templateIds is not None:
+            if seqIds is None:
+                seqIds = self.encodeTokens(seq)
+            idx, maxSim = leaf.templateIds.match(seqIds)
+            if maxSim < self.st:
+                return None, None
+            return idx, leaf.childD[idx]
+        if leaf.postings is None:
+            return None, self.fastMatch(leaf.childD, seq)
+
+        simCounts = {}
+        for token, posting in zip(seq, leaf.postings):
+            for idx in posting.get(token, ()):
+                simCounts[idx] = simCounts.get(idx, 0) + 1
+        if not simCounts:
+            return None, None
+        maxSimTokens = max(simCounts.values())
+        if float(maxSimTokens) / len(seq) < self.st:
+            return None, None
+
+        # Ties go to the cluster with more parameters, then to the first one
+        logClustL = leaf.childD
+        maxIdx = None
+        maxNumOfPara = -1
+        for idx, simTokens in simCounts.items():
+            if simTokens != maxSimTokens:
+                continue
+            numOfPara = logClustL[idx].logTemplate.count("<*>")
+            if numOfPara > maxNumOfPara or (
+                numOfPara == maxNumOfPara and idx < maxIdx
+            ):
+                maxIdx = idx
+                maxNumOfPara = numOfPara
+        return maxIdx, logClustL[maxIdx]
+
+    def indexLeaf(self, leaf):
+        """Build the index of a leaf, once it has `LEAF_INDEX_SIZE` clusters"""
+        logClustL = leaf.childD
+        if len(logClustL) < LEAF_INDEX_SIZE:
+            return
+        if self.token_ids:
+            leaf.templateIds = LeafTemplates(len(logClustL[0].logTemplate))
+            for logClust in logClustL:
+                leaf.templateIds.append(self.encodeTokens(logClust.logTemplate))
+            return
+        if self.st <= 0:
+            return
+        leaf.postings = [{} for _ in logClustL[0].logTemplate]
+        for idx, logClust in enumerate(logClustL):
+            self.indexTokens(leaf, idx, logClust.logTemplate)
+
+    def indexTree(self, node):
+        """Rebuild the index of all leaves under `node`"""
+        if isinstance(node.childD, list):
+            node.postings = None
+            node.templateIds = None
+            self.indexLeaf(node)
+        else:
+            for child in node.childD.values():
+                self.indexTree(child)
+
+    def indexTokens(self, leaf, idx, template):
+        for token, posting in zip(template, leaf.postings):
+            if token != "<*>":
+                posting.setdefault(token, []).append(idx)
 
     def addSeqToPrefixTree(self, rn, logClust):
         seqLen = len(logClust.logTemplate)
@@ -122,6 +433,16 @@ class LogParser:
                     parentn.childD = [logClust]
                 else:
                     parentn.childD.append(logClust)
+                if parentn.templateIds is not None:
+                    parentn.templateIds.append(
+                        self.encodeTokens(logClust.logTemplate)
+                    )
+                elif parentn.postings is not None:
+                    self.indexTokens(
+                        parentn, len(parentn.childD) - 1, logClust.logTemplate
+                    )
+                elif len(parentn.childD) == LEAF_INDEX_SIZE:
+                    self.indexLeaf(parentn)
                 break
 
             # If token not matched in this layer of existing tree.
@@ -196,21 +517,346 @@ class LogParser:
 
         return retLogClust
 
+    # seq2 is template, its tokens are kept to share the interned strings
     def getTemplate(self, seq1, seq2):
         assert len(seq1) == len(seq2)
         retVal = []
 
-        i = 0
-        for word in seq1:
-            if word == seq2[i]:
-                retVal.append(word)
+        for word, templateWord in zip(seq1, seq2):
+            if word == templateWord:
+                retVal.append(templateWord)
             else:
                 retVal.append("<*>")
 
-            i += 1
-
         return retVal
 
+    def addSeq(self, logmessageL, logID=None):
+        """Add the tokens of a log message to the tree and return its cluster
+
+        Repeated token sequences are looked up in an LRU cache first. A cached
+        cluster is only used while no cluster of the same length was created
+        or generalized since it was cached, the tree search would then return
+        the same cluster, so the cache never changes the results.
+        """
+        if self.cache_size:
+            seqLen = len(logmessageL)
+            version = self.lengthVersions.get(seqLen, 0)
+            key = tuple(logmessageL)
+            self.cacheLookups += 1
+            cached = self.matchCache.get(key)
+            if cached is not None and cached[1] == version:
+                self.cacheHits += 1
+                self.matchCache.move_to_end(key)
+                cached[0].size += 1
+                return cached[0]
+
+        leaf = self.leafSearch(self.rootNode, logmessageL)
+        seqIds = None
+        if leaf is None:
+            matchIdx, matchCluster = None, None
+        else:
+            if leaf.templateIds is not None:
+                seqIds = self.encodeTokens(logmessageL)
+            matchIdx, matchCluster = self.leafMatch(leaf, logmessageL, seqIds)
+        oldTemplateL = None if matchCluster is None else matchCluster.logTemplate
+        changed = True
+
+        # Match no existing log cluster
+        if matchCluster is None:
+            matchCluster = Logcluster(
+                logTemplate=[sys.intern(token) for token in logmessageL],
+                clusterId=len(self.logCluL) + 1,
+            )
+            self.logCluL.append(matchCluster)
+            self.addSeqToPrefixTree(self.rootNode, matchCluster)
+
+        # Add the new log message to the existing cluster
+        elif seqIds is not None:
+            changed = leaf.templateIds.generalize(matchIdx, seqIds)
+            if changed:
+                matchCluster.logTemplate = self.decodeTokens(
+                    leaf.templateIds.ids[matchIdx]
+                )
+        else:
+            newTemplate = self.getTemplate(logmessageL, matchCluster.logTemplate)
+            if newTemplate != matchCluster.logTemplate:
+                if leaf.postings is not None:
+                    # Tokens replaced by wildcards are no longer matched
+                    for token, newToken, posting in zip(
+                        matchCluster.logTemplate, newTemplate, leaf.postings
+                    ):
+                        if token != newToken:
+                            posting[token].remove(matchIdx)
+                matchCluster.logTemplate = newTemplate
+            else:
+                changed = False
+
+        if changed and self.template_store is not None:
+            self.template_store.update(
+                matchCluster.clusterId,
+                None if oldTemplateL is None else " ".join(oldTemplateL),
+                " ".join(matchCluster.logTemplate),
+                logID,
+            )
+
+        if self.cache_size:
+            if changed:
+                self.lengthVersions[seqLen] = version + 1
+            else:
+                self.matchCache[key] = (matchCluster, version)
+                self.matchCache.move_to_end(key)
+                if len(self.matchCache) > self.cache_size:
+                    self.matchCache.popitem(last=False)
+
+        matchCluster.size += 1
+        return matchCluster
+
+    def add_log_message(self, content, logID=None):
+        """Parse one log message online
+
+        The prefix tree and the clusters are kept between calls, so log
+        messages can be parsed one by one as they arrive. Parsed lines are
+        buffered until the next `flush`. Unlike `parse`, line ids are not
+        kept in `Logcluster.logIDL`, only counted in `Logcluster.size`.
+
+        Arguments
+        ---------
+            content : str, the `Content` field of a log line
+            logID : int, optional, defaults to the number of lines added so far
+
+        Returns
+        -------
+            clusterId : int, 1-based id of the cluster, `logCluL[clusterId - 1]`
+            template : str, the current template of the cluster
+        """
+        self.lineCount += 1
+        if logID is None:
+            logID = self.lineCount
+        logClust = self.addSeq(self.preprocess(content).strip().split(), logID)
+        self.pendingL.append((logID, content, logClust))
+        return logClust.clusterId, " ".join(logClust.logTemplate)
+
+    def add_log_messages(self, contents):
+        """Parse a batch of log messages online, see `add_log_message`"""
+        return [self.add_log_message(content) for content in contents]
+
+    def parse_stream(self, lines, logName="stream.log", flush_every=100000):
+        """Parse raw log lines online, e.g. lines read from a log collector
+
+        Lines are split with the log format and lines that do not match it
+        are skipped. Results are flushed every `flush_every` lines and when
+        `lines` is exhausted.
+
+        Arguments
+        ---------
+            lines : iterable of str, e.g. `logloader.iter_log_lines(log_file)`
+            logName : str, name of the result files, see `flush`
+            flush_every : int, number of lines between two flushes, 0 to only
+                flush at the end
+
+        Returns
+        -------
+            results : iterator of (clusterId, template), one per parsed line
+        """
+        self.logName = logName
+        log_format = logloader.compile_logformat(self.log_format)
+        content_idx = log_format.headers.index("Content")
+        for line in lines:
+            record = log_format.split(line.strip())
+            if record is None:
+                continue
+            yield self.add_log_message(record[content_idx])
+            if flush_every and len(self.pendingL) >= flush_every:
+                self.flush()
+        if self.pendingL or not self.flushCount:
+            self.flush()
+
+    def flush(self, logName=None):
+        """Write the log messages added since the last flush
+
+        The structured lines are appended to `<logName>_structured.csv`, or
+        written to numbered parts, e.g. `<logName>_structured.00001.parquet`,
+        for columnar output formats. Each line gets the template of its
+        cluster at the time of the flush. `<logName>_templates.csv` is
+        rewritten with all current templates.
+
+        Returns
+        -------
+            df_flushed : pandas.DataFrame, the structured lines written
+        """
+        logName = logName or self.logName or "stream.log"
+        if not os.path.exists(self.savePath):
+            os.makedirs(self.savePath)
+
+        templates = {}
+        for logClust in self.logCluL:
+            template_str = " ".join(logClust.logTemplate)
+            templates[template_str] = templates.get(template_str, 0) + logClust.size
+        template_ids = {
+            template_str: hashlib.md5(template_str.encode("utf-8")).hexdigest()[0:8]
+            for template_str in templates
+        }
+
+        rows = []
+        for logID, content, logClust in self.pendingL:
+            template_str = " ".join(logClust.logTemplate)
+            rows.append([logID, content, template_ids[template_str], template_str])
+        self.pendingL = []
+        df_flushed = pd.DataFrame(
+            rows, columns=["LineId", "Content", "EventId", "EventTemplate"]
+        )
+        if self.keep_para:
+            df_flushed["ParameterList"] = parameters.extract_parameters(df_flushed)
+
+        filepath = os.path.join(self.savePath, logName + "_structured.csv")
+        if self.output_format == "csv":
+            logwriter.write_output(
+                df_flushed,
+                filepath,
+                index=False,
+                mode="a" if self.flushCount else "w",
+                header=not self.flushCount,
+            )
+        else:
+            filepath = os.path.join(
+                self.savePath,
+                "{}_structured.{:05d}.csv".format(logName, self.flushCount),
+            )
+            logwriter.write_output(
+                df_flushed, filepath, self.output_format, index=False
+            )
+        self.flushCount += 1
+
+        df_event = pd.DataFrame(
+            [
+                [template_ids[template_str], template_str, occurrence]
+                for template_str, occurrence in templates.items()
+            ],
+            columns=["EventId", "EventTemplate", "Occurrences"],
+        )
+        logwriter.write_output(
+            df_event,
+            os.path.join(self.savePath, logName + "_templates.csv"),
+            self.output_format,
+            index=False,
+        )
+        return df_flushed
+
+    def save_snapshot(self, filepath):
+        """Save the parse tree, the clusters and the configuration to a file
+
+        Tokens are stored once in a vocabulary, clusters and tree nodes refer
+        to them by index, and the whole state is compressed. Lines added but
+        not flushed yet are saved as well, so a parser restored with
+        `load_snapshot` continues exactly where this one stopped. The line
+        ids of `Logcluster.logIDL` are not saved, only the cluster sizes.
+        """
+        vocab = {}
+        clusterIdx = {}
+
+        def encode_tokens(tokens):
+            return [vocab.setdefault(token, len(vocab)) for token in tokens]
+
+        def encode_node(node):
+            if isinstance(node.childD, list):
+                return [clusterIdx[id(logClust)] for logClust in node.childD]
+            keys = list(node.childD)
+            children = [encode_node(node.childD[key]) for key in keys]
+            return (encode_tokens(keys), children)
+
+        clusters = []
+        for idx, logClust in enumerate(self.logCluL):
+            clusterIdx[id(logClust)] = idx
+            clusters.append((encode_tokens(logClust.logTemplate), logClust.size))
+        state = {
+            "config": {
+                "log_format": self.log_format,
+                "indir": self.path,
+                "outdir": self.savePath,
+                "depth": self.depth + 2,
+                "st": self.st,
+                "maxChild": self.maxChild,
+                "rex": self.rex,
+                "keep_para": self.keep_para,
+                "output_format": self.output_format,
+                "n_workers": self.n_workers,
+                "cache_size": self.cache_size,
+                "token_ids": self.token_ids,
+                "single_pass": self.single_pass,
+            },
+            "clusters": clusters,
+            "tree": encode_node(self.rootNode),
+            "vocab": list(vocab),
+            "pending": [
+                (logID, content, clusterIdx[id(logClust)])
+                for logID, content, logClust in self.pendingL
+            ],
+            "logName": self.logName,
+            "lineCount": self.lineCount,
+            "flushCount": self.flushCount,
+        }
+        data = zlib.compress(pickle.dumps(state, pickle.HIGHEST_PROTOCOL))
+        with open(filepath, "wb") as fw:
+            fw.write(SNAPSHOT_MAGIC + bytes([SNAPSHOT_VERSION]) + data)
+
+    def load_snapshot(self, filepath):
+        """Restore the state and the configuration saved by `save_snapshot`
+
+        Snapshots are pickled, only load snapshots from trusted sources. The
+        `template_store` of the parser, which is not saved, is kept.
+        """
+        with open(filepath, "rb") as fr:
+            data = fr.read()
+        header = SNAPSHOT_MAGIC + bytes([SNAPSHOT_VERSION])
+        if not data.startswith(header):
+            raise ValueError("Not a Drain snapshot: {}".format(filepath))
+        state = pickle.loads(zlib.decompress(data[len(header) :]))
+
+        config = state["config"]
+        self.__init__(template_store=getattr(self, "template_store", None), **config)
+        vocab = [
+            sys.intern(token) if isinstance(token, str) else token
+            for token in state["vocab"]
+        ]
+        for idx, (template, size) in enumerate(state["clusters"]):
+            logClust = Logcluster(
+                logTemplate=[vocab[token] for token in template], clusterId=idx + 1
+            )
+            logClust.size = size
+            self.logCluL.append(logClust)
+
+        def decode_node(encoded, depth, digitOrtoken):
+            node = Node(depth=depth, digitOrtoken=digitOrtoken)
+            if isinstance(encoded, list):
+                node.childD = [self.logCluL[idx] for idx in encoded]
+                self.indexLeaf(node)
+            else:
+                for key, child in zip(*encoded):
+                    key = vocab[key]
+                    node.childD[key] = decode_node(child, depth + 1, key)
+            return node
+
+        self.rootNode = decode_node(state["tree"], 0, None)
+        self.pendingL = [
+            (logID, content, self.logCluL[idx])
+            for logID, content, idx in state["pending"]
+        ]
+        self.logName = state["logName"]
+        self.lineCount = state["lineCount"]
+        self.flushCount = state["flushCount"]
+        return self
+
+    @classmethod
+    def from_snapshot(cls, filepath, template_store=None):
+        """Create a parser from a snapshot, see `load_snapshot`
+
+        The template store is not saved in snapshots, pass it again to keep
+        following the changes of the templates.
+        """
+        parser = cls.__new__(cls)
+        parser.template_store = template_store
+        return parser.load_snapshot(filepath)
+
     def outputResult(self, logClustL):
         log_templates = [0] * self.df_log.shape[0]
         log_templateids = [0] * self.df_log.shape[0]
@@ -231,11 +877,12 @@ class LogParser:
         self.df_log["EventId"] = log_templateids
         self.df_log["EventTemplate"] = log_templates
         if self.keep_para:
-            self.df_log["ParameterList"] = self.df_log.apply(
-                self.get_parameter_list, axis=1
-            )
-        self.df_log.to_csv(
-            os.path.join(self.savePath, self.logName + "_structured.csv"), index=False
+            self.df_log["ParameterList"] = parameters.extract_parameters(self.df_log)
+        logwriter.write_output(
+            self.df_log,
+            os.path.join(self.savePath, self.logName + "_structured.csv"),
+            self.output_format,
+            index=False,
         )
 
         occ_dict = dict(self.df_log["EventTemplate"].value_counts())
@@ -245,8 +892,10 @@ class LogParser:
             lambda x: hashlib.md5(x.encode("utf-8")).hexdigest()[0:8]
         )
         df_event["Occurrences"] = df_event["EventTemplate"].map(occ_dict)
-        df_event.to_csv(
+        logwriter.write_output(
+            df_event,
             os.path.join(self.savePath, self.logName + "_templates.csv"),
+            self.output_format,
             index=False,
             columns=["EventId", "EventTemplate", "Occurrences"],
         )
@@ -274,29 +923,37 @@ class LogParser:
         print("Parsing file: " + os.path.join(self.path, logName))
         start_time = datetime.now()
         self.logName = logName
-        rootNode = Node()
-        logCluL = []
+        self.reset()
+        self.profiler = profiler.start("Drain")
 
-        self.load_data()
+        with self.profiler.phase("load"):
+            self.load_data()
 
-        count = 0
-        for idx, line in self.df_log.iterrows():
-            logID = line["LineId"]
-            logmessageL = self.preprocess(line["Content"]).strip().split()
-            matchCluster = self.treeSearch(rootNode, logmessageL)
-
-            # Match no existing log cluster
-            if matchCluster is None:
-                newCluster = Logcluster(logTemplate=logmessageL, logIDL=[logID])
-                logCluL.append(newCluster)
-                self.addSeqToPrefixTree(rootNode, newCluster)
-
-            # Add the new log message to the existing cluster
+        with self.profiler.phase("parse"):
+            if self.n_workers > 1:
+                self.parse_sharded()
             else:
-                newTemplate = self.getTemplate(logmessageL, matchCluster.logTemplate)
-                matchCluster.logIDL.append(logID)
-                if " ".join(newTemplate) != " ".join(matchCluster.logTemplate):
-                    matchCluster.logTemplate = newTemplate
+                self.parse_serial()
+        self.profiler.count("lines", len(self.df_log))
+        self.profiler.count("templates", len(self.logCluL))
+        self.profiler.count("cache_hits", self.cacheHits)
+        self.profiler.count("cache_lookups", self.cacheLookups)
+
+        if self.template_store is not None:
+            self.template_store.flush()
+
+        with self.profiler.phase("output"):
+            if not os.path.exists(self.savePath):
+                os.makedirs(self.savePath)
+            self.outputResult(self.logCluL)
+
+        print("Parsing done. [Time taken: {!s}]".format(datetime.now() - start_time))
+
+    def parse_serial(self):
+        count = 0
+        for logID, content in zip(self.df_log["LineId"], self.df_log["Content"]):
+            logmessageL = self.preprocess(content).strip().split()
+            self.addSeq(logmessageL, logID).logIDL.append(logID)
 
             count += 1
             if count % 1000 == 0 or count == len(self.df_log):
@@ -305,13 +962,108 @@ class LogParser:
                         count * 100.0 / len(self.df_log)
                     )
                 )
+        self.lineCount = count
 
-        if not os.path.exists(self.savePath):
-            os.makedirs(self.savePath)
+    def parse_sharded(self):
+        """Parse the loaded log lines with `n_workers` processes
 
-        self.outputResult(logCluL)
+        Clusters never span messages of different lengths, since the first
+        level of the tree is the number of tokens. Workers first mask and
+        tokenize chunks of lines, then each length is routed to one shard
+        and every shard builds its own tree in a worker. The shards are
+        merged into `rootNode` and `logCluL`, with the clusters in the order
+        the single-process parse creates them, so the results are identical.
+        One length is never split, so most lines may go to a single shard.
+        """
+        logIDs = self.df_log["LineId"].tolist()
+        contents = self.df_log["Content"].tolist()
+        chunk_size = max(1, -(-len(contents) // (self.n_workers * 4)))
+        chunks = [
+            contents[idx : idx + chunk_size]
+            for idx in range(0, len(contents), chunk_size)
+        ]
 
-        print("Parsing done. [Time taken: {!s}]".format(datetime.now() - start_time))
+        pool = mp.Pool(processes=self.n_workers)
+        try:
+            masked = pool.starmap(
+                mask_messages,
+                [(self.rex, chunk, self.single_pass) for chunk in chunks],
+            )
+
+            # Balance the shards by number of lines, the longest lengths first
+            lengthCounts = {}
+            for messages, lengths in masked:
+                for seqLen in lengths:
+                    lengthCounts[seqLen] = lengthCounts.get(seqLen, 0) + 1
+            shardLoads = [0] * self.n_workers
+            shardOf = {}
+            for seqLen in sorted(lengthCounts, key=lambda k: -lengthCounts[k]):
+                shard = shardLoads.index(min(shardLoads))
+                shardOf[seqLen] = shard
+                shardLoads[shard] += lengthCounts[seqLen]
+
+            shards = [([], []) for _ in range(self.n_workers)]
+            logIDs = iter(logIDs)
+            for messages, lengths in masked:
+                for message, seqLen, logID in zip(messages, lengths, logIDs):
+                    shardLogIDs, shardMessages = shards[shardOf[seqLen]]
+                    shardLogIDs.append(logID)
+                    shardMessages.append(message)
+            del masked
+
+            config = {
+                "log_format": self.log_format,
+                "depth": self.depth + 2,
+                "st": self.st,
+                "maxChild": self.maxChild,
+                "cache_size": self.cache_size,
+                "token_ids": self.token_ids,
+                # Workers record the changes of their shard in their own store
+                "template_store": (
+                    None if self.template_store is None else TemplateStore()
+                ),
+            }
+            print("Parse %d length shards in parallel" % len(lengthCounts))
+            results = pool.starmap(
+                parse_shard,
+                [(config,) + shard for shard in shards if len(shard[0])],
+            )
+        finally:
+            pool.close()
+            pool.join()
+
+        # Clusters are created by the first line they match
+        self.logCluL = sorted(
+            (logClust for _, shardCluL, _, _ in results for logClust in shardCluL),
+            key=lambda logClust: logClust.logIDL[0],
+        )
+        shardRoots = {}
+        for rootNode, _, (hits, lookups), _ in results:
+            shardRoots.update(rootNode.childD)
+            self.cacheHits += hits
+            self.cacheLookups += lookups
+        for clusterId, logClust in enumerate(self.logCluL, 1):
+            logClust.clusterId = clusterId
+            seqLen = len(logClust.logTemplate)
+            if seqLen not in self.rootNode.childD:
+                self.rootNode.childD[seqLen] = shardRoots[seqLen]
+        if self.token_ids:
+            # Token ids of the shards come from the vocabularies of the workers
+            self.indexTree(self.rootNode)
+        if self.template_store is not None:
+            # Replay the template changes of all shards in the order of lines
+            events = []
+            for _, shardCluL, _, shardStore in results:
+                for clusterId, oldTemplate, template, lineId in shardStore.events():
+                    logClust = shardCluL[clusterId - 1]
+                    events.append((logClust, oldTemplate, template, lineId))
+            events.sort(key=lambda event: event[3])
+            for logClust, oldTemplate, template, lineId in events:
+                self.template_store.update(
+                    logClust.clusterId, oldTemplate, template, lineId
+                )
+        self.lineCount = len(contents)
+        print("Processed 100.0% of log lines.")
 
     def load_data(self):
         headers, regex = self.generate_logformat_regex(self.log_format)
@@ -320,58 +1072,53 @@ class LogParser:
         )
 
     def preprocess(self, line):
-        for currentRex in self.rex:
-            line = re.sub(currentRex, "<*>", line)
-        return line
+        return self.masker.mask(line)
 
     def log_to_dataframe(self, log_file, regex, headers, logformat):
         """Function to transform log file to dataframe"""
-        log_messages = []
-        linecount = 0
-        with open(log_file, "r") as fin:
-            for line in fin.readlines():
-                try:
-                    match = regex.search(line.strip())
-                    message = [match.group(header) for header in headers]
-                    log_messages.append(message)
-                    linecount += 1
-                except Exception as e:
-                    pass
-                #     print("[Warning] Skip line: " + line)
-        logdf = pd.DataFrame(log_messages, columns=headers)
-        logdf.insert(0, "LineId", None)
-        logdf["LineId"] = [i + 1 for i in range(linecount)]
-        print("Total lines: ", len(logdf))
-        return logdf
+        return logloader.log_to_dataframe(log_file, regex, headers, logformat=logformat)
 
     def generate_logformat_regex(self, logformat):
         """Function to generate regular expression to split log messages"""
-        headers = []
-        splitters = re.split(r"(<[^<>]+>)", logformat)
-        regex = ""
-        for k in range(len(splitters)):
-            if k % 2 == 0:
-                splitter = re.sub(" +", "\\\s+", splitters[k])
-                regex += splitter
-            else:
-                header = splitters[k].strip("<").strip(">")
-                regex += "(?P<%s>.*?)" % header
-                headers.append(header)
-        regex = re.compile("^" + regex + "$")
-        return headers, regex
+        return logloader.generate_logformat_regex(logformat)
 
     def get_parameter_list(self, row):
-        template_regex = re.sub(r"<.{1,5}>", "<*>", row["EventTemplate"])
-        if "<*>" not in template_regex:
-            return []
-        template_regex = re.sub(r"([^A-Za-z0-9])", r"\\\1", template_regex)
-        template_regex = re.sub(r"\\ +", r"\\s+", template_regex)
-        template_regex = "^" + template_regex.replace("\<\*\>", "(.*?)") + "$"
-        parameter_list = re.findall(template_regex, row["Content"])
-        parameter_list = parameter_list[0] if parameter_list else ()
-        parameter_list = (
-            list(parameter_list)
-            if isinstance(parameter_list, tuple)
-            else [parameter_list]
-        )
-        return parameter_list
+        return parameters.get_parameter_list(row["EventTemplate"], row["Content"])
+
+
+def mask_messages(rex, contents, single_pass=False):
+    """Mask and tokenize log contents the same way as `LogParser.preprocess`
+
+    Returns
+    -------
+        messages : list of str, masked contents with normalized spaces
+        lengths : list of int, number of tokens of each message
+    """
+    messages = []
+    lengths = []
+    for line in masking.get_masker(rex, single_pass=single_pass).mask_lines(contents):
+        tokens = line.split()
+        messages.append(" ".join(tokens))
+        lengths.append(len(tokens))
+    return messages, lengths
+
+
+def parse_shard(config, logIDs, messages):
+    """Parse the masked messages of one length shard in a worker
+
+    Returns
+    -------
+        rootNode, logCluL : the tree and the clusters, pickled together so
+            that the leaves still refer to the clusters in the parent
+        cache : (hits, lookups) of the match cache
+        template_store : TemplateStore, the template changes of the shard
+    """
+    parser = LogParser(**config)
+    for logID, message in zip(logIDs, messages):
+        parser.addSeq(message.split(), logID).logIDL.append(logID)
+    return (
+        parser.rootNode,
+        parser.logCluL,
+        (parser.cacheHits, parser.cacheLookups),
+        parser.template_store,
+    )
@@ -21,6 +21,11 @@ import os
 import regex as re
 import pandas as pd
 import hashlib
+from ..utils import logloader
+from ..utils import logwriter
+from ..utils import masking
+from ..utils import parameters
+from ..utils import profiler
 
 
 class Partition:
@@ -95,6 +100,7 @@ class LogParser:
         upperBound=0.9,
         rex=[],
         keep_para=True,
+        output_format="csv",
     ):
         self.para = Para(
             log_format=log_format,
@@ -112,6 +118,7 @@ class LogParser:
         self.eventsL = []
         self.output = []
         self.keep_para = keep_para
+        self.output_format = output_format
 
         if not os.path.exists(self.para.savePath):
             os.makedirs(self.para.savePath)
@@ -124,12 +131,20 @@ class LogParser:
         print("Parsing file: " + os.path.join(self.para.path, logname))
         self.logname = logname
         starttime = datetime.now()
-        self.Step1()
-        self.Step2()
-        self.Step3()
-        self.Step4()
-        self.getOutput()
-        self.WriteEventToFile()
+        self.profiler = profiler.start("IPLoM")
+        with self.profiler.phase("step1"):
+            self.Step1()
+        with self.profiler.phase("step2"):
+            self.Step2()
+        with self.profiler.phase("step3"):
+            self.Step3()
+        with self.profiler.phase("step4"):
+            self.Step4()
+        self.profiler.count("lines", len(self.df_log))
+        self.profiler.count("templates", len(self.eventsL))
+        with self.profiler.phase("output"):
+            self.getOutput()
+            self.WriteEventToFile()
         print("Parsing done. [Time taken: {!s}]".format(datetime.now() - starttime))
 
     def Step1(self):
@@ -141,15 +156,14 @@ class LogParser:
             self.para.logformat,
         )
         lineCount = 1
+        masker = masking.get_masker(self.para.rex, "", single_pass=False)
         for idx, line in self.df_log.iterrows():
             line = line["Content"]
             # If line is empty, skip
             if line.strip() == "":
                 continue
 
-            if self.para.rex:
-                for currentRex in self.para.rex:
-                    line = re.sub(currentRex, "", line)
+            line = masker.mask(line)
 
             wordSeq = list(filter(lambda x: x != "", re.split(r"[\s=:,]", line)))
             if not wordSeq:
@@ -494,8 +508,10 @@ class LogParser:
         eventDf = pd.DataFrame(
             eventList, columns=["EventId", "EventTemplate", "Occurrences"]
         )
-        eventDf.to_csv(
+        logwriter.write_output(
+            eventDf,
             os.path.join(self.para.savePath, self.logname + "_templates.csv"),
+            self.output_format,
             index=False,
         )
 
@@ -505,11 +521,11 @@ class LogParser:
             eventID_template[logL[1]] for logL in self.output
         ]
         if self.keep_para:
-            self.df_log["ParameterList"] = self.df_log.apply(
-                self.get_parameter_list, axis=1
-            )
-        self.df_log.to_csv(
+            self.df_log["ParameterList"] = parameters.extract_parameters(self.df_log)
+        logwriter.write_output(
+            self.df_log,
             os.path.join(self.para.savePath, self.logname + "_structured.csv"),
+            self.output_format,
             index=False,
         )
 
@@ -690,50 +706,11 @@ class LogParser:
 
     def log_to_dataframe(self, log_file, regex, headers, logformat):
         """Function to transform log file to dataframe"""
-        log_messages = []
-        linecount = 0
-        with open(log_file, "r") as fin:
-            for line in fin.readlines():
-                try:
-                    match = regex.search(line.strip())
-                    message = [match.group(header) for header in headers]
-                    log_messages.append(message)
-                    linecount += 1
-                except Exception as e:
-                    print("Skip line: " + line)
-        logdf = pd.DataFrame(log_messages, columns=headers)
-        logdf.insert(0, "LineId", None)
-        logdf["LineId"] = [i + 1 for i in range(linecount)]
-        return logdf
+        return logloader.log_to_dataframe(log_file, regex, headers, logformat=logformat)
 
     def generate_logformat_regex(self, logformat):
         """Function to generate regular expression to split log messages"""
-        headers = []
-        splitters = re.split(r"(<[^<>]+>)", logformat)
-        regex = ""
-        for k in range(len(splitters)):
-            if k % 2 == 0:
-                splitter = re.sub(" +", "\s+", splitters[k])
-                regex += splitter
-            else:
-                header = splitters[k].strip("<").strip(">")
-                regex += "(?P<%s>.*?)" % header
-                headers.append(header)
-        regex = re.compile("^" + regex + "$")
-        return headers, regex
+        return logloader.generate_logformat_regex(logformat)
 
     def get_parameter_list(self, row):
-        template_regex = re.sub(r"<.{1,5}>", "<*>", row["EventTemplate"])
-        if "<*>" not in template_regex:
-            return []
-        template_regex = re.sub(r"([^A-Za-z0-9])", r"\\\1", template_regex)
-        template_regex = re.sub(r"\\ +", r"\\s+", template_regex)
-        template_regex = "^" + template_regex.replace("\<\*\>", "(.*?)") + "$"
-        parameter_list = re.findall(template_regex, row["Content"])
-        parameter_list = parameter_list[0] if parameter_list else ()
-        parameter_list = (
-            list(parameter_list)
-            if isinstance(parameter_list, tuple)
-            else [parameter_list]
-        )
-        return parameter_list
+        return parameters.get_parameter_list(row["EventTemplate"], row["Content"])
@@ -18,6 +18,7 @@ import sys
 sys.path.append("../../")
 from logparser.IPLoM import LogParser
 from logparser.utils import evaluator
+from logparser.utils import profiler
 from logparser.utils.const import input_dir, general_regex, input_file_suffix, corrected_input_dir, corrected_file_suffix
 import os
 import pandas as pd
@@ -154,6 +155,7 @@ benchmark_settings = {
 
 def benchmark_accuracy():
     bechmark_result = []
+    phase_reports = []
     for dataset, setting in benchmark_settings.items():
         print("\n=== Evaluation on %s ===" % dataset)
         indir = os.path.join(corrected_input_dir, os.path.dirname(setting["log_file"]))
@@ -168,6 +170,7 @@ def benchmark_accuracy():
             rex=setting["regex"],
         )
         parser.parse(log_file)
+        phase_reports.append((dataset, parser.profiler.report()))
 
         F1_measure, accuracy = evaluator.evaluate(
             groundtruth=os.path.join(indir, log_file + corrected_file_suffix),
@@ -180,6 +183,8 @@ def benchmark_accuracy():
     df_result.set_index("Dataset", inplace=True)
     print(df_result)
     df_result.to_csv("IPLoM_bechmark_result.csv", float_format="%.6f")
+    if profiler.ENABLED:
+        profiler.write_reports(phase_reports, "IPLoM_bechmark_phases.csv")
     
 
 def benchmark_time():
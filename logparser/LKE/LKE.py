@@ -22,6 +22,9 @@ import sys
 import pandas as pd
 import hashlib
 import numpy as np
+from ..utils import logloader
+from ..utils import logwriter
+from ..utils import profiler
 
 SAVEDISTANCE = True
 
@@ -44,6 +47,7 @@ class LogParser:
         split_threshold=4,
         rex=[],
         seed=1,
+        output_format="csv",
     ):
         self.para = Para(
             path=indir,
@@ -68,6 +72,7 @@ class LogParser:
         self.dedup_lines = []
         self.templates = []
         self.seed = seed  # Random seed for kmeans clustering
+        self.output_format = output_format
 
     def preprocess(self, x):
         for currentRex in self.para.rex:
@@ -245,8 +250,10 @@ class LogParser:
         self.df_log["EventId"] = self.df_log["EventTemplate"].map(
             lambda x: hashlib.md5(x.encode("utf-8")).hexdigest()[0:8]
         )
-        self.df_log.to_csv(
+        logwriter.write_output(
+            self.df_log,
             os.path.join(self.para.savePath, self.logname + "_structured.csv"),
+            self.output_format,
             index=False,
         )
 
@@ -257,8 +264,10 @@ class LogParser:
             lambda x: hashlib.md5(x.encode("utf-8")).hexdigest()[0:8]
         )
         df_event["Occurrences"] = df_event["EventTemplate"].map(occ_dict)
-        df_event.to_csv(
+        logwriter.write_output(
+            df_event,
             os.path.join(self.para.savePath, self.logname + "_templates.csv"),
+            self.output_format,
             index=False,
             columns=["EventId", "EventTemplate", "Occurrences"],
         )
@@ -269,49 +278,29 @@ class LogParser:
 
     def log_to_dataframe(self, log_file, regex, headers, logformat):
         """Function to transform log file to dataframe"""
-        log_messages = []
-        linecount = 0
-        with open(log_file, "r") as fin:
-            for line in fin.readlines():
-                try:
-                    match = regex.search(line.strip())
-                    message = [match.group(header) for header in headers]
-                    log_messages.append(message)
-                    linecount += 1
-                except Exception as e:
-                    print("Skip line: " + line)
-        logdf = pd.DataFrame(log_messages, columns=headers)
-        logdf.insert(0, "LineId", None)
-        logdf["LineId"] = [i + 1 for i in range(linecount)]
-        return logdf
+        return logloader.log_to_dataframe(log_file, regex, headers, logformat=logformat)
 
     def generate_logformat_regex(self, logformat):
-        """
-        Function to generate regular expression to split log messages
-        """
-        headers = []
-        splitters = re.split(r"(<[^<>]+>)", logformat)
-        regex = ""
-        for k in range(len(splitters)):
-            if k % 2 == 0:
-                splitter = re.sub(" +", "\s+", splitters[k])
-                regex += splitter
-            else:
-                header = splitters[k].strip("<").strip(">")
-                regex += "(?P<%s>.*?)" % header
-                headers.append(header)
-        regex = re.compile("^" + regex + "$")
-        return headers, regex
+        """Function to generate regular expression to split log messages"""
+        return logloader.generate_logformat_regex(logformat)
 
     def parse(self, logname):
         starttime = datetime.now()
         print("Parsing file: " + os.path.join(self.para.path, logname))
         self.logname = logname
-        self.paraErasing()
-        self.clustering()
-        self.splitting()
-        self.extracting()
-        self.writeResultToFile()
+        self.profiler = profiler.start("LKE")
+        with self.profiler.phase("preprocess"):
+            self.paraErasing()
+        with self.profiler.phase("clustering"):
+            self.clustering()
+        with self.profiler.phase("splitting"):
+            self.splitting()
+        with self.profiler.phase("extracting"):
+            self.extracting()
+        self.profiler.count("lines", len(self.df_log))
+        self.profiler.count("templates", len(self.templates))
+        with self.profiler.phase("output"):
+            self.writeResultToFile()
         print("Parsing done. [Time taken: {!s}]".format(datetime.now() - starttime))
 
 
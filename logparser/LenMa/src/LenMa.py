@@ -16,11 +16,14 @@
 
 from .lenma_template import LenmaTemplateManager
 import pandas as pd
-import regex as re
 import os
 import hashlib
 from collections import defaultdict
 from datetime import datetime
+from ...utils import logloader
+from ...utils import logwriter
+from ...utils import masking
+from ...utils import profiler
 
 
 class LogParser(object):
@@ -32,11 +35,15 @@ class LogParser(object):
         threshold=0.9,
         predefined_templates=None,
         rex=[],
+        output_format="csv",
+        single_pass=False,
     ):
         self.path = indir
         self.savePath = outdir
         self.logformat = log_format
         self.rex = rex
+        self.single_pass = single_pass
+        self.output_format = output_format
         self.wordseqs = []
         self.df_log = pd.DataFrame()
         self.wordpos_count = defaultdict(int)
@@ -49,18 +56,22 @@ class LogParser(object):
         print("Parsing file: " + os.path.join(self.path, logname))
         self.logname = logname
         starttime = datetime.now()
-        headers, regex = self.generate_logformat_regex(self.logformat)
-        self.df_log = self.log_to_dataframe(
-            os.path.join(self.path, self.logname), regex, headers, self.logformat
-        )
-        for idx, line in self.df_log.iterrows():
-            line = line["Content"]
-            if self.rex:
-                for currentRex in self.rex:
-                    line = re.sub(currentRex, "<*>", line)
-            words = line.split()
-            self.templ_mgr.infer_template(words, idx)
-        self.dump_results()
+        self.profiler = profiler.start("LenMa")
+        with self.profiler.phase("load"):
+            headers, regex = self.generate_logformat_regex(self.logformat)
+            self.df_log = self.log_to_dataframe(
+                os.path.join(self.path, self.logname), regex, headers, self.logformat
+            )
+        with self.profiler.phase("parse"):
+            masker = masking.get_masker(self.rex, single_pass=self.single_pass)
+            for idx, line in self.df_log.iterrows():
+                line = masker.mask(line["Content"])
+                words = line.split()
+                self.templ_mgr.infer_template(words, idx)
+        self.profiler.count("lines", len(self.df_log))
+        self.profiler.count("templates", len(self.templ_mgr.templates))
+        with self.profiler.phase("output"):
+            self.dump_results()
         print("Parsing done. [Time taken: {!s}]".format(datetime.now() - starttime))
 
     def dump_results(self):
@@ -82,47 +93,26 @@ class LogParser(object):
         self.df_log["EventId"] = template_ids
         self.df_log["EventTemplate"] = templates
 
-        pd.DataFrame(
+        df_event = pd.DataFrame(
             df_event, columns=["EventId", "EventTemplate", "Occurrences"]
-        ).to_csv(
-            os.path.join(self.savePath, self.logname + "_templates.csv"), index=False
         )
-        self.df_log.to_csv(
-            os.path.join(self.savePath, self.logname + "_structured.csv"), index=False
+        logwriter.write_output(
+            df_event,
+            os.path.join(self.savePath, self.logname + "_templates.csv"),
+            self.output_format,
+            index=False,
+        )
+        logwriter.write_output(
+            self.df_log,
+            os.path.join(self.savePath, self.logname + "_structured.csv"),
+            self.output_format,
+            index=False,
         )
 
     def log_to_dataframe(self, log_file, regex, headers, logformat):
         """Function to transform log file to dataframe"""
-        log_messages = []
-        linecount = 0
-        with open(log_file, "r") as fin:
-            for line in fin.readlines():
-                try:
-                    match = regex.search(line.strip())
-                    message = [match.group(header) for header in headers]
-                    log_messages.append(message)
-                    linecount += 1
-                except Exception as e:
-                    print("Skip line: " + line)
-        logdf = pd.DataFrame(log_messages, columns=headers)
-        logdf.insert(0, "LineId", None)
-        logdf["LineId"] = [i + 1 for i in range(linecount)]
-        return logdf
+        return logloader.log_to_dataframe(log_file, regex, headers, logformat=logformat)
 
     def generate_logformat_regex(self, logformat):
-        """
-        Function to generate regular expression to split log messages
-        """
-        headers = []
-        splitters = re.split(r"(<[^<>]+>)", logformat)
-        regex = ""
-        for k in range(len(splitters)):
-            if k % 2 == 0:
-                splitter = re.sub(" +", "\s+", splitters[k])
-                regex += splitter
-            else:
-                header = splitters[k].strip("<").strip(">")
-                regex += "(?P<%s>.*?)" % header
-                headers.append(header)
-        regex = re.compile("^" + regex + "$")
-        return headers, regex
+        """Function to generate regular expression to split log messages"""
+        return logloader.generate_logformat_regex(logformat)
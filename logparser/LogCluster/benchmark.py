@@ -18,6 +18,7 @@ import sys
 sys.path.append("../../")
 from logparser.LogCluster import LogParser
 from logparser.utils import evaluator
+from logparser.utils import profiler
 from logparser.utils.const import input_dir, input_file_suffix, corrected_input_dir, corrected_file_suffix
 import os
 import pandas as pd
@@ -135,6 +136,7 @@ benchmark_settings = {
 
 def benchmark_accuracy():
     bechmark_result = []
+    phase_reports = []
     for dataset, setting in benchmark_settings.items():
         print("\n=== Evaluation on %s ===" % dataset)
         indir = os.path.join(corrected_input_dir, os.path.dirname(setting["log_file"]))
@@ -148,6 +150,7 @@ def benchmark_accuracy():
             rsupport=setting["rsupport"],
         )
         parser.parse(log_file)
+        phase_reports.append((dataset, parser.profiler.report()))
 
         F1_measure, accuracy = evaluator.evaluate(
             groundtruth=os.path.join(indir, log_file + corrected_file_suffix),
@@ -160,6 +163,8 @@ def benchmark_accuracy():
     df_result.set_index("Dataset", inplace=True)
     print(df_result)
     df_result.to_csv("LogCluster_bechmark_result.csv", float_format="%.6f")
+    if profiler.ENABLED:
+        profiler.write_reports(phase_reports, "LogCluster_bechmark_phases.csv")
 
 def benchmark_time():
     benchmark_result = []
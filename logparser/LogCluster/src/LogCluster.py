@@ -20,6 +20,9 @@ import regex as re
 import hashlib
 from datetime import datetime
 import subprocess
+from ...utils import logloader
+from ...utils import logwriter
+from ...utils import profiler
 
 
 class LogParser:
@@ -50,6 +53,7 @@ class LogParser:
         writedump=None,
         readwords=None,
         writewords=None,
+        output_format="csv",
     ):
         """
         Arguments:
@@ -132,27 +136,36 @@ class LogParser:
                 self.perl_command += " -{} {}".format(self.paranames[idx], para)
         self.perl_command += " > logcluster_output.txt"
         self.rex = rex
+        self.output_format = output_format
 
     def parse(self, filename):
         start_time = datetime.now()
         filepath = os.path.join(self.path, filename)
         print("Parsing file: " + filepath)
         self.filename = filename
-        headers, regex = self.generate_logformat_regex(self.log_format)
-        self.df_log = self.log_to_dataframe(filepath, regex, headers, self.log_format)
-        with open("logcluster_input.log", "w") as fw:
-            for line in self.df_log["Content"]:
-                if self.rex:
-                    for currentRex in self.rex:
-                        line = re.sub(currentRex, "", line)
-                fw.write(line + "\n")
+        self.profiler = profiler.start("LogCluster")
+        with self.profiler.phase("load"):
+            headers, regex = self.generate_logformat_regex(self.log_format)
+            self.df_log = self.log_to_dataframe(
+                filepath, regex, headers, self.log_format
+            )
+        with self.profiler.phase("preprocess"):
+            with open("logcluster_input.log", "w") as fw:
+                for line in self.df_log["Content"]:
+                    if self.rex:
+                        for currentRex in self.rex:
+                            line = re.sub(currentRex, "", line)
+                    fw.write(line + "\n")
         try:
             print("Run LogCluster command...\n>> {}".format(self.perl_command))
-            subprocess.check_call(self.perl_command, shell=True)
+            with self.profiler.phase("cluster"):
+                subprocess.check_call(self.perl_command, shell=True)
         except:
             print("LogCluster run failed! Please check perl installed.\n")
             raise
-        self.wirteResultToFile()
+        with self.profiler.phase("output"):
+            self.wirteResultToFile()
+        self.profiler.count("lines", len(self.df_log))
         os.remove("logcluster_input.log")
         os.remove("logcluster_output.txt")
         print("Parsing done. [Time taken: {!s}]".format(datetime.now() - start_time))
@@ -194,6 +207,7 @@ class LogParser:
 
         self.df_log["EventId"] = EventId
         self.df_log["EventTemplate"] = EventTemplate
+        self.profiler.count("templates", self.df_log["EventTemplate"].nunique())
 
         occ_dict = dict(self.df_log["EventTemplate"].value_counts())
         df_event = pd.DataFrame()
@@ -202,40 +216,17 @@ class LogParser:
         df_event["EventId"] = df_event["EventTemplate"].map(
             lambda x: hashlib.md5(x.encode("utf-8")).hexdigest()[0:8]
         )
-        self.df_log.to_csv(
-            os.path.join(self.savepath, self.filename + "_structured.csv"), index=False
+        logwriter.write_output(
+            self.df_log,
+            os.path.join(self.savepath, self.filename + "_structured.csv"),
+            self.output_format,
+            index=False,
         )
 
     def log_to_dataframe(self, log_file, regex, headers, logformat):
         """Function to transform log file to dataframe"""
-        log_messages = []
-        linecount = 0
-        with open(log_file, "r") as fin:
-            for line in fin.readlines():
-                try:
-                    match = regex.search(line.strip())
-                    message = [match.group(header) for header in headers]
-                    log_messages.append(message)
-                    linecount += 1
-                except Exception as e:
-                    print("Skip line: " + line)
-        logdf = pd.DataFrame(log_messages, columns=headers)
-        logdf.insert(0, "LineId", None)
-        logdf["LineId"] = [i + 1 for i in range(linecount)]
-        return logdf
+        return logloader.log_to_dataframe(log_file, regex, headers, logformat=logformat)
 
     def generate_logformat_regex(self, logformat):
         """Function to generate regular expression to split log messages"""
-        headers = []
-        splitters = re.split(r"(<[^<>]+>)", logformat)
-        regex = ""
-        for k in range(len(splitters)):
-            if k % 2 == 0:
-                splitter = re.sub(" +", "\s+", splitters[k])
-                regex += splitter
-            else:
-                header = splitters[k].strip("<").strip(">")
-                regex += "(?P<%s>.*?)" % header
-                headers.append(header)
-        regex = re.compile("^" + regex + "$")
-        return headers, regex
+        return logloader.generate_logformat_regex(logformat)
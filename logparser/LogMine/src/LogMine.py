@@ -23,6 +23,9 @@ import pandas as pd
 from datetime import datetime
 from collections import defaultdict
 from tqdm import tqdm
+from ...utils import logloader
+from ...utils import logwriter
+from ...utils import profiler
 
 
 class partition:
@@ -45,11 +48,13 @@ class LogParser:
         k2=1,
         alpha=100,
         rex=[],
+        output_format="csv",
     ):
         self.logformat = log_format
         self.path = indir
         self.savePath = outdir
         self.rex = rex
+        self.output_format = output_format
         self.levels = levels
         self.max_dist = max_dist
         self.k = k
@@ -64,24 +69,32 @@ class LogParser:
         print("Parsing file: " + os.path.join(self.path, logname))
         self.logname = logname
         starttime = datetime.now()
-        self.load_data()
-        for lev in range(self.levels):
-            if lev == 0:
-                # Clustering
-                self.level_clusters[0] = self.get_clusters(self.df_log["Content_"], lev)
-            else:
-                # Clustering
-                patterns = [c.patterns[0] for c in self.level_clusters[lev - 1]]
-                self.max_dist *= self.alpha
-                clusters = self.get_clusters(
-                    patterns, lev, self.level_clusters[lev - 1]
-                )
-
-                # Generate patterns
-                for cluster in tqdm(clusters, total=len(clusters)):
-                    cluster.patterns = [self.sequential_merge(cluster.patterns)]
-                self.level_clusters[lev] = clusters
-        self.dump()
+        self.profiler = profiler.start("LogMine")
+        with self.profiler.phase("load"):
+            self.load_data()
+        with self.profiler.phase("clustering"):
+            for lev in range(self.levels):
+                if lev == 0:
+                    # Clustering
+                    self.level_clusters[0] = self.get_clusters(
+                        self.df_log["Content_"], lev
+                    )
+                else:
+                    # Clustering
+                    patterns = [c.patterns[0] for c in self.level_clusters[lev - 1]]
+                    self.max_dist *= self.alpha
+                    clusters = self.get_clusters(
+                        patterns, lev, self.level_clusters[lev - 1]
+                    )
+
+                    # Generate patterns
+                    for cluster in tqdm(clusters, total=len(clusters)):
+                        cluster.patterns = [self.sequential_merge(cluster.patterns)]
+                    self.level_clusters[lev] = clusters
+        self.profiler.count("lines", len(self.df_log))
+        self.profiler.count("templates", len(self.level_clusters[self.levels - 1]))
+        with self.profiler.phase("output"):
+            self.dump()
         print("Parsing done. [Time taken: {!s}]".format(datetime.now() - starttime))
 
     def dump(self):
@@ -114,11 +127,16 @@ class LogParser:
         )
 
         self.df_log.drop("Content_", inplace=True, axis=1)
-        self.df_log.to_csv(
-            os.path.join(self.savePath, self.logname + "_structured.csv"), index=False
+        logwriter.write_output(
+            self.df_log,
+            os.path.join(self.savePath, self.logname + "_structured.csv"),
+            self.output_format,
+            index=False,
         )
-        df_event.to_csv(
+        logwriter.write_output(
+            df_event,
             os.path.join(self.savePath, self.logname + "_templates.csv"),
+            self.output_format,
             index=False,
             columns=["EventId", "EventTemplate", "Occurrences"],
         )
@@ -212,36 +230,8 @@ class LogParser:
 
     def log_to_dataframe(self, log_file, regex, headers, logformat):
         """Function to transform log file to dataframe"""
-        log_messages = []
-        linecount = 0
-        with open(log_file, "r") as fin:
-            for line in fin.readlines():
-                try:
-                    match = regex.search(line.strip())
-                    message = [match.group(header) for header in headers]
-                    log_messages.append(message)
-                    linecount += 1
-                except Exception as e:
-                    print("Skip line: " + line)
-        logdf = pd.DataFrame(log_messages, columns=headers)
-        logdf.insert(0, "LineId", None)
-        logdf["LineId"] = [i + 1 for i in range(linecount)]
-        return logdf
+        return logloader.log_to_dataframe(log_file, regex, headers, logformat=logformat)
 
     def generate_logformat_regex(self, logformat):
-        """
-        Function to generate regular expression to split log messages
-        """
-        headers = []
-        splitters = re.split(r"(<[^<>]+>)", logformat)
-        regex = ""
-        for k in range(len(splitters)):
-            if k % 2 == 0:
-                splitter = re.sub(" +", "\s+", splitters[k])
-                regex += splitter
-            else:
-                header = splitters[k].strip("<").strip(">")
-                regex += "(?P<%s>.*?)" % header
-                headers.append(header)
-        regex = re.compile("^" + regex + "$")
-        return headers, regex
+        """Function to generate regular expression to split log messages"""
+        return logloader.generate_logformat_regex(logformat)
@@ -22,6 +22,9 @@ import regex as re
 import os
 import pandas as pd
 import hashlib
+from ..utils import logloader
+from ..utils import logwriter
+from ..utils import profiler
 
 
 class Para:
@@ -34,7 +37,16 @@ class Para:
 
 
 class LogParser:
-    def __init__(self, indir, outdir, groupNum, log_format, rex=[], seed=0):
+    def __init__(
+        self,
+        indir,
+        outdir,
+        groupNum,
+        log_format,
+        rex=[],
+        seed=0,
+        output_format="csv",
+    ):
         self.para = Para(
             path=indir,
             rex=rex,
@@ -50,6 +62,7 @@ class LogParser:
         self.termPairLogNumLD = []
         self.logIndexPerGroup = []
         self.seed = seed
+        self.output_format = output_format
 
     def loadLog(self):
         """Load datasets and use regular expression to split it and remove some columns"""
@@ -246,8 +259,10 @@ class LogParser:
 
         self.df_log["EventId"] = EventId
         self.df_log["EventTemplate"] = EventTemplate
-        self.df_log.to_csv(
+        logwriter.write_output(
+            self.df_log,
             os.path.join(self.para.savePath, self.logname + "_structured.csv"),
+            self.output_format,
             index=False,
         )
 
@@ -259,58 +274,40 @@ class LogParser:
         )
         df_event["Occurrences"] = df_event["EventTemplate"].map(occ_dict)
 
-        df_event.to_csv(
+        logwriter.write_output(
+            df_event,
             os.path.join(self.para.savePath, self.logname + "_templates.csv"),
+            self.output_format,
             index=False,
             columns=["EventId", "EventTemplate", "Occurrences"],
         )
 
     def log_to_dataframe(self, log_file, regex, headers, logformat):
         """Function to transform log file to dataframe"""
-        log_messages = []
-        linecount = 0
-        with open(log_file, "r") as fin:
-            for line in fin.readlines():
-                try:
-                    match = regex.search(line.strip())
-                    message = [match.group(header) for header in headers]
-                    log_messages.append(message)
-                    linecount += 1
-                except Exception as e:
-                    print("Skip line: " + line)
-        logdf = pd.DataFrame(log_messages, columns=headers)
-        logdf.insert(0, "LineId", None)
-        logdf["LineId"] = [i + 1 for i in range(linecount)]
-        return logdf
+        return logloader.log_to_dataframe(log_file, regex, headers, logformat=logformat)
 
     def generate_logformat_regex(self, logformat):
-        """
-        Function to generate regular expression to split log messages
-        """
-        headers = []
-        splitters = re.split(r"(<[^<>]+>)", logformat)
-        regex = ""
-        for k in range(len(splitters)):
-            if k % 2 == 0:
-                splitter = re.sub(" +", "\s+", splitters[k])
-                regex += splitter
-            else:
-                header = splitters[k].strip("<").strip(">")
-                regex += "(?P<%s>.*?)" % header
-                headers.append(header)
-        regex = re.compile("^" + regex + "$")
-        return headers, regex
+        """Function to generate regular expression to split log messages"""
+        return logloader.generate_logformat_regex(logformat)
 
     def parse(self, logname):
         print("Parsing file: " + os.path.join(self.para.path, logname))
         start_time = datetime.now()
         self.logname = logname
-        self.loadLog()
-        self.termpairGene()
-        self.LogMessParti()
-        self.signatConstr()
+        self.profiler = profiler.start("LogSig")
+        with self.profiler.phase("load"):
+            self.loadLog()
+        with self.profiler.phase("termpair"):
+            self.termpairGene()
+        with self.profiler.phase("partition"):
+            self.LogMessParti()
+        with self.profiler.phase("signature"):
+            self.signatConstr()
         print("signature constructed.")
-        self.writeResultToFile()
+        self.profiler.count("lines", len(self.df_log))
+        self.profiler.count("templates", len(self.signature))
+        with self.profiler.phase("output"):
+            self.writeResultToFile()
         print("Parsing done. [Time taken: {!s}]".format(datetime.now() - start_time))
 
 
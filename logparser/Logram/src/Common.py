@@ -4,6 +4,7 @@ https://github.com/BlueLionLogram/Logram/tree/master/Evaluation
 """
 
 import regex as re
+from ...utils import masking
 
 MyRegex = [
     r"blk_(|-)[0-9]+",  # block id
@@ -13,10 +14,11 @@ MyRegex = [
 
 
 def preprocess(logLine, specialRegex):
-    line = logLine
-    for regex in specialRegex:
-        line = re.sub(regex, "<*>", " " + logLine)
-    return line
+    # Every expression is applied to the original line, so only the last one
+    # takes effect, as in the original Logram code
+    if not specialRegex:
+        return logLine
+    return masking.get_masker(specialRegex[-1:]).mask(" " + logLine)
 
 
 def tokenSpliter(logLine, regex, specialRegex):
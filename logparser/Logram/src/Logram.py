@@ -18,6 +18,7 @@ copies or substantial portions of the Software.
 import os
 from .DictionarySetUp import dictionaryBuilder
 from .MatchToken import tokenMatch
+from ...utils import profiler
 
 
 class LogParser:
@@ -29,6 +30,7 @@ class LogParser:
         doubleThreshold=15,
         triThreshold=10,
         rex=[],
+        output_format="csv",
     ):
         self.indir = indir
         self.outdir = outdir
@@ -36,24 +38,30 @@ class LogParser:
         self.triThreshold = triThreshold
         self.log_format = log_format
         self.rex = rex
+        self.output_format = output_format
 
     def parse(self, log_file_basename):
         log_file = os.path.join(self.indir, log_file_basename)
         print("Parsing file: " + log_file)
-        (
-            doubleDictionaryList,
-            triDictionaryList,
-            allTokenList,
-            allMessageList,
-        ) = dictionaryBuilder(self.log_format, log_file, self.rex)
-        tokenMatch(
-            allTokenList,
-            doubleDictionaryList,
-            triDictionaryList,
-            self.doubleThreshold,
-            self.triThreshold,
-            self.outdir,
-            log_file_basename,
-            allMessageList,
-        )
+        self.profiler = profiler.start("Logram")
+        with self.profiler.phase("dictionary"):
+            (
+                doubleDictionaryList,
+                triDictionaryList,
+                allTokenList,
+                allMessageList,
+            ) = dictionaryBuilder(self.log_format, log_file, self.rex)
+        with self.profiler.phase("match"):
+            tokenMatch(
+                allTokenList,
+                doubleDictionaryList,
+                triDictionaryList,
+                self.doubleThreshold,
+                self.triThreshold,
+                self.outdir,
+                log_file_basename,
+                allMessageList,
+                self.output_format,
+            )
+        self.profiler.count("lines", len(allMessageList))
         print("Parsing done.")
@@ -8,6 +8,7 @@ import regex as re
 import pandas as pd
 import os
 from .Common import regexGenerator
+from ...utils import logwriter
 
 
 def tripleMatch(tokens, triDictionaryList, triThreshold):
@@ -80,6 +81,7 @@ def tokenMatch(
     outdir,
     log_file_basename,
     allMessageList,
+    output_format="csv",
 ):
     if not os.path.exists(outdir):
         os.makedirs(outdir)
@@ -113,8 +115,10 @@ def tokenMatch(
         )
 
     template_df = pd.DataFrame(template_lines, columns=["EventId", "EventTemplate"])
-    template_df.to_csv(template_file, index=False)
+    logwriter.write_output(template_df, template_file, output_format, index=False)
     structured_log_df = pd.DataFrame(
         structured_log_lines, columns=["LineId", "Content", "EventId", "EventTemplate"]
     )
-    structured_log_df.to_csv(structured_log_file, index=False)
+    logwriter.write_output(
+        structured_log_df, structured_log_file, output_format, index=False
+    )
@@ -18,6 +18,8 @@ import os
 import pandas as pd
 import hashlib
 from ...utils import logloader
+from ...utils import logwriter
+from ...utils import profiler
 from .main.org.core.utility.Chromosome_Generator import ChromosomeGenerator
 from .main.org.core.utility.log_message_adaptation import adapt_log_message
 from .main.org.core.utility.match_utility import match
@@ -26,12 +28,15 @@ from datetime import datetime
 
 
 class LogParser:
-    def __init__(self, indir, outdir, log_format, rex=[], n_workers=1):
+    def __init__(
+        self, indir, outdir, log_format, rex=[], n_workers=1, output_format="csv"
+    ):
         self.input_dir = indir
         self.output_dir = outdir
         self.log_format = log_format
         self.rex = rex
         self.n_workers = n_workers
+        self.output_format = output_format
         self.templates = []
 
         if not os.path.isdir(self.output_dir):
@@ -45,32 +50,48 @@ class LogParser:
 
     def parse(self, log_file):
         starttime = datetime.now()
-        loader = logloader.LogLoader(self.log_format, self.n_workers)
-        log_dataframe = loader.load_to_dataframe(os.path.join(self.input_dir, log_file))
-        chrom_gen = ChromosomeGenerator(log_dataframe, self.rex)
-        pareto = main(chrom_gen)
-        for _, solution in pareto.items():
-            for _, templates in solution.templates.items():
-                self.templates.extend(templates)
-            break
-        log_dataframe["EventTemplate"] = log_dataframe["Content"].map(self.match_df)
-        log_dataframe["EventId"] = log_dataframe["EventTemplate"].map(
-            lambda x: hashlib.md5(x.encode("utf-8")).hexdigest()[0:8]
-        )
+        self.profiler = profiler.start("MoLFI")
+        with self.profiler.phase("load"):
+            loader = logloader.LogLoader(self.log_format, self.n_workers)
+            log_dataframe = loader.load_to_dataframe(
+                os.path.join(self.input_dir, log_file)
+            )
+        with self.profiler.phase("search"):
+            chrom_gen = ChromosomeGenerator(log_dataframe, self.rex)
+            pareto = main(chrom_gen)
+            for _, solution in pareto.items():
+                for _, templates in solution.templates.items():
+                    self.templates.extend(templates)
+                break
+        with self.profiler.phase("match"):
+            log_dataframe["EventTemplate"] = log_dataframe["Content"].map(
+                self.match_df
+            )
+        self.profiler.count("lines", len(log_dataframe))
+        self.profiler.count("templates", len(self.templates))
+        with self.profiler.phase("output"):
+            log_dataframe["EventId"] = log_dataframe["EventTemplate"].map(
+                lambda x: hashlib.md5(x.encode("utf-8")).hexdigest()[0:8]
+            )
 
-        occ_dict = dict(log_dataframe["EventTemplate"].value_counts())
-        df_event = pd.DataFrame()
-        df_event["EventTemplate"] = log_dataframe["EventTemplate"].unique()
-        df_event["Occurrences"] = df_event["EventTemplate"].map(occ_dict)
-        df_event["EventId"] = df_event["EventTemplate"].map(
-            lambda x: hashlib.md5(x.encode("utf-8")).hexdigest()[0:8]
-        )
-        df_event.to_csv(
-            os.path.join(self.output_dir, log_file + "_templates.csv"),
-            index=False,
-            columns=["EventId", "EventTemplate", "Occurrences"],
-        )
-        log_dataframe.to_csv(
-            os.path.join(self.output_dir, log_file + "_structured.csv"), index=False
-        )
+            occ_dict = dict(log_dataframe["EventTemplate"].value_counts())
+            df_event = pd.DataFrame()
+            df_event["EventTemplate"] = log_dataframe["EventTemplate"].unique()
+            df_event["Occurrences"] = df_event["EventTemplate"].map(occ_dict)
+            df_event["EventId"] = df_event["EventTemplate"].map(
+                lambda x: hashlib.md5(x.encode("utf-8")).hexdigest()[0:8]
+            )
+            logwriter.write_output(
+                df_event,
+                os.path.join(self.output_dir, log_file + "_templates.csv"),
+                self.output_format,
+                index=False,
+                columns=["EventId", "EventTemplate", "Occurrences"],
+            )
+            logwriter.write_output(
+                log_dataframe,
+                os.path.join(self.output_dir, log_file + "_structured.csv"),
+                self.output_format,
+                index=False,
+            )
         print("Parsing done. [Time taken: {!s}]".format(datetime.now() - starttime))
@@ -52,6 +52,9 @@ from torch.utils.data import (
 )
 from torchvision import transforms, utils
 from datetime import datetime
+from ..utils import logloader
+from ..utils import logwriter
+from ..utils import profiler
 
 
 DEVICE = 'cuda' if torch.cuda.is_available() else 'cpu'
@@ -448,7 +451,9 @@ class SimpleLossCompute:
 
 
 class LogParser:
-    def __init__(self, indir, outdir, filters, k, log_format):
+    def __init__(
+        self, indir, outdir, filters, k, log_format, output_format="csv"
+    ):
         self.path = indir
         self.logName = None
         self.savePath = outdir
@@ -456,6 +461,7 @@ class LogParser:
         self.k = k
         self.df_log = None
         self.log_format = log_format
+        self.output_format = output_format
         self.tokenizer = LogTokenizer(filters)
 
     def num_there(self, s):
@@ -492,85 +498,100 @@ class LogParser:
         self.num_samples = num_samples
         self.nr_epochs = nr_epochs
         self.step_size = step_size
-        self.load_data()
+        self.profiler = profiler.start("NuLog")
+        with self.profiler.phase("load"):
+            self.load_data()
 
         if not os.path.exists(self.savePath):
             os.makedirs(self.savePath)
 
         df_len = self.df_log.shape[0]
 
-        data_tokenized = []
-
-        for i in trange(0, df_len):
-            tokenized = self.tokenizer.tokenize("<CLS> " + self.df_log.iloc[i].Content)
-            data_tokenized.append(tokenized)
+        with self.profiler.phase("tokenize"):
+            data_tokenized = []
 
-        train_dataloader, test_dataloader = self.get_dataloaders(data_tokenized)
-
-        criterion = nn.CrossEntropyLoss()
-        model = self.make_model(
-            self.tokenizer.n_words,
-            self.tokenizer.n_words,
-            N=self.N,
-            d_model=self.d_model,
-            d_ff=self.d_model,
-            dropout=self.dropout,
-            max_len=self.pad_len,
-        )
-        model.to(DEVICE)
-        model_opt = torch.optim.Adam(
-            model.parameters(),
-            lr=self.lr,
-            betas=self.betas,
-            weight_decay=self.weight_decay,
-        )
-
-        for epoch in range(self.nr_epochs):
-            model.train()
-            print("Epoch", epoch)
-            self.run_epoch(
-                train_dataloader,
-                model,
-                SimpleLossCompute(model.generator, criterion, model_opt),
+            for i in trange(0, df_len):
+                tokenized = self.tokenizer.tokenize(
+                    "<CLS> " + self.df_log.iloc[i].Content
+                )
+                data_tokenized.append(tokenized)
+
+            train_dataloader, test_dataloader = self.get_dataloaders(data_tokenized)
+
+        with self.profiler.phase("train"):
+            criterion = nn.CrossEntropyLoss()
+            model = self.make_model(
+                self.tokenizer.n_words,
+                self.tokenizer.n_words,
+                N=self.N,
+                d_model=self.d_model,
+                d_ff=self.d_model,
+                dropout=self.dropout,
+                max_len=self.pad_len,
             )
-            torch.save(
-                model.state_dict(),
-                self.savePath + "model_parser_" + self.logName + str(epoch) + ".pt",
+            model.to(DEVICE)
+            model_opt = torch.optim.Adam(
+                model.parameters(),
+                lr=self.lr,
+                betas=self.betas,
+                weight_decay=self.weight_decay,
             )
 
+            for epoch in range(self.nr_epochs):
+                model.train()
+                print("Epoch", epoch)
+                self.run_epoch(
+                    train_dataloader,
+                    model,
+                    SimpleLossCompute(model.generator, criterion, model_opt),
+                )
+                torch.save(
+                    model.state_dict(),
+                    self.savePath + "model_parser_" + self.logName + str(epoch) + ".pt",
+                )
+
         # model.load_state_dict(torch.load('./AttentionParserResult/model_parser_BGL_2k.log3.pt'))
         # model.to(DEVICE)
-        results = self.run_test(
-            test_dataloader,
-            model,
-            SimpleLossCompute(model.generator, criterion, None, is_test=True),
-        )
-
-        data_words = []
-        indices_from = []
+        with self.profiler.phase("predict"):
+            results = self.run_test(
+                test_dataloader,
+                model,
+                SimpleLossCompute(model.generator, criterion, None, is_test=True),
+            )
 
-        for i, (x, y, ind) in enumerate(results):
-            # print(ind)
-            for j in range(len(x)):
-                if not self.num_there(self.tokenizer.index2word[y[j]]):
-                    if y[j] in x[j][-self.k :]:
-                        data_words.append(self.tokenizer.index2word[y[j]])
+            data_words = []
+            indices_from = []
+
+            for i, (x, y, ind) in enumerate(results):
+                # print(ind)
+                for j in range(len(x)):
+                    if not self.num_there(self.tokenizer.index2word[y[j]]):
+                        if y[j] in x[j][-self.k :]:
+                            data_words.append(self.tokenizer.index2word[y[j]])
+                        else:
+                            data_words.append("<*>")
                     else:
                         data_words.append("<*>")
-                else:
-                    data_words.append("<*>")
 
-            indices_from += ind.tolist()
+                indices_from += ind.tolist()
 
-        p = pd.DataFrame({"indices": indices_from, "predictions": data_words})
-        p = p.groupby("indices")["predictions"].apply(list).reset_index()
+            p = pd.DataFrame({"indices": indices_from, "predictions": data_words})
+            p = p.groupby("indices")["predictions"].apply(list).reset_index()
 
-        parsed_logs = []
-        for i in p.predictions.values:
-            parsed_logs.append(str("".join(i)).strip())
+            parsed_logs = []
+            for i in p.predictions.values:
+                parsed_logs.append(str("".join(i)).strip())
 
-        df_event = self.outputResult(parsed_logs)
-        df_event.to_csv(self.savePath + self.logName + "_structured.csv", index=False)
+        self.profiler.count("lines", df_len)
+        with self.profiler.phase("output"):
+            df_event = self.outputResult(parsed_logs)
+            logwriter.write_output(
+                df_event,
+                self.savePath + self.logName + "_structured.csv",
+                self.output_format,
+                index=False,
+            )
+        self.profiler.count("templates", df_event["EventTemplate"].nunique())
         print("Parsing done. [Time taken: {!s}]".format(datetime.now() - starttime))
 
     def get_dataloaders(self, data_tokenized):
@@ -615,37 +636,11 @@ class LogParser:
 
     def log_to_dataframe(self, log_file, regex, headers, logformat):
         """Function to transform log file to dataframe"""
-        log_messages = []
-        linecount = 0
-        with open(log_file, "r") as fin:
-            for line in fin.readlines():
-                try:
-                    match = regex.search(line.strip())
-                    message = [match.group(header) for header in headers]
-                    log_messages.append(message)
-                    linecount += 1
-                except Exception as e:
-                    print("[Warning] Skip line: " + line)
-        logdf = pd.DataFrame(log_messages, columns=headers)
-        logdf.insert(0, "LineId", None)
-        logdf["LineId"] = [i + 1 for i in range(linecount)]
-        return logdf
+        return logloader.log_to_dataframe(log_file, regex, headers, logformat=logformat)
 
     def generate_logformat_regex(self, logformat):
         """Function to generate regular expression to split log messages"""
-        headers = []
-        splitters = re.split(r"(<[^<>]+>)", logformat)
-        regex = ""
-        for k in range(len(splitters)):
-            if k % 2 == 0:
-                splitter = re.sub(" +", "\\\s+", splitters[k])
-                regex += splitter
-            else:
-                header = splitters[k].strip("<").strip(">")
-                regex += "(?P<%s>.*?)" % header
-                headers.append(header)
-        regex = re.compile("^" + regex + "$")
-        return headers, regex
+        return logloader.generate_logformat_regex(logformat)
 
     def do_mask(self, batch):
         c = copy.deepcopy
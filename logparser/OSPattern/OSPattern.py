@@ -20,6 +20,10 @@ import os
 import pandas as pd
 import hashlib
 from datetime import datetime
+from ..utils import logloader
+from ..utils import logwriter
+from ..utils import masking
+from ..utils import profiler
 
 class LogParser:
     def __init__(
@@ -29,6 +33,7 @@ class LogParser:
         outdir="./result/",
         rex=[],
         keep_parameters=True,
+        output_format="csv",
     ):
         """
         Log Parser using simple regex to remove letters and digits.
@@ -45,11 +50,14 @@ class LogParser:
             List of regular expressions for preprocessing log lines.
         keep_parameters : bool
             Whether to keep the parameters extracted from log lines.
+        output_format : str
+            Format of the result files, `csv`, `parquet` or `arrow`.
         """
         self.path = indir
         self.log_format = log_format
         self.rex = rex
         self.keep_parameters = keep_parameters
+        self.output_format = output_format
         self.df_log = None
         self.log_name = None
         self.save_path = outdir
@@ -58,54 +66,59 @@ class LogParser:
         print("Parsing file: " + os.path.join(self.path, log_name))
         start_time = datetime.now()
         self.log_name = log_name
-        self.load_data()
+        self.profiler = profiler.start("OSPattern")
+        with self.profiler.phase("load"):
+            self.load_data()
 
         # Process each log message
         templates = {}
         event_ids = []
         event_templates = []
 
-        for idx, row in self.df_log.iterrows():
-            log_content = row['Content']
-            # Apply preprocessing
-            preprocessed_content = self.preprocess(log_content)
-            # Generate a template by removing letters and digits
-            template = self.generate_template(preprocessed_content)
+        with self.profiler.phase("parse"):
+            for idx, row in self.df_log.iterrows():
+                log_content = row['Content']
+                # Apply preprocessing
+                preprocessed_content = self.preprocess(log_content)
+                # Generate a template by removing letters and digits
+                template = self.generate_template(preprocessed_content)
             
-            # Generate a unique EventId for the template
-            template_str = template
-            event_id = hashlib.md5(template_str.encode('utf-8')).hexdigest()[0:8]
-
-            # Store the template and associated log IDs
-            if event_id not in templates:
-                templates[event_id] = {
-                    'EventTemplate': template_str,
-                    'Occurrences': 1,
-                }
-            else:
-                templates[event_id]['Occurrences'] += 1
-
-            # Append results
-            event_ids.append(event_id)
-            event_templates.append(template_str)
+                # Generate a unique EventId for the template
+                template_str = template
+                event_id = hashlib.md5(template_str.encode('utf-8')).hexdigest()[0:8]
+
+                # Store the template and associated log IDs
+                if event_id not in templates:
+                    templates[event_id] = {
+                        'EventTemplate': template_str,
+                        'Occurrences': 1,
+                    }
+                else:
+                    templates[event_id]['Occurrences'] += 1
+
+                # Append results
+                event_ids.append(event_id)
+                event_templates.append(template_str)
             
-            if (idx + 1) % 1000 == 0 or (idx + 1) == len(self.df_log):
-                print(f"Processed {idx + 1} lines out of {len(self.df_log)}.")
+                if (idx + 1) % 1000 == 0 or (idx + 1) == len(self.df_log):
+                    print(f"Processed {idx + 1} lines out of {len(self.df_log)}.")
+
+        self.profiler.count("lines", len(self.df_log))
+        self.profiler.count("templates", len(templates))
 
         # Add results to the DataFrame
-        self.df_log['EventId'] = event_ids
-        self.df_log['EventTemplate'] = event_templates
-      
-        # Output the results
-        self.output_results(templates)
+        with self.profiler.phase("output"):
+            self.df_log['EventId'] = event_ids
+            self.df_log['EventTemplate'] = event_templates
+
+            # Output the results
+            self.output_results(templates)
         time_taken = datetime.now() - start_time
         print(f"Parsing done. [Time taken: {time_taken}]")
 
     def preprocess(self, line):
         # Apply custom regex patterns
-        for regex in self.rex:
-            line = re.sub(regex, '', line)
-        return line
+        return masking.get_masker(self.rex, "", single_pass=False).mask(line)
 
     def generate_template(self, line):
         # Remove all letters and digits
@@ -121,38 +134,11 @@ class LogParser:
 
     def generate_logformat_regex(self, logformat):
         """Function to generate regular expression to split log messages"""
-        headers = []
-        splitters = re.split(r"(<[^<>]+>)", logformat)
-        regex = ""
-        for k in range(len(splitters)):
-            if k % 2 == 0:
-                splitter = re.sub(" +", "\\\s+", splitters[k])
-                regex += splitter
-            else:
-                header = splitters[k].strip("<").strip(">")
-                regex += "(?P<%s>.*?)" % header
-                headers.append(header)
-        regex = re.compile("^" + regex + "$")
-        return headers, regex
+        return logloader.generate_logformat_regex(logformat)
 
     def log_to_dataframe(self, log_file, regex, headers, logformat):
         """Function to transform log file to dataframe"""
-        log_messages = []
-        linecount = 0
-        with open(log_file, "r") as fin:
-            for line in fin.readlines():
-                try:
-                    match = regex.search(line.strip())
-                    message = [match.group(header) for header in headers]
-                    log_messages.append(message)
-                    linecount += 1
-                except Exception as e:
-                    print("[Warning] Skip line: " + line)
-        logdf = pd.DataFrame(log_messages, columns=headers)
-        logdf.insert(0, "LineId", None)
-        logdf["LineId"] = [i + 1 for i in range(linecount)]
-        print("Total lines: ", len(logdf))
-        return logdf
+        return logloader.log_to_dataframe(log_file, regex, headers, logformat=logformat)
 
     def output_results(self, templates):
         """
@@ -162,8 +148,11 @@ class LogParser:
             os.makedirs(self.save_path)
 
         # Output structured log file
-        self.df_log.to_csv(
-            os.path.join(self.save_path, self.log_name + '_structured.csv'), index=False
+        logwriter.write_output(
+            self.df_log,
+            os.path.join(self.save_path, self.log_name + '_structured.csv'),
+            self.output_format,
+            index=False,
         )
 
         # Output templates
@@ -175,7 +164,9 @@ class LogParser:
                 'Occurrences': info['Occurrences'],
             }, ignore_index=True)
 
-        df_templates.to_csv(
+        logwriter.write_output(
+            df_templates,
             os.path.join(self.save_path, self.log_name + '_templates.csv'),
-            index=False
+            self.output_format,
+            index=False,
         )
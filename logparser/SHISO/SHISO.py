@@ -15,7 +15,6 @@
 # =========================================================================
 
 from queue import *
-import regex as re
 import os
 from nltk import ngrams
 import numpy as np
@@ -23,6 +22,10 @@ import pandas as pd
 import hashlib
 from datetime import datetime
 from tqdm import tqdm
+from ..utils import logloader
+from ..utils import logwriter
+from ..utils import masking
+from ..utils import profiler
 
 
 class Node:
@@ -48,6 +51,8 @@ class LogParser:
         formatLookupThreshold=0.3,
         superFormatThreshold=0.85,
         rex=[],
+        output_format="csv",
+        single_pass=False,
     ):
         """
         Attributes
@@ -59,6 +64,9 @@ class LogParser:
         mergeThreshold : used to search the most similar template in the children
         formatLookupThreshold : lowerbound to find the most similar node to Adjust
         superFormatThreshold : threshold compared with float(lcsLen)/averageLen, whether merge or not
+        output_format : format of the result files, `csv`, `parquet` or `arrow`
+        single_pass : mask all expressions of `rex` in a single scan, only if the
+            result is the same, see `masking`
         """
         self.path = indir
         self.logname = None
@@ -69,6 +77,8 @@ class LogParser:
         self.formatLookupThreshold = formatLookupThreshold
         self.superFormatThreshold = superFormatThreshold
         self.rex = rex
+        self.single_pass = single_pass
+        self.output_format = output_format
 
         if formatTable is None:
             formatTable = dict()
@@ -329,14 +339,21 @@ class LogParser:
         df_event = pd.DataFrame(
             df_event, columns=["EventId", "EventTemplate", "Occurrences"]
         )
+        self.profiler.count("templates", len(df_event))
 
         self.df_log["EventId"] = ids
         self.df_log["EventTemplate"] = templates
-        self.df_log.to_csv(
-            os.path.join(self.savePath, self.logname + "_structured.csv"), index=False
+        logwriter.write_output(
+            self.df_log,
+            os.path.join(self.savePath, self.logname + "_structured.csv"),
+            self.output_format,
+            index=False,
         )
-        df_event.to_csv(
-            os.path.join(self.savePath, self.logname + "_templates.csv"), index=False
+        logwriter.write_output(
+            df_event,
+            os.path.join(self.savePath, self.logname + "_templates.csv"),
+            self.output_format,
+            index=False,
         )
 
     def printTree(self, node, dep):
@@ -359,30 +376,32 @@ class LogParser:
         self.logname = logname
         starttime = datetime.now()
         rootNode = Node()
-        self.load_data()
-
-        count = 0
-        for idx, line in tqdm(self.df_log.iterrows(), total=len(self.df_log)):
-            ID = line["LineId"]
-            logmessageL = line["Content"]
-            if self.rex:
-                for currentRex in self.rex:
-                    logmessageL = re.sub(currentRex, "<*>", logmessageL)
-            logmessageL = logmessageL.strip().split()
-            currentNode = Node(format=logmessageL, logIDL=[ID])
-
-            (parentNode, newIdx, newFormNode, hasNewForm) = self.Search(
-                n=currentNode, nroot=rootNode
-            )
-
-            if hasNewForm:
-                self.Adjust(pn=parentNode, nidx=newIdx, n=newFormNode)
-            count += 1
+        self.profiler = profiler.start("SHISO")
+        with self.profiler.phase("load"):
+            self.load_data()
+
+        with self.profiler.phase("parse"):
+            count = 0
+            masker = masking.get_masker(self.rex, single_pass=self.single_pass)
+            for idx, line in tqdm(self.df_log.iterrows(), total=len(self.df_log)):
+                ID = line["LineId"]
+                logmessageL = masker.mask(line["Content"]).strip().split()
+                currentNode = Node(format=logmessageL, logIDL=[ID])
+
+                (parentNode, newIdx, newFormNode, hasNewForm) = self.Search(
+                    n=currentNode, nroot=rootNode
+                )
+
+                if hasNewForm:
+                    self.Adjust(pn=parentNode, nidx=newIdx, n=newFormNode)
+                count += 1
 
         if not os.path.exists(self.savePath):
             os.makedirs(self.savePath)
 
-        self.outputResult(rootNode)
+        self.profiler.count("lines", count)
+        with self.profiler.phase("output"):
+            self.outputResult(rootNode)
         print("Parsing done. [Time taken: {!s}]".format(datetime.now() - starttime))
 
     def load_data(self):
@@ -392,40 +411,9 @@ class LogParser:
         )
 
     def log_to_dataframe(self, log_file, regex, headers, logformat):
-        """
-        Function to transform log file to dataframe
-        """
-        log_messages = []
-        linecount = 0
-        with open(log_file, "r") as fin:
-            for line in fin.readlines():
-                try:
-                    match = regex.search(line.strip())
-                    message = [match.group(header) for header in headers]
-                    log_messages.append(message)
-                    linecount += 1
-                except Exception as e:
-                    print("Skip line: " + line)
-        logdf = pd.DataFrame(log_messages, columns=headers)
-        logdf.insert(0, "LineId", None)
-        logdf["LineId"] = [i + 1 for i in range(linecount)]
-        print("log_to_dataframe done!")
-        return logdf
+        """Function to transform log file to dataframe"""
+        return logloader.log_to_dataframe(log_file, regex, headers, logformat=logformat)
 
     def generate_logformat_regex(self, logformat):
-        """
-        Function to generate regular expression to split log messages
-        """
-        headers = []
-        splitters = re.split(r"(<[^<>]+>)", logformat)
-        regex = ""
-        for k in range(len(splitters)):
-            if k % 2 == 0:
-                splitter = re.sub(" +", "\s+", splitters[k])
-                regex += splitter
-            else:
-                header = splitters[k].strip("<").strip(">")
-                regex += "(?P<%s>.*?)" % header
-                headers.append(header)
-        regex = re.compile("^" + regex + "$")
-        return headers, regex
+        """Function to generate regular expression to split log messages"""
+        return logloader.generate_logformat_regex(logformat)
@@ -1 +1 @@
-from SHISO import *
\ No newline at end of file
+from .SHISO import *
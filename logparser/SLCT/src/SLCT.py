@@ -21,11 +21,22 @@ from datetime import datetime
 from ...logmatch import RegexMatch
 import subprocess
 import os
+from ...utils import logloader
+from ...utils import logwriter
+from ...utils import profiler
 
 
 class LogParser(object):
     def __init__(
-        self, indir, outdir, log_format, support, para_j=True, saveLog=False, rex=[]
+        self,
+        indir,
+        outdir,
+        log_format,
+        support,
+        para_j=True,
+        saveLog=False,
+        rex=[],
+        output_format="csv",
     ):
         self.outdir = outdir
         self.log_format = log_format
@@ -36,13 +47,15 @@ class LogParser(object):
         self.para["savePath"] = outdir
         self.para["support"] = support
         self.para["saveLog"] = saveLog
+        self.para["output_format"] = output_format
 
     def parse(self, logname):
         self.para["dataName"] = logname
-        SLCT(self.para, self.log_format, self.rex)
+        self.profiler = profiler.start("SLCT")
+        SLCT(self.para, self.log_format, self.rex, self.profiler)
 
 
-def SLCT(para, log_format, rex):
+def SLCT(para, log_format, rex, prof=profiler.NULL_PROFILER):
     startTime = datetime.now()  # start timing
     logname = os.path.join(para["dataPath"], para["dataName"])
     print("Parsing file: {}".format(logname))
@@ -59,34 +72,38 @@ def SLCT(para, log_format, rex):
         except:
             raise "Compile error! Please check GCC installed."
 
-    headers, regex = generate_logformat_regex(log_format)
-    df_log = log_to_dataframe(logname, regex, headers, log_format)
+    with prof.phase("load"):
+        headers, regex = generate_logformat_regex(log_format)
+        df_log = log_to_dataframe(logname, regex, headers, log_format)
     print("load data done.")
     # Generate input file
-    with open("slct_input.log", "w") as fw:
-        for line in df_log["Content"]:
-            if rex:
-                for currentRex in rex:
-                    line = re.sub(currentRex, "<*>", line)
-            fw.write(line + "\n")
+    with prof.phase("preprocess"):
+        with open("slct_input.log", "w") as fw:
+            for line in df_log["Content"]:
+                if rex:
+                    for currentRex in rex:
+                        line = re.sub(currentRex, "<*>", line)
+                fw.write(line + "\n")
     print("modify data done.")
     # Run SLCT command
     SLCT_command = extract_command(para, "slct_input.log")
     try:
         print("Run SLCT...\n>> {}".format(SLCT_command))
-        subprocess.check_call(SLCT_command, shell=True)
+        with prof.phase("cluster"):
+            subprocess.check_call(SLCT_command, shell=True)
     except:
         print("SLCT executable is invalid! Please compile it using GCC.\n")
         raise
 
     # Collect and dump templates
-    tempParameter = TempPara(
-        path="./", savePath=para["savePath"], logname="slct_input.log"
-    )
-    tempProcess(tempParameter)
-    print("temProcess done!")
-    matcher = RegexMatch(outdir=para["savePath"], logformat=log_format)
-    matched_df = matcher.match(logname, "temp_templates.csv")
+    with prof.phase("match"):
+        tempParameter = TempPara(
+            path="./", savePath=para["savePath"], logname="slct_input.log"
+        )
+        tempProcess(tempParameter)
+        print("temProcess done!")
+        matcher = RegexMatch(outdir=para["savePath"], logformat=log_format)
+        matched_df = matcher.match(logname, "temp_templates.csv")
     print("regex match done!")
     # sys.exit()
     os.remove("slct_input.log")
@@ -94,31 +111,38 @@ def SLCT(para, log_format, rex):
     os.remove("slct_templates.txt")
     os.remove("temp_templates.csv")
 
-    for idx, line in matched_df.iterrows():
-        if line["EventTemplate"] == "None":
-            content = line["Content"]
-            matched_df.loc[idx, "EventTemplate"] = content
-            matched_df.loc[idx, "EventId"] = hashlib.md5(
-                content.encode("utf-8")
-            ).hexdigest()[0:8]
-
-    occ_dict = dict(matched_df["EventTemplate"].value_counts())
-    df_event = pd.DataFrame()
-    df_event["EventTemplate"] = matched_df["EventTemplate"].unique()
-    df_event["EventId"] = df_event["EventTemplate"].map(
-        lambda x: hashlib.md5(x.encode("utf-8")).hexdigest()[0:8]
-    )
-    df_event["Occurrences"] = df_event["EventTemplate"].map(occ_dict)
-
-    df_event.to_csv(
-        os.path.join(para["savePath"], para["dataName"] + "_templates.csv"),
-        index=False,
-        columns=["EventId", "EventTemplate", "Occurrences"],
-    )
-    matched_df.to_csv(
-        os.path.join(para["savePath"], para["dataName"] + "_structured.csv"),
-        index=False,
-    )
+    with prof.phase("output"):
+        for idx, line in matched_df.iterrows():
+            if line["EventTemplate"] == "None":
+                content = line["Content"]
+                matched_df.loc[idx, "EventTemplate"] = content
+                matched_df.loc[idx, "EventId"] = hashlib.md5(
+                    content.encode("utf-8")
+                ).hexdigest()[0:8]
+
+        occ_dict = dict(matched_df["EventTemplate"].value_counts())
+        df_event = pd.DataFrame()
+        df_event["EventTemplate"] = matched_df["EventTemplate"].unique()
+        df_event["EventId"] = df_event["EventTemplate"].map(
+            lambda x: hashlib.md5(x.encode("utf-8")).hexdigest()[0:8]
+        )
+        df_event["Occurrences"] = df_event["EventTemplate"].map(occ_dict)
+
+        logwriter.write_output(
+            df_event,
+            os.path.join(para["savePath"], para["dataName"] + "_templates.csv"),
+            para["output_format"],
+            index=False,
+            columns=["EventId", "EventTemplate", "Occurrences"],
+        )
+        logwriter.write_output(
+            matched_df,
+            os.path.join(para["savePath"], para["dataName"] + "_structured.csv"),
+            para["output_format"],
+            index=False,
+        )
+    prof.count("lines", len(matched_df))
+    prof.count("templates", len(df_event))
     print("Parsing done. [Time: {!s}]".format(datetime.now() - startTime))
 
 
@@ -144,40 +168,12 @@ def extract_command(para, logname):
 
 def log_to_dataframe(log_file, regex, headers, logformat):
     """Function to transform log file to dataframe"""
-    log_messages = []
-    linecount = 0
-    with open(log_file, "r") as fin:
-        for line in fin.readlines():
-            try:
-                match = regex.search(line.strip())
-                message = [match.group(header) for header in headers]
-                log_messages.append(message)
-                linecount += 1
-            except Exception as e:
-                print("Skip line: " + line)
-    logdf = pd.DataFrame(log_messages, columns=headers)
-    logdf.insert(0, "LineId", None)
-    logdf["LineId"] = [i + 1 for i in range(linecount)]
-    return logdf
+    return logloader.log_to_dataframe(log_file, regex, headers, logformat=logformat)
 
 
 def generate_logformat_regex(logformat):
-    """
-    Function to generate regular expression to split log messages
-    """
-    headers = []
-    splitters = re.split(r"(<[^<>]+>)", logformat)
-    regex = ""
-    for k in range(len(splitters)):
-        if k % 2 == 0:
-            splitter = re.sub(" +", "\s+", splitters[k])
-            regex += splitter
-        else:
-            header = splitters[k].strip("<").strip(">")
-            regex += "(?P<%s>.*?)" % header
-            headers.append(header)
-    regex = re.compile("^" + regex + "$")
-    return headers, regex
+    """Function to generate regular expression to split log messages"""
+    return logloader.generate_logformat_regex(logformat)
 
 
 class TempPara:
@@ -16,17 +16,71 @@
 
 import regex as re
 import os
+import multiprocessing as mp
 import pandas as pd
 import hashlib
 from datetime import datetime
+from ..utils import logloader
+from ..utils import logwriter
+from ..utils import masking
+from ..utils import parameters
+from ..utils import profiler
 
 
 class LCSObject:
     """Class object to store a log group with the same template"""
 
-    def __init__(self, logTemplate="", logIDL=[]):
+    def __init__(self, logTemplate="", logIDL=[], clusterIdx=None):
         self.logTemplate = logTemplate
         self.logIDL = logIDL
+        self.clusterIdx = clusterIdx
+        # Number of constant tokens, kept up to date by `LogParser.setTemplate`
+        self.constCount = sum(1 for w in logTemplate if w != "<*>")
+
+
+class TokenIndex:
+    """Inverted index from the tokens of templates to their clusters
+
+    Clusters are identified by their position in `logCluL`. The distinct
+    tokens of each template are cached with the number of its constant,
+    i.e. not `<*>`, distinct tokens.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.tokenSets = []
+        self.numConst = []
+        self.noConst = set()
+
+    def add(self, logClust):
+        logClust.clusterIdx = len(self.tokenSets)
+        self.tokenSets.append(set())
+        self.numConst.append(0)
+        self.update(logClust)
+
+    def update(self, logClust):
+        """Index the current template of a cluster"""
+        idx = logClust.clusterIdx
+        oldTokens = self.tokenSets[idx]
+        newTokens = set(logClust.logTemplate)
+        for token in oldTokens - newTokens:
+            self.postings[token].discard(idx)
+        for token in newTokens - oldTokens:
+            self.postings.setdefault(token, set()).add(idx)
+        self.tokenSets[idx] = newTokens
+        self.numConst[idx] = len(newTokens) - ("<*>" in newTokens)
+        if self.numConst[idx]:
+            self.noConst.discard(idx)
+        else:
+            self.noConst.add(idx)
+
+    def overlaps(self, tokens):
+        """Count the tokens of the set `tokens` in each template, if any"""
+        counts = {}
+        for token in tokens:
+            for idx in self.postings.get(token, ()):
+                counts[idx] = counts.get(idx, 0) + 1
+        return counts
 
 
 class Node:
@@ -48,6 +102,12 @@ class LogParser:
         logName : the file name of the input file
         savePath : the path of the output file
         tau : how much percentage of tokens matched to merge a log message
+        n_workers : number of processes of `parse`, see `parse_sharded`
+        exact : bool, with `n_workers` > 1 match every line, so that the
+            results are identical to `n_workers=1`, otherwise match each
+            distinct tokenized message once, see `parse_sharded`
+        single_pass : mask all expressions of `rex` in a single scan, only if
+            the result is the same, see `masking`
     """
 
     def __init__(
@@ -58,6 +118,10 @@ class LogParser:
         tau=0.5,
         rex=[],
         keep_para=True,
+        output_format="csv",
+        n_workers=1,
+        exact=True,
+        single_pass=False,
     ):
         self.path = indir
         self.logName = None
@@ -66,7 +130,20 @@ class LogParser:
         self.logformat = log_format
         self.df_log = None
         self.rex = rex
+        self.single_pass = single_pass
+        self.masker = masking.get_masker(rex, single_pass=single_pass)
         self.keep_para = keep_para
+        self.output_format = output_format
+        self.n_workers = n_workers
+        self.exact = exact
+        self.rootNode = None
+        self.logCluL = []
+        self.tokenIndex = None
+
+    def reset(self):
+        self.rootNode = Node()
+        self.logCluL = []
+        self.tokenIndex = TokenIndex()
 
     def LCS(self, seq1, seq2):
         lengths = [[0 for j in range(len(seq2) + 1)] for i in range(len(seq1) + 1)]
@@ -93,7 +170,36 @@ class LogParser:
                 lenOfSeq2 -= 1
         return result
 
+    def tokenMasks(self, seq):
+        """Map each token of `seq` to the bitmask of its positions in `seq`"""
+        masks = {}
+        for i, token in enumerate(seq):
+            masks[token] = masks.get(token, 0) | (1 << i)
+        return masks
+
+    def LCSLength(self, masks, lenOfSeq1, seq2):
+        """Length of the longest common subsequence of seq1 and `seq2`
+
+        Bit-parallel computation (Hyyro, 2004): bit i of `lengthBits` is 0
+        when the LCS grows at position i of seq1, so each token of `seq2`
+        updates a whole row of the DP table of `LCS` with a few operations.
+
+        Arguments
+        ---------
+            masks : dict, bitmasks of the tokens of seq1, see `tokenMasks`
+            lenOfSeq1 : int, number of tokens of seq1
+            seq2 : list of str
+        """
+        allBits = (1 << lenOfSeq1) - 1
+        lengthBits = allBits
+        for token in seq2:
+            matches = lengthBits & masks.get(token, 0)
+            lengthBits = ((lengthBits + matches) | (lengthBits - matches)) & allBits
+        return lenOfSeq1 - bin(lengthBits).count("1")
+
     def SimpleLoopMatch(self, logClustL, seq):
+        if self.tokenIndex is not None:
+            return self.IndexedSimpleLoopMatch(logClustL, seq)
         for logClust in logClustL:
             if float(len(logClust.logTemplate)) < 0.5 * len(seq):
                 continue
@@ -106,40 +212,66 @@ class LogParser:
                 return logClust
         return None
 
+    def IndexedSimpleLoopMatch(self, logClustL, seq):
+        """Same as `SimpleLoopMatch`, the first cluster whose constant tokens
+        are all in `seq` is found by counting postings"""
+        index = self.tokenIndex
+        counts = index.overlaps(set(seq))
+        candidates = [
+            idx for idx, count in counts.items() if count == index.numConst[idx]
+        ]
+        candidates.extend(index.noConst)
+        for idx in sorted(candidates):
+            logClust = logClustL[idx]
+            if float(len(logClust.logTemplate)) >= 0.5 * len(seq):
+                return logClust
+        return None
+
     def PrefixTreeMatch(self, parentn, seq, idx):
-        retLogClust = None
         length = len(seq)
+        minConst = self.tau * length
         for i in range(idx, length):
-            if seq[i] in parentn.childD:
-                childn = parentn.childD[seq[i]]
-                if childn.logClust is not None:
-                    constLM = [w for w in childn.logClust.logTemplate if w != "<*>"]
-                    if float(len(constLM)) >= self.tau * length:
-                        return childn.logClust
-                else:
-                    return self.PrefixTreeMatch(childn, seq, i + 1)
-
-        return retLogClust
+            childn = parentn.childD.get(seq[i])
+            if childn is None:
+                continue
+            if childn.logClust is not None:
+                if childn.logClust.constCount >= minConst:
+                    return childn.logClust
+            else:
+                # Continue below the child, the rest of this node is not visited
+                parentn = childn
+        return None
 
     def LCSMatch(self, logClustL, seq):
         retLogClust = None
 
         maxLen = -1
-        maxlcs = []
         maxClust = None
         set_seq = set(seq)
         size_seq = len(seq)
-        for logClust in logClustL:
-            set_template = set(logClust.logTemplate)
-            if len(set_seq & set_template) < 0.5 * size_seq:
-                continue
-            lcs = self.LCS(seq, logClust.logTemplate)
-            if len(lcs) > maxLen or (
-                len(lcs) == maxLen
+        if self.tokenIndex is not None and size_seq:
+            # Clusters sharing less than half of the tokens are skipped anyway
+            counts = self.tokenIndex.overlaps(set_seq)
+            candidates = [
+                logClustL[idx]
+                for idx in sorted(counts)
+                if counts[idx] >= 0.5 * size_seq
+            ]
+        else:
+            candidates = [
+                logClust
+                for logClust in logClustL
+                if len(set_seq & set(logClust.logTemplate)) >= 0.5 * size_seq
+            ]
+        # Only the lengths are needed here, the winner's LCS is built in `addSeq`
+        masks = self.tokenMasks(seq)
+        for logClust in candidates:
+            lcsLen = self.LCSLength(masks, size_seq, logClust.logTemplate)
+            if lcsLen > maxLen or (
+                lcsLen == maxLen
                 and len(logClust.logTemplate) < len(maxClust.logTemplate)
             ):
-                maxLen = len(lcs)
-                maxlcs = lcs
+                maxLen = lcsLen
                 maxClust = logClust
 
         # LCS should be large then tau * len(itself)
@@ -186,6 +318,67 @@ class LogParser:
         if parentn.logClust is None:
             parentn.logClust = newCluster
 
+    def setTemplate(self, rootn, logClust, newTemplate):
+        """Replace the template of a cluster and update the prefix tree
+
+        The result is that of `removeSeqFromPrefixTree` with the old template
+        followed by `addSeqToPrefixTree` with the new one, but the constant
+        tokens both templates start with are not walked twice. A template is
+        only generalized, so its new constant tokens are a subsequence of the
+        old ones.
+        """
+        oldSeq = [w for w in logClust.logTemplate if w != "<*>"]
+        newSeq = [w for w in newTemplate if w != "<*>"]
+        logClust.logTemplate = newTemplate
+        logClust.constCount = len(newSeq)
+        if self.tokenIndex is not None:
+            self.tokenIndex.update(logClust)
+
+        # Removing and adding the common prefix back leaves its counts as they
+        # are, unless a node is missing or would be deleted by the removal
+        parentn = rootn
+        prefixLen = 0
+        for oldToken, newToken in zip(oldSeq, newSeq):
+            if oldToken != newToken:
+                break
+            childn = parentn.childD.get(oldToken)
+            if childn is None or childn.templateNo == 1:
+                oldTemplate = logClust.logTemplate
+                logClust.logTemplate = oldSeq
+                self.removeSeqFromPrefixTree(rootn, logClust)
+                logClust.logTemplate = oldTemplate
+                self.addSeqToPrefixTree(rootn, logClust)
+                return
+            parentn = childn
+            prefixLen += 1
+
+        self.removeTokens(parentn, oldSeq[prefixLen:])
+        self.addTokens(parentn, newSeq[prefixLen:], logClust)
+
+    def addTokens(self, parentn, seq, logClust):
+        for tokenInSeq in seq:
+            # Match
+            if tokenInSeq in parentn.childD:
+                parentn.childD[tokenInSeq].templateNo += 1
+            # Do not Match
+            else:
+                parentn.childD[tokenInSeq] = Node(token=tokenInSeq, templateNo=1)
+            parentn = parentn.childD[tokenInSeq]
+
+        if parentn.logClust is None:
+            parentn.logClust = logClust
+
+    def removeTokens(self, parentn, seq):
+        for tokenInSeq in seq:
+            if tokenInSeq in parentn.childD:
+                matchedNode = parentn.childD[tokenInSeq]
+                if matchedNode.templateNo == 1:
+                    del parentn.childD[tokenInSeq]
+                    break
+                else:
+                    matchedNode.templateNo -= 1
+                    parentn = matchedNode
+
     def removeSeqFromPrefixTree(self, rootn, newCluster):
         parentn = rootn
         seq = newCluster.logTemplate
@@ -221,14 +414,18 @@ class LogParser:
         self.df_log["EventId"] = ids
         self.df_log["EventTemplate"] = templates
         if self.keep_para:
-            self.df_log["ParameterList"] = self.df_log.apply(
-                self.get_parameter_list, axis=1
-            )
-        self.df_log.to_csv(
-            os.path.join(self.savePath, self.logname + "_structured.csv"), index=False
+            self.df_log["ParameterList"] = parameters.extract_parameters(self.df_log)
+        logwriter.write_output(
+            self.df_log,
+            os.path.join(self.savePath, self.logname + "_structured.csv"),
+            self.output_format,
+            index=False,
         )
-        df_event.to_csv(
-            os.path.join(self.savePath, self.logname + "_templates.csv"), index=False
+        logwriter.write_output(
+            df_event,
+            os.path.join(self.savePath, self.logname + "_templates.csv"),
+            self.output_format,
+            index=False,
         )
 
     def printTree(self, node, dep):
@@ -247,51 +444,67 @@ class LogParser:
         for child in node.childD:
             self.printTree(node.childD[child], dep + 1)
 
-    def parse(self, logname):
-        starttime = datetime.now()
-        print("Parsing file: " + os.path.join(self.path, logname))
-        self.logname = logname
-        self.load_data()
-        rootNode = Node()
-        logCluL = []
+    def addSeq(self, logmessageL):
+        """Match a tokenized log message and return its cluster
 
-        count = 0
-        for idx, line in self.df_log.iterrows():
-            logID = line["LineId"]
-            logmessageL = list(
-                filter(
-                    lambda x: x != "",
-                    re.split(r"[\s=:,]", self.preprocess(line["Content"])),
-                )
-            )
-            constLogMessL = [w for w in logmessageL if w != "<*>"]
+        The cluster is created, or its template generalized, as needed. The
+        caller appends the id of the message to `logIDL` of the cluster.
+        """
+        constLogMessL = [w for w in logmessageL if w != "<*>"]
 
-            # Find an existing matched log cluster
-            matchCluster = self.PrefixTreeMatch(rootNode, constLogMessL, 0)
+        # Find an existing matched log cluster
+        matchCluster = self.PrefixTreeMatch(self.rootNode, constLogMessL, 0)
+
+        if matchCluster is None:
+            matchCluster = self.SimpleLoopMatch(self.logCluL, constLogMessL)
 
             if matchCluster is None:
-                matchCluster = self.SimpleLoopMatch(logCluL, constLogMessL)
+                matchCluster = self.LCSMatch(self.logCluL, logmessageL)
 
+                # Match no existing log cluster
                 if matchCluster is None:
-                    matchCluster = self.LCSMatch(logCluL, logmessageL)
-
-                    # Match no existing log cluster
-                    if matchCluster is None:
-                        newCluster = LCSObject(logTemplate=logmessageL, logIDL=[logID])
-                        logCluL.append(newCluster)
-                        self.addSeqToPrefixTree(rootNode, newCluster)
-                    # Add the new log message to the existing cluster
-                    else:
-                        newTemplate = self.getTemplate(
-                            self.LCS(logmessageL, matchCluster.logTemplate),
-                            matchCluster.logTemplate,
-                        )
-                        if " ".join(newTemplate) != " ".join(matchCluster.logTemplate):
-                            self.removeSeqFromPrefixTree(rootNode, matchCluster)
-                            matchCluster.logTemplate = newTemplate
-                            self.addSeqToPrefixTree(rootNode, matchCluster)
-            if matchCluster:
-                matchCluster.logIDL.append(logID)
+                    matchCluster = LCSObject(logTemplate=logmessageL, logIDL=[])
+                    self.logCluL.append(matchCluster)
+                    self.tokenIndex.add(matchCluster)
+                    self.addSeqToPrefixTree(self.rootNode, matchCluster)
+                # Add the new log message to the existing cluster
+                else:
+                    newTemplate = self.getTemplate(
+                        self.LCS(logmessageL, matchCluster.logTemplate),
+                        matchCluster.logTemplate,
+                    )
+                    if " ".join(newTemplate) != " ".join(matchCluster.logTemplate):
+                        self.setTemplate(self.rootNode, matchCluster, newTemplate)
+        return matchCluster
+
+    def parse(self, logname):
+        starttime = datetime.now()
+        print("Parsing file: " + os.path.join(self.path, logname))
+        self.logname = logname
+        self.profiler = profiler.start("Spell")
+        with self.profiler.phase("load"):
+            self.load_data()
+        self.reset()
+
+        with self.profiler.phase("parse"):
+            if self.n_workers > 1:
+                self.parse_sharded()
+            else:
+                self.parse_serial()
+        self.profiler.count("lines", len(self.df_log))
+        self.profiler.count("templates", len(self.logCluL))
+
+        with self.profiler.phase("output"):
+            if not os.path.exists(self.savePath):
+                os.makedirs(self.savePath)
+            self.outputResult(self.logCluL)
+        print("Parsing done. [Time taken: {!s}]".format(datetime.now() - starttime))
+
+    def parse_serial(self):
+        count = 0
+        for logID, content in zip(self.df_log["LineId"], self.df_log["Content"]):
+            logmessageL = split_tokens(self.preprocess(content))
+            self.addSeq(logmessageL).logIDL.append(logID)
             count += 1
             if count % 1000 == 0 or count == len(self.df_log):
                 print(
@@ -300,11 +513,67 @@ class LogParser:
                     )
                 )
 
-        if not os.path.exists(self.savePath):
-            os.makedirs(self.savePath)
-
-        self.outputResult(logCluL)
-        print("Parsing done. [Time taken: {!s}]".format(datetime.now() - starttime))
+    def parse_sharded(self):
+        """Parse the loaded log lines with `n_workers` processes
+
+        Workers mask and tokenize the lines, and the clusters are built here
+        in the order of lines. With `exact=True`, the default, every line is
+        matched, so the results are identical to those of `n_workers=1` for
+        any input.
+
+        Unlike Drain, a Spell cluster may hold messages of any length, so the
+        lines cannot be parsed in independent shards without changing the
+        results. With `exact=False`, workers also group the lines by
+        tokenized message, and each distinct message is matched once, in the
+        order of its first line, and its cluster gets all its lines. Only the
+        repeats of a message that `n_workers=1` would match to a cluster
+        created or generalized after its first line are grouped differently,
+        and the results do not depend on `n_workers`, see the README.
+        """
+        logIDs = self.df_log["LineId"].tolist()
+        contents = self.df_log["Content"].tolist()
+        chunk_size = max(1, -(-len(contents) // (self.n_workers * 4)))
+        chunks = [
+            (logIDs[idx : idx + chunk_size], contents[idx : idx + chunk_size])
+            for idx in range(0, len(contents), chunk_size)
+        ]
+        if not chunks:
+            return
+
+        pool = mp.Pool(processes=self.n_workers)
+        try:
+            if self.exact:
+                results = pool.starmap(
+                    tokenize_messages,
+                    [(self.rex, chunk, self.single_pass) for _, chunk in chunks],
+                )
+            else:
+                results = pool.starmap(
+                    group_messages,
+                    [(self.rex,) + chunk + (self.single_pass,) for chunk in chunks],
+                )
+        finally:
+            pool.close()
+            pool.join()
+
+        if self.exact:
+            for (chunkLogIDs, _), messages in zip(chunks, results):
+                for logID, logmessageL in zip(chunkLogIDs, messages):
+                    self.addSeq(logmessageL).logIDL.append(logID)
+        else:
+            # The lines of a message in later chunks join those of its first line
+            groups = {}
+            for chunkGroups in results:
+                for logmessageL, groupLogIDs in chunkGroups:
+                    key = tuple(logmessageL)
+                    if key in groups:
+                        groups[key][1].extend(groupLogIDs)
+                    else:
+                        groups[key] = (logmessageL, groupLogIDs)
+            print("Match %d distinct messages" % len(groups))
+            for logmessageL, groupLogIDs in groups.values():
+                self.addSeq(logmessageL).logIDL.extend(groupLogIDs)
+        print("Processed 100.0% of log lines.")
 
     def load_data(self):
         headers, regex = self.generate_logformat_regex(self.logformat)
@@ -313,57 +582,46 @@ class LogParser:
         )
 
     def preprocess(self, line):
-        for currentRex in self.rex:
-            line = re.sub(currentRex, "<*>", line)
-        return line
+        return self.masker.mask(line)
 
     def log_to_dataframe(self, log_file, regex, headers, logformat):
         """Function to transform log file to dataframe"""
-        log_messages = []
-        linecount = 0
-        with open(log_file, "r") as fin:
-            for line in fin.readlines():
-                line = re.sub(r"[^\x00-\x7F]+", "<NASCII>", line)
-                try:
-                    match = regex.search(line.strip())
-                    message = [match.group(header) for header in headers]
-                    log_messages.append(message)
-                    linecount += 1
-                except Exception as e:
-                    print("Skip line: " + line)
-        logdf = pd.DataFrame(log_messages, columns=headers)
-        logdf.insert(0, "LineId", None)
-        logdf["LineId"] = [i + 1 for i in range(linecount)]
-        return logdf
+        return logloader.log_to_dataframe(
+            log_file, regex, headers, logformat=logformat, nonascii="<NASCII>"
+        )
 
     def generate_logformat_regex(self, logformat):
         """Function to generate regular expression to split log messages"""
-        headers = []
-        splitters = re.split(r"(<[^<>]+>)", logformat)
-        regex = ""
-        for k in range(len(splitters)):
-            if k % 2 == 0:
-                splitter = re.sub(" +", "\s+", splitters[k])
-                regex += splitter
-            else:
-                header = splitters[k].strip("<").strip(">")
-                regex += "(?P<%s>.*?)" % header
-                headers.append(header)
-        regex = re.compile("^" + regex + "$")
-        return headers, regex
+        return logloader.generate_logformat_regex(logformat)
 
     def get_parameter_list(self, row):
-        template_regex = re.sub(r"<.{1,5}>", "<*>", row["EventTemplate"])
-        if "<*>" not in template_regex:
-            return []
-        template_regex = re.sub(r"([^A-Za-z0-9])", r"\\\1", template_regex)
-        template_regex = re.sub(r"\\ +", r"\\s+", template_regex)
-        template_regex = "^" + template_regex.replace("\<\*\>", "(.*?)") + "$"
-        parameter_list = re.findall(template_regex, row["Content"])
-        parameter_list = parameter_list[0] if parameter_list else ()
-        parameter_list = (
-            list(parameter_list)
-            if isinstance(parameter_list, tuple)
-            else [parameter_list]
-        )
-        return parameter_list
+        return parameters.get_parameter_list(row["EventTemplate"], row["Content"])
+
+
+def split_tokens(line):
+    """Split a masked log message into tokens"""
+    return list(filter(lambda x: x != "", re.split(r"[\s=:,]", line)))
+
+
+def tokenize_messages(rex, contents, single_pass=False):
+    """Mask and tokenize log contents the same way as `LogParser.parse_serial`"""
+    masker = masking.get_masker(rex, single_pass=single_pass)
+    return [split_tokens(line) for line in masker.mask_lines(contents)]
+
+
+def group_messages(rex, logIDs, contents, single_pass=False):
+    """Group the line ids of log contents by masked and tokenized message
+
+    Returns
+    -------
+        groups : list of (logmessageL, logIDL), in the order of first lines
+    """
+    groups = {}
+    messages = tokenize_messages(rex, contents, single_pass)
+    for logID, logmessageL in zip(logIDs, messages):
+        key = tuple(logmessageL)
+        if key in groups:
+            groups[key][1].append(logID)
+        else:
+            groups[key] = (logmessageL, [logID])
+    return list(groups.values())
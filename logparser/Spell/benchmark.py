@@ -19,6 +19,7 @@ import sys
 sys.path.append("../../")
 from logparser.Spell import LogParser
 from logparser.utils import evaluator
+from logparser.utils import profiler
 from logparser.utils import const
 import os
 import pandas as pd
@@ -137,6 +138,7 @@ benchmark_settings = {
 
 def benchmark_accuracy():
     bechmark_result = []
+    phase_reports = []
     for dataset, setting in benchmark_settings.items():
         print("\n=== Evaluation on %s ===" % dataset)
         indir = os.path.join(const.corrected_input_dir, os.path.dirname(setting["log_file"]))
@@ -147,9 +149,11 @@ def benchmark_accuracy():
             indir=indir,
             outdir=output_dir,
             rex=setting["regex"],
+            single_pass=True,
             tau=setting["tau"],
         )
         parser.parse(log_file)
+        phase_reports.append((dataset, parser.profiler.report()))
 
         F1_measure, accuracy = evaluator.evaluate(
             groundtruth=os.path.join(indir, log_file + const.corrected_file_suffix),
@@ -162,6 +166,8 @@ def benchmark_accuracy():
     df_result.set_index("Dataset", inplace=True)
     print(df_result)
     df_result.to_csv("Spell_bechmark_result.csv", float_format="%.6f")
+    if profiler.ENABLED:
+        profiler.write_reports(phase_reports, "Spell_bechmark_phases.csv")
 
 def benchmark_time():
     benchmark_result = []
@@ -22,12 +22,17 @@ import time
 import warnings
 from collections import Counter
 from string import punctuation
+from ..utils import logloader
+from ..utils import logwriter
+from ..utils import profiler
 
 warnings.filterwarnings("ignore")
 
 
 class LogParser:
-    def __init__(self, log_format, indir="./", outdir="./result/", rex=[]):
+    def __init__(
+        self, log_format, indir="./", outdir="./result/", rex=[], output_format="csv"
+    ):
         """
         Attributes
         ----------
@@ -35,6 +40,7 @@ class LogParser:
             path : the input path stores the input log file name
             logName : the name of the input file containing raw log messages
             savePath : the output path stores the file containing structured logs
+            output_format : format of the result files, `csv`, `parquet` or `arrow`
         """
         self.path = indir
         self.indir = indir
@@ -44,6 +50,7 @@ class LogParser:
         self.df_log = None
         self.log_format = log_format
         self.rex = rex
+        self.output_format = output_format
 
     def tokenize(self):
         event_label = []
@@ -124,8 +131,11 @@ class LogParser:
         return finale
 
     def outputResult(self):
-        self.df_log.to_csv(
-            os.path.join(self.savePath, self.logName + "_structured.csv"), index=False
+        logwriter.write_output(
+            self.df_log,
+            os.path.join(self.savePath, self.logName + "_structured.csv"),
+            self.output_format,
+            index=False,
         )
 
     def load_data(self):
@@ -137,37 +147,11 @@ class LogParser:
 
     def generate_logformat_regex(self, logformat):
         """Function to generate regular expression to split log messages"""
-        headers = []
-        splitters = re.split(r"(<[^<>]+>)", logformat)
-        regex = ""
-        for k in range(len(splitters)):
-            if k % 2 == 0:
-                splitter = re.sub(" +", "\\\s+", splitters[k])
-                regex += splitter
-            else:
-                header = splitters[k].strip("<").strip(">")
-                regex += "(?P<%s>.*?)" % header
-                headers.append(header)
-        regex = re.compile("^" + regex + "$")
-        return headers, regex
+        return logloader.generate_logformat_regex(logformat)
 
     def log_to_dataframe(self, log_file, regex, headers, logformat):
         """Function to transform log file to dataframe"""
-        log_messages = []
-        linecount = 0
-        with open(log_file, "r") as fin:
-            for line in fin.readlines():
-                try:
-                    match = regex.search(line.strip())
-                    message = [match.group(header) for header in headers]
-                    log_messages.append(message)
-                    linecount += 1
-                except Exception as e:
-                    print("[Warning] Skip line: " + line)
-        logdf = pd.DataFrame(log_messages, columns=headers)
-        logdf.insert(0, "LineId", None)
-        logdf["LineId"] = [i + 1 for i in range(linecount)]
-        return logdf
+        return logloader.log_to_dataframe(log_file, regex, headers, logformat=logformat)
 
     def parse(self, logname):
         start_timeBig = time.time()
@@ -177,49 +161,59 @@ class LogParser:
 
         regex = [r"blk_-?\d+", r"(\d+\.){3}\d+(:\d+)?"]
 
-        self.load_data()
-        self.df_log = self.df_log.sample(n=2000)
-        self.tokenize()
-        self.df_log["EventId"] = self.df_log["event_label"].map(
-            lambda x: self.remove_word_with_special(str(x))
-        )
-        groups = self.df_log.groupby("EventId")
-        keys = groups.groups.keys()
-        stock_list = []
-        count = 0
+        self.profiler = profiler.start("ULP")
+        with self.profiler.phase("load"):
+            self.load_data()
+            self.df_log = self.df_log.sample(n=2000)
+        with self.profiler.phase("tokenize"):
+            self.tokenize()
+        with self.profiler.phase("grouping"):
+            self.df_log["EventId"] = self.df_log["event_label"].map(
+                lambda x: self.remove_word_with_special(str(x))
+            )
+            groups = self.df_log.groupby("EventId")
+            keys = groups.groups.keys()
+            stock_list = []
+            count = 0
 
-        re_list2 = ["[ ]{1,}[-]*[0-9]+[ ]{1,}", ' "\d+" ']
+            re_list2 = ["[ ]{1,}[-]*[0-9]+[ ]{1,}", ' "\d+" ']
 
-        generic_re = re.compile("|".join(re_list2))
+            generic_re = re.compile("|".join(re_list2))
 
-        for i in keys:
-            l = []
-            slc = groups.get_group(i)
+            for i in keys:
+                l = []
+                slc = groups.get_group(i)
 
-            template = slc["event_label"][0:1].to_list()[0]
-            count += 1
-            if slc.size > 1:
-                l = self.getDynamicVars2(slc.head(10))
-                pat = r"\b(?:{})\b".format("|".join(str(v) for v in l))
-                if len(l) > 0:
-                    template = template.lower()
-                    template = re.sub(pat, "<*>", template)
+                template = slc["event_label"][0:1].to_list()[0]
+                count += 1
+                if slc.size > 1:
+                    l = self.getDynamicVars2(slc.head(10))
+                    pat = r"\b(?:{})\b".format("|".join(str(v) for v in l))
+                    if len(l) > 0:
+                        template = template.lower()
+                        template = re.sub(pat, "<*>", template)
 
-            template = re.sub(generic_re, " <*> ", template)
-            slc["event_label"] = [template] * len(slc["event_label"].to_list())
+                template = re.sub(generic_re, " <*> ", template)
+                slc["event_label"] = [template] * len(slc["event_label"].to_list())
 
-            stock_list.append(slc)
+                stock_list.append(slc)
             
-        stock = pd.concat(stock_list)
-        stock = stock.sort_index()
-        self.df_log = stock
-
-        self.df_log["EventTemplate"] = self.df_log["event_label"]
-        if not os.path.exists(self.savePath):
-            os.makedirs(self.savePath)
-        self.df_log.to_csv(
-            os.path.join(self.savePath, logname + "_structured.csv"), index=False
-        )
+            stock = pd.concat(stock_list)
+            stock = stock.sort_index()
+            self.df_log = stock
+
+        self.profiler.count("lines", len(self.df_log))
+        self.profiler.count("templates", count)
+        with self.profiler.phase("output"):
+            self.df_log["EventTemplate"] = self.df_log["event_label"]
+            if not os.path.exists(self.savePath):
+                os.makedirs(self.savePath)
+            logwriter.write_output(
+                self.df_log,
+                os.path.join(self.savePath, logname + "_structured.csv"),
+                self.output_format,
+                index=False,
+            )
         elapsed_timeBig = time.time() - start_timeBig
         print(f"Parsing done in {elapsed_timeBig} sec")
         return 0
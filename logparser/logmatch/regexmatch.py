@@ -29,11 +29,17 @@ import itertools
 import hashlib
 import numpy as np
 from ..utils import logloader
+from ..utils import logwriter
 
 
 class RegexMatch:
     def __init__(
-        self, outdir="./result/", n_workers=1, optimized=False, logformat=None
+        self,
+        outdir="./result/",
+        n_workers=1,
+        optimized=False,
+        logformat=None,
+        output_format="csv",
     ):
         self.outdir = outdir
         if not os.path.exists(outdir):
@@ -43,6 +49,7 @@ class RegexMatch:
         self.logformat = logformat
         self.n_workers = n_workers
         self.optimized = optimized
+        self.output_format = output_format
 
     def add_event_template(self, event_template, event_Id=None):
         if not event_Id:
@@ -98,7 +105,7 @@ class RegexMatch:
         return match_list, paras
 
     def read_template_from_csv(self, template_filepath):
-        template_dataframe = pd.read_csv(template_filepath)
+        template_dataframe = logwriter.read_output(template_filepath)
         for idx, row in template_dataframe.iterrows():
             event_Id = row["EventId"]
             event_template = row["EventTemplate"]
@@ -130,8 +137,11 @@ class RegexMatch:
         return log_dataframe
 
     def _dump_match_result(self, log_filename, log_dataframe):
-        log_dataframe.to_csv(
-            os.path.join(self.outdir, log_filename + "_structured.csv"), index=False
+        logwriter.write_output(
+            log_dataframe,
+            os.path.join(self.outdir, log_filename + "_structured.csv"),
+            self.output_format,
+            index=False,
         )
         template_freq_list = [
             [eventId, template, freq]
@@ -140,8 +150,11 @@ class RegexMatch:
         template_freq_df = pd.DataFrame(
             template_freq_list, columns=["EventId", "EventTemplate", "Occurrences"]
         )
-        template_freq_df.to_csv(
-            os.path.join(self.outdir, log_filename + "_templates.csv"), index=False
+        logwriter.write_output(
+            template_freq_df,
+            os.path.join(self.outdir, log_filename + "_templates.csv"),
+            self.output_format,
+            index=False,
         )
 
     def _generate_hash_eventId(self, template_str):
@@ -14,14 +14,13 @@
 # limitations under the License.
 # =========================================================================
 
+import numpy as np
 import pandas as pd
-from scipy.special import comb
-import tracemalloc
-import psutil;
-from datetime import datetime
+from . import harness
+from . import logwriter
 
 
-def evaluate(groundtruth, parsedresult):
+def evaluate(groundtruth, parsedresult, chunksize=None):
     """Evaluation function to benchmark log parsing accuracy
 
     Arguments
@@ -29,22 +28,41 @@ def evaluate(groundtruth, parsedresult):
         groundtruth : str
             file path of groundtruth structured csv file
         parsedresult : str
-            file path of parsed structured csv file
+            file path of parsed structured file, parquet and arrow results are
+            read as well, see `logwriter.read_output`
+        chunksize : int, optional
+            read both files in aligned chunks of this many lines and accumulate
+            the counts, so that memory use does not grow with the file size
 
     Returns
     -------
         f_measure : float
         accuracy : float
     """
-    df_groundtruth = pd.read_csv(groundtruth)
-    df_parsedlog = pd.read_csv(parsedresult)
-    # Remove invalid groundtruth event Ids
-    non_empty_log_ids = df_groundtruth[~df_groundtruth["EventId"].isnull()].index
-    df_groundtruth = df_groundtruth.loc[non_empty_log_ids]
-    df_parsedlog = df_parsedlog.loc[non_empty_log_ids]
-    (precision, recall, f_measure, accuracy) = get_accuracy(
-        df_groundtruth["EventId"], df_parsedlog["EventId"]
-    )
+    if chunksize:
+        table = ContingencyTable()
+        for chunk_groundtruth, chunk_parsedlog in _aligned_chunks(
+            logwriter.read_output_chunks(
+                groundtruth, columns=["EventId"], chunksize=chunksize, dtype=str
+            ),
+            logwriter.read_output_chunks(
+                parsedresult, columns=["EventId"], chunksize=chunksize, dtype=str
+            ),
+        ):
+            # Remove invalid groundtruth event Ids
+            non_empty = chunk_groundtruth.notnull().to_numpy()
+            table.update(chunk_groundtruth[non_empty], chunk_parsedlog[non_empty])
+        (precision, recall, f_measure, accuracy) = table.get_accuracy()
+    else:
+        df_groundtruth = logwriter.read_output(groundtruth, columns=["EventId"])
+        df_parsedlog = logwriter.read_output(parsedresult, columns=["EventId"])
+        # Remove invalid groundtruth event Ids
+        non_empty_log_ids = df_groundtruth[~df_groundtruth["EventId"].isnull()].index
+        df_groundtruth = df_groundtruth.loc[non_empty_log_ids]
+        df_parsedlog = df_parsedlog.loc[non_empty_log_ids]
+        (precision, recall, f_measure, accuracy) = get_accuracy(
+            df_groundtruth["EventId"], df_parsedlog["EventId"]
+        )
     print(
         "Precision: {:.4f}, Recall: {:.4f}, F1_measure: {:.4f}, Parsing_Accuracy: {:.4f}".format(
             precision, recall, f_measure, accuracy
@@ -53,15 +71,35 @@ def evaluate(groundtruth, parsedresult):
     return f_measure, accuracy
 
 
+def _aligned_chunks(chunks_groundtruth, chunks_parsedlog):
+    """Pair up the EventId columns of two chunk iterators by line number"""
+    chunks_groundtruth = (chunk["EventId"] for chunk in chunks_groundtruth)
+    chunks_parsedlog = (chunk["EventId"] for chunk in chunks_parsedlog)
+    pending_groundtruth = next(chunks_groundtruth, None)
+    pending_parsedlog = next(chunks_parsedlog, None)
+    while pending_groundtruth is not None and pending_parsedlog is not None:
+        size = min(len(pending_groundtruth), len(pending_parsedlog))
+        yield pending_groundtruth.iloc[:size], pending_parsedlog.iloc[:size]
+        pending_groundtruth = pending_groundtruth.iloc[size:]
+        pending_parsedlog = pending_parsedlog.iloc[size:]
+        if len(pending_groundtruth) == 0:
+            pending_groundtruth = next(chunks_groundtruth, None)
+        if len(pending_parsedlog) == 0:
+            pending_parsedlog = next(chunks_parsedlog, None)
+    if pending_groundtruth is not None or pending_parsedlog is not None:
+        raise ValueError("Groundtruth and parsed results have different lengths!")
+
+
 def get_accuracy(series_groundtruth, series_parsedlog, debug=False):
     """Compute accuracy metrics between log parsing results and ground truth
 
     Arguments
     ---------
-        series_groundtruth : pandas.Series
+        series_groundtruth : pandas.Series or numpy.ndarray
             A sequence of groundtruth event Ids
-        series_parsedlog : pandas.Series
-            A sequence of parsed event Ids
+        series_parsedlog : pandas.Series or numpy.ndarray
+            A sequence of parsed event Ids, aligned with series_groundtruth
+            by position
         debug : bool, default False
             print error log messages when set to True
 
@@ -72,98 +110,146 @@ def get_accuracy(series_groundtruth, series_parsedlog, debug=False):
         f_measure : float
         accuracy : float
     """
-    series_groundtruth_valuecounts = series_groundtruth.value_counts()
-    real_pairs = 0
-    for count in series_groundtruth_valuecounts:
-        if count > 1:
-            real_pairs += comb(count, 2)
-
-    series_parsedlog_valuecounts = series_parsedlog.value_counts()
-    parsed_pairs = 0
-    for count in series_parsedlog_valuecounts:
-        if count > 1:
-            parsed_pairs += comb(count, 2)
-
-    accurate_pairs = 0
-    accurate_events = 0  # determine how many lines are correctly parsed
-    for parsed_eventId in series_parsedlog_valuecounts.index:
-        logIds = series_parsedlog[series_parsedlog == parsed_eventId].index
-        series_groundtruth_logId_valuecounts = series_groundtruth[logIds].value_counts()
-        error_eventIds = (
-            parsed_eventId,
-            series_groundtruth_logId_valuecounts.index.tolist(),
+    table = ContingencyTable()
+    table.update(series_groundtruth, series_parsedlog)
+    return table.get_accuracy(debug)
+
+
+class ContingencyTable:
+    """Counts of (parsed, groundtruth) event Id pairs, accumulated over chunks
+
+    Only the non-empty cells are stored, so memory is bounded by the number
+    of distinct pairs rather than by the number of log messages. Missing
+    event Ids are left out as value_counts() does.
+    """
+
+    def __init__(self):
+        self.groundtruth_eventIds = []
+        self.parsed_eventIds = []
+        self.groundtruth_counts = np.zeros(0, dtype=np.int64)
+        self.parsed_counts = np.zeros(0, dtype=np.int64)
+        self.cells = np.zeros(0, dtype=np.int64)
+        self.cell_counts = np.zeros(0, dtype=np.int64)
+        self.total = 0
+        self._groundtruth_codes = {}
+        self._parsed_codes = {}
+
+    def update(self, series_groundtruth, series_parsedlog):
+        """Add a chunk of aligned groundtruth and parsed event Ids"""
+        groundtruth_codes = _encode(
+            series_groundtruth, self._groundtruth_codes, self.groundtruth_eventIds
+        )
+        parsed_codes = _encode(
+            series_parsedlog, self._parsed_codes, self.parsed_eventIds
+        )
+        if len(groundtruth_codes) != len(parsed_codes):
+            raise ValueError("Groundtruth and parsed results have different lengths!")
+        self.total += len(groundtruth_codes)
+        self.groundtruth_counts = _add_counts(
+            self.groundtruth_counts, groundtruth_codes, len(self.groundtruth_eventIds)
+        )
+        self.parsed_counts = _add_counts(
+            self.parsed_counts, parsed_codes, len(self.parsed_eventIds)
+        )
+
+        labeled = (groundtruth_codes >= 0) & (parsed_codes >= 0)
+        cells = (parsed_codes[labeled] << 32) | groundtruth_codes[labeled]
+        cell_codes, cells = pd.factorize(np.concatenate([self.cells, cells]))
+        self.cell_counts = np.bincount(
+            cell_codes,
+            weights=np.concatenate(
+                [self.cell_counts, np.ones(labeled.sum(), dtype=np.int64)]
+            ),
+            minlength=len(cells),
+        ).astype(np.int64)
+        self.cells = cells
+
+    def get_accuracy(self, debug=False):
+        """Compute precision, recall, f_measure and accuracy, see `get_accuracy`"""
+        real_pairs = _count_pairs(self.groundtruth_counts)
+        parsed_pairs = _count_pairs(self.parsed_counts)
+        accurate_pairs = _count_pairs(self.cell_counts)
+        cell_parsed = self.cells >> 32
+        cell_groundtruth = self.cells & 0xFFFFFFFF
+
+        # A parsed event is correct when all its messages share one groundtruth
+        # event and no other message belongs to that groundtruth event
+        groundtruth_per_parsed = np.bincount(
+            cell_parsed, minlength=len(self.parsed_eventIds)
+        )
+        correct = (groundtruth_per_parsed[cell_parsed] == 1) & (
+            self.parsed_counts[cell_parsed] == self.groundtruth_counts[cell_groundtruth]
         )
-        error = True
-        if series_groundtruth_logId_valuecounts.size == 1:
-            groundtruth_eventId = series_groundtruth_logId_valuecounts.index[0]
-            if (
-                logIds.size
-                == series_groundtruth[series_groundtruth == groundtruth_eventId].size
-            ):
-                accurate_events += logIds.size
-                error = False
-        if error and debug:
-            print(
-                "(parsed_eventId, groundtruth_eventId) =",
-                error_eventIds,
-                "failed",
-                logIds.size,
-                "messages",
-            )
-        for count in series_groundtruth_logId_valuecounts:
-            if count > 1:
-                accurate_pairs += comb(count, 2)
-
-    precision = float(accurate_pairs) / parsed_pairs
-    recall = float(accurate_pairs) / real_pairs
-    f_measure = 2 * precision * recall / (precision + recall)
-    accuracy = float(accurate_events) / series_groundtruth.size
-    return precision, recall, f_measure, accuracy
+        accurate_events = int(self.parsed_counts[cell_parsed[correct]].sum())
+
+        if debug:
+            correct_parsed = np.zeros(len(self.parsed_eventIds), dtype=bool)
+            correct_parsed[cell_parsed[correct]] = True
+            for parsed_code in np.argsort(-self.parsed_counts, kind="stable"):
+                if correct_parsed[parsed_code]:
+                    continue
+                group = np.flatnonzero(cell_parsed == parsed_code)
+                group = group[np.argsort(-self.cell_counts[group], kind="stable")]
+                error_eventIds = (
+                    self.parsed_eventIds[parsed_code],
+                    [self.groundtruth_eventIds[code] for code in cell_groundtruth[group]],
+                )
+                print(
+                    "(parsed_eventId, groundtruth_eventId) =",
+                    error_eventIds,
+                    "failed",
+                    self.parsed_counts[parsed_code],
+                    "messages",
+                )
+
+        precision = float(accurate_pairs) / parsed_pairs
+        recall = float(accurate_pairs) / real_pairs
+        f_measure = 2 * precision * recall / (precision + recall)
+        accuracy = float(accurate_events) / self.total
+        return precision, recall, f_measure, accuracy
+
+
+def _encode(series, codes, eventIds):
+    """Map event Ids to stable integer codes, -1 for missing event Ids"""
+    local_codes, uniques = pd.factorize(series)
+    # The last entry maps the -1 code of missing values onto itself
+    mapping = np.full(len(uniques) + 1, -1, dtype=np.int64)
+    for idx, eventId in enumerate(uniques):
+        if eventId not in codes:
+            codes[eventId] = len(eventIds)
+            eventIds.append(eventId)
+        mapping[idx] = codes[eventId]
+    return mapping[local_codes]
+
+
+def _add_counts(counts, codes, size):
+    counts = np.pad(counts, (0, size - len(counts)))
+    return counts + np.bincount(codes[codes >= 0], minlength=size)
+
+
+def _count_pairs(counts):
+    """Number of message pairs within groups of the given sizes
+
+    The count is a Python int, so that dividing by 0 pairs raises
+    ZeroDivisionError instead of giving inf or nan as numpy integers do.
+    """
+    return int((counts * (counts - 1) // 2).sum())
 
 def benchmark_time(dataset, LogParser, log_file, parsing_times=10, **kwargs):
-    benchmark_result = []
+    """Mean and standard deviation of the parsing time in seconds, see `harness`"""
     print("\n=== Evaluation on %s ===" % dataset)
-    total_time = []
-    for _ in range(parsing_times):
-        parser = LogParser(**kwargs)
-        start_time = datetime.now()
-        parser.parse(log_file)
-        end_time = datetime.now()
-        total_time.append((end_time - start_time).total_seconds())
-    delta_series = pd.Series(total_time)
-    mean_time = delta_series.mean()
-    std_time = delta_series.std()
-    benchmark_result.append([dataset, mean_time, std_time])
-    return benchmark_result
+    records = harness.run(LogParser, log_file, parsing_times, **kwargs)
+    summary = harness.summarize(records)
+    return [[dataset, summary["Time"]["Mean"], summary["Time"]["Std"]]]
 
 def benchmark_memory(dataset, LogParser, log_file, parsing_times=10, **kwargs):
-    benchmark_result = []
-    total_memo = []
-    for _ in range(parsing_times):        
-        parser = LogParser(**kwargs)
-        tracemalloc.start()
-        current, _ = tracemalloc.get_traced_memory()
-        parser.parse(log_file)
-        _, peak = tracemalloc.get_traced_memory()
-        total_memo.append((peak - current) / 1024)
-        tracemalloc.stop()
-    delta_series = pd.Series(total_memo)
-    mean_memo = delta_series.mean()
-    std_memo = delta_series.std()
-    benchmark_result.append([dataset, mean_memo, std_memo])
-    return benchmark_result
+    """Mean and standard deviation of the peak memory (RSS) in KB, see `harness`"""
+    records = harness.run(LogParser, log_file, parsing_times, **kwargs)
+    summary = harness.summarize(records)
+    return [[dataset, summary["Peak_RSS"]["Mean"], summary["Peak_RSS"]["Std"]]]
 
 def benchmark_cpu(dataset, LogParser, log_file, parsing_times=10, **kwargs):
-    benchmark_result = []
-    total_cpu = []
-    for _ in range(parsing_times):
-        parser = LogParser(**kwargs)
-        start_cpu = psutil.cpu_percent(interval=1.0)
-        print(start_cpu)
-        parser.parse(log_file)
-        cpu_percentage = psutil.cpu_percent(interval=None)
-        total_cpu.append(cpu_percentage)
-        delta_series = pd.Series(total_cpu)
-        mean_cpu = delta_series.mean()
-        std_cpu = delta_series.std()
-        benchmark_result.append([dataset, mean_cpu, std_cpu])
\ No newline at end of file
+    """Mean and standard deviation of the CPU utilization in %, see `harness`"""
+    records = harness.run(LogParser, log_file, parsing_times, **kwargs)
+    summary = harness.summarize(records)
+    return [[dataset, summary["CPU_percent"]["Mean"], summary["CPU_percent"]["Std"]]]
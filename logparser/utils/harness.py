@@ -0,0 +1,269 @@
+# =========================================================================
+# Copyright (C) 2016-2023 LOGPAI (https://github.com/logpai).
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+"""This file implements the harness to benchmark the efficiency of log parsers
+
+Every repetition parses the log file in a fresh process, so that memory
+left over by a previous run does not leak into the next measurement. The
+parse is timed with `time.perf_counter`, excluding the construction of
+the parser, while a background thread samples the resident (RSS) and
+unique (USS) memory of the process. With `profile=True` the parse is also
+broken down into the phases recorded by `logparser.utils.profiler`.
+"""
+
+import gc
+import time
+import threading
+import traceback
+import multiprocessing as mp
+import numpy as np
+import pandas as pd
+import psutil
+from . import profiler
+
+
+METRICS = ["Time", "CPU_time", "CPU_percent", "Peak_RSS", "Peak_USS"]
+STATISTICS = ["Median", "P95", "Min", "Mean", "Std"]
+
+# Seconds between two memory samples
+SAMPLE_INTERVAL = 0.02
+
+
+class MemorySampler(threading.Thread):
+    """Sample the peak memory of a process in a background thread
+
+    Attributes
+    ----------
+        peak_rss : int, peak resident set size in bytes
+        peak_uss : int, peak unique set size in bytes, 0 when unavailable
+    """
+
+    def __init__(self, process=None, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.process = process if process is not None else psutil.Process()
+        self.interval = interval
+        self.peak_rss = 0
+        self.peak_uss = 0
+        self._uss = True
+        self._stopped = threading.Event()
+
+    def run(self):
+        while True:
+            self.sample()
+            if self._stopped.wait(self.interval):
+                break
+
+    def sample(self):
+        if self._uss:
+            try:
+                info = self.process.memory_full_info()
+                self.peak_uss = max(self.peak_uss, info.uss)
+            except (psutil.AccessDenied, AttributeError):
+                self._uss = False
+                info = self.process.memory_info()
+        else:
+            info = self.process.memory_info()
+        self.peak_rss = max(self.peak_rss, info.rss)
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+        self.sample()
+
+
+def measure(
+    LogParser, log_file, sample_interval=SAMPLE_INTERVAL, profile=False, **kwargs
+):
+    """Parse `log_file` once in the current process and measure it
+
+    Returns
+    -------
+        record : dict
+            Time and CPU_time in seconds, CPU_percent, Peak_RSS and Peak_USS
+            in KB. CPU time includes the child processes that some parsers
+            launch, e.g. SLCT and LogCluster. With `profile`, `Profile` holds
+            the phase report of the parser, see `profiler.Profiler.report`.
+    """
+    process = psutil.Process()
+    parser = LogParser(**kwargs)
+    enabled = profiler.ENABLED
+    profiler.enable(profile or enabled)
+    gc.collect()
+    sampler = MemorySampler(process, sample_interval)
+    sampler.start()
+    start_cpu = process.cpu_times()
+    start_time = time.perf_counter()
+    try:
+        parser.parse(log_file)
+    finally:
+        end_time = time.perf_counter()
+        end_cpu = process.cpu_times()
+        sampler.stop()
+        profiler.enable(enabled)
+
+    wall_time = end_time - start_time
+    cpu_time = _cpu_time(end_cpu) - _cpu_time(start_cpu)
+    record = {
+        "Time": wall_time,
+        "CPU_time": cpu_time,
+        "CPU_percent": 100.0 * cpu_time / wall_time if wall_time else 0.0,
+        "Peak_RSS": sampler.peak_rss / 1024,
+        "Peak_USS": sampler.peak_uss / 1024,
+    }
+    if profile:
+        record["Profile"] = getattr(parser, "profiler", profiler.NULL_PROFILER).report()
+    return record
+
+
+def _cpu_time(cpu_times):
+    return (
+        cpu_times.user
+        + cpu_times.system
+        + getattr(cpu_times, "children_user", 0.0)
+        + getattr(cpu_times, "children_system", 0.0)
+    )
+
+
+def _measure_child(conn, LogParser, log_file, sample_interval, profile, kwargs):
+    try:
+        record = measure(LogParser, log_file, sample_interval, profile, **kwargs)
+        conn.send(("ok", record))
+    except BaseException:
+        conn.send(("error", traceback.format_exc()))
+    finally:
+        conn.close()
+
+
+def measure_isolated(
+    LogParser, log_file, sample_interval=SAMPLE_INTERVAL, profile=False, **kwargs
+):
+    """Same as `measure`, but parse in a freshly spawned process"""
+    ctx = mp.get_context("spawn")
+    parent_conn, child_conn = ctx.Pipe(duplex=False)
+    process = ctx.Process(
+        target=_measure_child,
+        args=(child_conn, LogParser, log_file, sample_interval, profile, kwargs),
+    )
+    process.start()
+    child_conn.close()
+    try:
+        status, result = parent_conn.recv()
+    except EOFError:
+        status, result = "error", "exit code {}".format(process.exitcode)
+    process.join()
+    if status != "ok":
+        raise RuntimeError("Benchmark run failed:\n{}".format(result))
+    return result
+
+
+def run(
+    LogParser,
+    log_file,
+    repeats=10,
+    warmup=1,
+    isolate=True,
+    sample_interval=SAMPLE_INTERVAL,
+    profile=False,
+    **kwargs
+):
+    """Repeatedly parse `log_file`, the results of warm-up runs are dropped
+
+    Arguments
+    ---------
+        LogParser : class of the parser, constructed with `kwargs`
+        log_file : str, file name passed to `LogParser.parse`
+        repeats : int, number of measured repetitions
+        warmup : int, number of repetitions run before measuring
+        isolate : bool, run each repetition in a fresh process
+        sample_interval : float, seconds between two memory samples
+        profile : bool, also record the phase report of each repetition
+
+    Returns
+    -------
+        records : list of dict, one per measured repetition, see `measure`
+    """
+    run_once = measure_isolated if isolate else measure
+    records = []
+    for idx in range(warmup + repeats):
+        record = run_once(LogParser, log_file, sample_interval, profile, **kwargs)
+        if idx >= warmup:
+            records.append(record)
+    return records
+
+
+def summarize(records):
+    """Median, 95th percentile, minimum, mean and standard deviation of records
+
+    Returns
+    -------
+        summary : dict, e.g. summary["Time"]["Median"]
+    """
+    summary = {}
+    for metric in METRICS:
+        values = pd.Series([record[metric] for record in records], dtype=float)
+        summary[metric] = _statistics(values)
+    return summary
+
+
+def summarize_profiles(records):
+    """Same as `summarize` for the phases of profiled records
+
+    Returns
+    -------
+        summary : dict, e.g. summary["Time_parse"]["Median"], the keys are
+            those of `profiler.flatten`
+    """
+    reports = [record.get("Profile") for record in records]
+    df_phases = pd.DataFrame(
+        [profiler.flatten(report) for report in reports if report is not None]
+    )
+    return {name: _statistics(df_phases[name]) for name in df_phases.columns}
+
+
+def _statistics(values):
+    return {
+        "Median": values.median(),
+        "P95": np.percentile(values, 95) if len(values) else np.nan,
+        "Min": values.min(),
+        "Mean": values.mean(),
+        "Std": values.std(),
+    }
+
+
+def benchmark(dataset, LogParser, log_file, repeats=10, warmup=1, **kwargs):
+    """Benchmark one dataset and flatten the summary into a result row
+
+    Returns
+    -------
+        row : dict, with the `Dataset` and `<metric>_<statistic>` columns,
+            and with `profile=True` the `Phase_<name>_Median` columns of the
+            parser phases
+    """
+    print("\n=== Evaluation on %s ===" % dataset)
+    records = run(LogParser, log_file, repeats, warmup, **kwargs)
+    summary = summarize(records)
+    row = {"Dataset": dataset}
+    for metric in METRICS:
+        for statistic in STATISTICS:
+            row["{}_{}".format(metric, statistic)] = summary[metric][statistic]
+    if kwargs.get("profile"):
+        for name, statistics in summarize_profiles(records).items():
+            row["Phase_{}_Median".format(name)] = statistics["Median"]
+    print(
+        "Time: {:.4f}s (median), {:.4f}s (p95), Peak_RSS: {:.0f}KB (median)".format(
+            row["Time_Median"], row["Time_P95"], row["Peak_RSS_Median"]
+        )
+    )
+    return row
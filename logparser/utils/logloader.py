@@ -15,31 +15,62 @@
 # =========================================================================
 """This file implements the formating interface to load log file to dataframe"""
 
+import os
+import io
+import bz2
+import glob
+import gzip
+import lzma
+import mmap
+import locale
 import multiprocessing as mp
-from itertools import groupby, count, chain
+from functools import lru_cache
+from itertools import groupby, count, chain, islice
 import pandas as pd
 import regex as re
 import numpy as np
 
 
+DEFAULT_BATCH_SIZE = 100000
+READ_BUFFER_SIZE = 1 << 20
+
+
 class LogLoader(object):
-    def __init__(self, logformat, n_workers=1):
+    def __init__(self, logformat, n_workers=1, use_mmap=False):
         if not logformat:
             raise RuntimeError("Logformat is required!")
         self.logformat = logformat.strip()
         self.headers, self.regex = self._generate_logformat_regex(self.logformat)
+        self.split = compile_logformat(self.logformat).split
         self.n_workers = n_workers
+        self.use_mmap = use_mmap
 
     def load_to_dataframe(self, log_filepath):
         """Function to transform log file to dataframe"""
         print("Loading log messages to dataframe...")
-        lines = []
-        with open(log_filepath, "r") as fid:
-            lines = fid.readlines()
+        if self.use_mmap and is_plain_file(log_filepath):
+            log_dataframe, num_lines = self._load_mmap(log_filepath)
+        else:
+            log_dataframe, num_lines = self._load_readlines(log_filepath)
+
+        if log_dataframe.empty:
+            raise RuntimeError("Logformat error or log file is empty!")
+        success_rate = len(log_dataframe) / float(num_lines)
+        print(
+            "Loading {} messages done, loading rate: {:.1%}".format(
+                len(log_dataframe), success_rate
+            )
+        )
+        return log_dataframe
+
+    def _load_readlines(self, log_filepath):
+        lines = list(iter_log_lines(log_filepath))
 
         log_messages = []
         if self.n_workers == 1:
-            log_messages = formalize_message(enumerate(lines), self.regex, self.headers)
+            log_messages = formalize_message(
+                enumerate(lines), self.regex, self.headers, self.split
+            )
         else:
             chunk_size = np.ceil(len(lines) / float(self.n_workers))
             chunks = groupby(
@@ -50,54 +81,538 @@ class LogLoader(object):
             pool = mp.Pool(processes=self.n_workers)
             result_chunks = [
                 pool.apply_async(
-                    formalize_message, args=(chunk, self.regex, self.headers)
+                    formalize_message, args=(chunk, self.regex, self.headers, self.split)
                 )
                 for chunk in log_chunks
             ]
             pool.close()
             pool.join()
             log_messages = list(chain(*[result.get() for result in result_chunks]))
-
-        if not log_messages:
-            raise RuntimeError("Logformat error or log file is empty!")
         log_dataframe = pd.DataFrame(log_messages, columns=["LineId"] + self.headers)
-        success_rate = len(log_messages) / float(len(lines))
-        print(
-            "Loading {} messages done, loading rate: {:.1%}".format(
-                len(log_messages), success_rate
-            )
+        return log_dataframe, len(lines)
+
+    def _load_mmap(self, log_filepath):
+        """Split a memory-mapped log file into byte-range shards
+
+        Every worker maps the same file and formalizes the lines of its own
+        shard, so only the parsed columns are sent back to the parent. Lines
+        are decoded and split as by `_load_readlines`, see `_MmapLines`.
+        Compressed or multiple log files cannot be mapped and are loaded
+        through `iter_log_lines` instead.
+        """
+        shards = mmap_shards(log_filepath, self.n_workers)
+        if self.n_workers == 1 or len(shards) <= 1:
+            results = [
+                formalize_range(
+                    log_filepath, start, end, self.regex, self.headers, self.split
+                )
+                for start, end in shards
+            ]
+        else:
+            print("Read %d log shards in parallel" % len(shards))
+            pool = mp.Pool(processes=self.n_workers)
+            result_shards = [
+                pool.apply_async(
+                    formalize_range,
+                    args=(
+                        log_filepath, start, end, self.regex, self.headers, self.split
+                    ),
+                )
+                for start, end in shards
+            ]
+            pool.close()
+            pool.join()
+            results = [result.get() for result in result_shards]
+
+        # Line ids inside a shard are local, offset them by the preceding shards
+        columns = [[] for _ in range(len(self.headers) + 1)]
+        num_lines = 0
+        for shard_lines, shard_columns in results:
+            columns[0].extend(line_id + num_lines for line_id in shard_columns[0])
+            for column, shard_column in zip(columns[1:], shard_columns[1:]):
+                column.extend(shard_column)
+            num_lines += shard_lines
+        log_dataframe = pd.DataFrame(
+            dict(zip(["LineId"] + self.headers, columns)),
+            columns=["LineId"] + self.headers,
         )
-        return log_dataframe
+        return log_dataframe, num_lines
 
     def _generate_logformat_regex(self, logformat):
         """Function to generate regular expression to split log messages"""
+        return generate_logformat_regex(logformat)
+
+
+def formalize_message(enumerated_lines, regex, headers, split=None):
+    if split is None:
+        split = regex_splitter(regex, headers)
+    log_messages = []
+    for line_count, line in enumerated_lines:
+        line = line.strip()
+        if not line:
+            continue
+        line = re.sub(r"[^\x00-\x7F]+", "<N/ASCII>", line)
+        message = split(line)
+        if message is None:
+            print("Skip line: " + line)
+            continue
+        message.insert(0, line_count + 1)
+        log_messages.append(message)
+    return log_messages
+
+
+def mmap_shards(log_filepath, n_shards):
+    """Compute byte ranges of a log file that start and end on line boundaries"""
+    size = os.path.getsize(log_filepath)
+    if size == 0:
+        return []
+    with open(log_filepath, "rb") as fid:
+        with mmap.mmap(fid.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            bounds = [0]
+            for k in range(1, n_shards):
+                pos = max(size * k // n_shards, bounds[-1])
+                newline = mm.find(b"\n", pos)
+                if newline == -1:
+                    break
+                if newline + 1 > bounds[-1]:
+                    bounds.append(newline + 1)
+    if bounds[-1] < size:
+        bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def formalize_range(log_filepath, start, end, regex, headers, split=None):
+    """Formalize the lines within a byte range of a memory-mapped log file
+
+    Returns the number of lines in the range and the parsed columns, with
+    `LineId` numbered from 1 within the range.
+    """
+    with open(log_filepath, "rb") as fid:
+        with mmap.mmap(fid.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            lines = _MmapLines(mm, start, end)
+            log_messages = formalize_message(enumerate(lines), regex, headers, split)
+    columns = [list(column) for column in zip(*log_messages)]
+    if not columns:
+        columns = [[] for _ in range(len(headers) + 1)]
+    return lines.count, columns
+
+
+class _MmapLines(object):
+    """Iterate the decoded lines of a byte range of a memory map
+
+    Lines are decoded and split as by `open_log` in text mode: with the
+    locale encoding and strict errors, and with `\r\n` and a lone `\r` as
+    line breaks as well as `\n`.
+    """
+
+    def __init__(self, mm, start, end):
+        self.mm = mm
+        self.start = start
+        self.end = end
+        self.encoding = locale.getpreferredencoding(False)
+        self.count = 0
+
+    def __iter__(self):
+        mm, pos, end = self.mm, self.start, self.end
+        while pos < end:
+            newline = mm.find(b"\n", pos, end)
+            if newline == -1:
+                newline = end
+            line = mm[pos:newline].decode(self.encoding)
+            pos = newline + 1
+            if "\r" not in line:
+                self.count += 1
+                yield line
+                continue
+            # A \r before the \n or at the end of the file ends the same line
+            if line.endswith("\r"):
+                line = line[:-1]
+            for part in line.split("\r"):
+                self.count += 1
+                yield part
+
+
+def _open_zstd(log_file):
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("zstandard is required to read zstd compressed logs!")
+    return zstandard.ZstdDecompressor().stream_reader(open(log_file, "rb"))
+
+
+# Compression formats detected from the magic bytes at the start of a file
+COMPRESSIONS = [
+    (b"\x1f\x8b", gzip.open),
+    (b"BZh", bz2.open),
+    (b"\xfd7zXZ\x00", lzma.open),
+    (b"\x28\xb5\x2f\xfd", _open_zstd),
+]
+
+
+def expand_log_files(log_file):
+    """Expand a log file, a glob pattern or a list of rotated log files
+
+    Glob patterns are expanded in sorted order; pass a list to read rotated
+    files in another order.
+    """
+    if isinstance(log_file, (list, tuple)):
+        return list(log_file)
+    if os.path.exists(log_file) or not any(c in log_file for c in "*?["):
+        return [log_file]
+    log_files = sorted(glob.glob(log_file))
+    if not log_files:
+        raise FileNotFoundError("No log file matches " + log_file)
+    return log_files
+
+
+def detect_compression(log_file):
+    """Return the opener of a compressed log file, None if not compressed"""
+    with open(log_file, "rb") as fid:
+        magic = fid.read(6)
+    for prefix, opener in COMPRESSIONS:
+        if magic.startswith(prefix):
+            return opener
+    return None
+
+
+def is_plain_file(log_file):
+    """Whether `log_file` is a single uncompressed file that can be mapped"""
+    log_files = expand_log_files(log_file)
+    return len(log_files) == 1 and detect_compression(log_files[0]) is None
+
+
+def open_log(log_file, encoding=None):
+    """Open a plain or compressed log file in text mode
+
+    Compressed files are decompressed on the fly in blocks of
+    `READ_BUFFER_SIZE` bytes, without writing them to disk.
+    """
+    opener = detect_compression(log_file)
+    if opener is None:
+        return open(log_file, "r", encoding=encoding, buffering=READ_BUFFER_SIZE)
+    raw = io.BufferedReader(opener(log_file), buffer_size=READ_BUFFER_SIZE)
+    return io.TextIOWrapper(raw, encoding=encoding)
+
+
+def iter_log_lines(log_file, encoding=None):
+    """Iterate the lines of one or more log files as a single stream"""
+    for path in expand_log_files(log_file):
+        with open_log(path, encoding) as fin:
+            for line in fin:
+                yield line
+
+
+@lru_cache(maxsize=None)
+def compile_logformat(logformat):
+    """Compile a log format once and reuse it for every parser and file"""
+    return LogFormat(logformat)
+
+
+def generate_logformat_regex(logformat):
+    """Function to generate regular expression to split log messages"""
+    log_format = compile_logformat(logformat)
+    return list(log_format.headers), log_format.regex
+
+
+def regex_splitter(regex, headers):
+    """Wrap a log format regex into a function returning the header values"""
+
+    def split(line):
+        match = regex.search(line)
+        if match is None:
+            return None
+        return [match.group(header) for header in headers]
+
+    return split
+
+
+# Characters that str.split() treats as whitespace but the regex does not
+_non_regex_space = re.compile(r"[\x1c-\x1f]").search
+
+
+class LogFormat(object):
+    """A compiled log format
+
+    Splitting a line with the `(?P<header>.*?)` regex backtracks over every
+    character of long `Content` fields. When all separators of the format
+    are plain literals, `split` walks the line with `str.find`/`str.split`
+    instead, taking at each header the same first choice as the regex. Any
+    line the fast path cannot split falls back to the regex, so the result is
+    always identical to `regex.search`.
+
+    Attributes
+    ----------
+        logformat : the log format string, e.g. `<Date> <Time> <Content>`
+        headers : tuple of header names
+        regex : compiled regular expression to split log messages
+    """
+
+    def __init__(self, logformat):
+        self.logformat = logformat
         headers = []
         splitters = re.split(r"(<[^<>]+>)", logformat)
         regex = ""
         for k in range(len(splitters)):
             if k % 2 == 0:
-                splitter = re.sub(" +", "\s+", splitters[k])
+                splitter = re.sub(" +", "\\\s+", splitters[k])
                 regex += splitter
             else:
                 header = splitters[k].strip("<").strip(">")
                 regex += "(?P<%s>.*?)" % header
                 headers.append(header)
-        regex = re.compile("^" + regex + "$")
-        return headers, regex
+        self.headers = tuple(headers)
+        self.regex = re.compile("^" + regex + "$")
+        self._literals = self._plain_literals(splitters)
 
+    def split(self, line):
+        """Split a stripped log line into header values, None if not matched"""
+        if self._literals is not None and not _non_regex_space(line):
+            values = self._fast_split(line)
+            if values is not None:
+                return values
+        match = self.regex.search(line)
+        if match is None:
+            return None
+        return [match.group(header) for header in self.headers]
 
-def formalize_message(enumerated_lines, regex, headers):
-    log_messages = []
-    for line_count, line in enumerated_lines:
-        line = line.strip()
-        if not line:
+    @staticmethod
+    def _plain_literals(splitters):
+        """Tokenize the separators of a format, None if any is not plain
+
+        Each separator becomes a tuple of literal strings and None for a run
+        of spaces, which the regex matches as a run of any whitespace.
+        Consecutive whitespace-only separators are merged into one step that
+        is split with a single `str.split` call.
+        """
+        literals = []
+        for k in range(0, len(splitters), 2):
+            tokens = _literal_tokens(splitters[k])
+            if tokens is None:
+                return None
+            literals.append(tokens)
+        if len(literals) < 2:
+            return None
+        prefix, separators, suffix = literals[0], literals[1:-1], literals[-1]
+        if any(not tokens for tokens in separators) or None in suffix:
+            return None
+        steps = []
+        for tokens in separators:
+            if tokens != (None,):
+                steps.append((0, tokens))
+            elif steps and steps[-1][0]:
+                steps[-1] = (steps[-1][0] + 1, tokens)
+            else:
+                steps.append((1, tokens))
+        return prefix, steps, "".join(suffix)
+
+    def _fast_split(self, line):
+        prefix, steps, suffix = self._literals
+        rest = _match_prefix(line, prefix) if prefix else line
+        if rest is None:
+            return None
+        values = []
+        for num_splits, tokens in steps:
+            if num_splits:
+                if rest[:1].isspace():
+                    return None
+                parts = rest.split(None, num_splits)
+                if len(parts) <= num_splits:
+                    return None
+                rest = parts.pop()
+                values.extend(parts)
+            else:
+                value, rest = _split_once(rest, tokens)
+                if rest is None:
+                    return None
+                values.append(value)
+        if not suffix:
+            values.append(rest)
+        elif rest.endswith(suffix):
+            values.append(rest[: len(rest) - len(suffix)])
+        else:
+            return None
+        return values
+
+
+def _literal_tokens(splitter):
+    chars = []
+    k = 0
+    while k < len(splitter):
+        char = splitter[k]
+        if char == "\\":
+            escaped = splitter[k + 1 : k + 2]
+            if not escaped or escaped.isalnum() or escaped.isspace() or escaped == "_":
+                return None
+            chars.append(escaped)
+            k += 2
             continue
-        line = re.sub(r"[^\x00-\x7F]+", "<N/ASCII>", line)
-        try:
-            match = regex.search(line)
-            message = [match.group(header) for header in headers]
-            message.insert(0, line_count + 1)
-            log_messages.append(message)
-        except Exception as e:
-            print("Skip line: " + line)
-    return log_messages
+        if char in ".^$*+?{}[]|()" or (char.isspace() and char != " "):
+            return None
+        chars.append(char)
+        k += 1
+    tokens = []
+    for word in re.split("( +)", "".join(chars)):
+        if word.startswith(" "):
+            tokens.append(None)
+        elif word:
+            tokens.append(word)
+    return tuple(tokens)
+
+
+def _match_prefix(line, tokens):
+    """Match a separator anchored at the start of the line, return the rest"""
+    for token in tokens:
+        if token is None:
+            stripped = line.lstrip()
+            if len(stripped) == len(line):
+                return None
+            line = stripped
+        elif line.startswith(token):
+            line = line[len(token) :]
+        else:
+            return None
+    return line
+
+
+def _split_once(rest, tokens):
+    """Split at the leftmost match of a separator, like a lazy regex group"""
+    lead_space = tokens[0] is None
+    literal = tokens[1] if lead_space else tokens[0]
+    remaining = tokens[2:] if lead_space else tokens[1:]
+    if not lead_space and not remaining:
+        value, found, rest = rest.partition(literal)
+        return (value, rest) if found else (None, None)
+    start = 0
+    if not lead_space and remaining == (None,):
+        while True:
+            idx = rest.find(literal, start)
+            if idx < 0:
+                return None, None
+            start = idx + len(literal)
+            if rest[start : start + 1].isspace():
+                return rest[:idx], rest[start:].lstrip()
+            start = idx + 1
+    while True:
+        idx = rest.find(literal, start)
+        if idx < 0:
+            return None, None
+        start = idx + 1
+        head = rest[:idx]
+        if lead_space:
+            value = head.rstrip()
+            if len(value) == len(head):
+                continue
+        else:
+            value = head
+        tail = _match_prefix(rest[idx + len(literal) :], remaining)
+        if tail is not None:
+            return value, tail
+
+
+class LogStream(object):
+    """Stream a log file as fixed-size batches of header-split records
+
+    The file is read lazily, so peak memory depends on `batch_size` rather
+    than on the size of the log file. Each batch is a dataframe with a
+    `LineId` column followed by the headers of the log format; `LineId`
+    numbers the successfully split records continuously across batches.
+    Compressed files (gzip, bz2, xz, zstd) are decompressed on the fly, and
+    several rotated files are read as one stream.
+
+    Arguments
+    ---------
+        log_file : str or list
+            file path, glob pattern or list of file paths of raw log files
+        regex : compiled regex with one named group per header
+        headers : list of header names
+        batch_size : int, number of records per yielded batch
+        nonascii : str, optional
+            replacement for runs of non-ASCII characters, None to keep them
+        encoding : str, optional
+            encoding used to open the log file
+        logformat : str, optional
+            log format of `regex`, enables the fast splitter of `LogFormat`
+
+    Attributes
+    ----------
+        total_lines : number of lines read so far
+        skipped_lines : number of lines that did not match the log format
+    """
+
+    def __init__(
+        self,
+        log_file,
+        regex,
+        headers,
+        batch_size=DEFAULT_BATCH_SIZE,
+        nonascii=None,
+        encoding=None,
+        logformat=None,
+    ):
+        self.log_file = log_file
+        self.regex = regex
+        self.headers = headers
+        self.batch_size = batch_size
+        self.nonascii = nonascii
+        self.encoding = encoding
+        if logformat is not None:
+            self.split = compile_logformat(logformat).split
+        else:
+            self.split = regex_splitter(regex, headers)
+        self.total_lines = 0
+        self.skipped_lines = 0
+
+    def __iter__(self):
+        self.total_lines = 0
+        self.skipped_lines = 0
+        line_id = 1
+        lines_iter = iter_log_lines(self.log_file, self.encoding)
+        while True:
+            lines = list(islice(lines_iter, self.batch_size))
+            if not lines:
+                break
+            records = self._split_lines(lines)
+            if not records:
+                continue
+            batch = pd.DataFrame(records, columns=self.headers)
+            batch.insert(0, "LineId", range(line_id, line_id + len(records)))
+            line_id += len(records)
+            yield batch
+
+    def _split_lines(self, lines):
+        records = []
+        split = self.split
+        for line in lines:
+            self.total_lines += 1
+            if self.nonascii is not None:
+                line = re.sub(r"[^\x00-\x7F]+", self.nonascii, line)
+            record = split(line.strip())
+            if record is None:
+                self.skipped_lines += 1
+                continue
+            records.append(record)
+        return records
+
+    def to_dataframe(self):
+        """Load all batches into a single dataframe"""
+        batches = list(self)
+        if not batches:
+            return pd.DataFrame(columns=["LineId"] + self.headers)
+        if len(batches) == 1:
+            return batches[0]
+        return pd.concat(batches, ignore_index=True)
+
+
+def log_to_dataframe(log_file, regex, headers, **kwargs):
+    """Function to transform log file to dataframe
+
+    Keyword arguments are passed to `LogStream`.
+    """
+    stream = LogStream(log_file, regex, headers, **kwargs)
+    logdf = stream.to_dataframe()
+    print(
+        "Total lines: {}, skipped lines: {}".format(
+            stream.total_lines, stream.skipped_lines
+        )
+    )
+    return logdf
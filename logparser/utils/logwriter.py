@@ -0,0 +1,196 @@
+# =========================================================================
+# Copyright (C) 2016-2023 LOGPAI (https://github.com/logpai).
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+"""This file implements the output interface to write and read parsing results"""
+
+import os
+import pandas as pd
+
+
+# File extension of each output format, csv is the default of all parsers
+OUTPUT_FORMATS = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}
+
+# Columns with few distinct values that are dictionary-encoded in columnar outputs
+DICTIONARY_COLUMNS = ["EventId", "EventTemplate"]
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("pyarrow is required for parquet and arrow outputs!")
+    return pyarrow
+
+
+def output_path(filepath, output_format="csv"):
+    """Replace the `.csv` extension of a result file path by that of `output_format`"""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError("Unknown output format: {}".format(output_format))
+    root, ext = os.path.splitext(filepath)
+    if ext != ".csv":
+        root = filepath
+    return root + OUTPUT_FORMATS[output_format]
+
+
+def write_output(dataframe, filepath, output_format="csv", **kwargs):
+    """Write a structured or templates result of a parser
+
+    Arguments
+    ---------
+        dataframe : pandas.DataFrame
+        filepath : str
+            csv file path of the result, e.g. `HDFS_2k.log_structured.csv`,
+            its extension is replaced for other output formats
+        output_format : str, one of `csv`, `parquet` and `arrow`
+        kwargs : passed to `DataFrame.to_csv`, only `columns` is used by the
+            columnar formats
+
+    Returns
+    -------
+        filepath : str, the path of the written file
+    """
+    filepath = output_path(filepath, output_format)
+    if output_format == "csv":
+        dataframe.to_csv(filepath, **kwargs)
+        return filepath
+
+    pa = _import_pyarrow()
+    if kwargs.get("columns") is not None:
+        dataframe = dataframe[kwargs["columns"]]
+    table = pa.Table.from_arrays(
+        [_to_arrow(pa, name, dataframe[name]) for name in dataframe.columns],
+        names=[str(name) for name in dataframe.columns],
+    )
+    if output_format == "parquet":
+        pa.parquet.write_table(table, filepath)
+    else:
+        with pa.OSFile(filepath, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+    return filepath
+
+
+def _to_arrow(pa, name, series):
+    if name in DICTIONARY_COLUMNS:
+        categories = series.astype("category")
+        categories = categories.cat.rename_categories(
+            categories.cat.categories.astype(str)
+        )
+        return pa.DictionaryArray.from_pandas(categories)
+    if name == "ParameterList":
+        paras_list = [
+            None if paras is None else [str(para) for para in paras]
+            for paras in series
+        ]
+        return pa.array(paras_list, type=pa.list_(pa.string()))
+    return pa.Array.from_pandas(series)
+
+
+def read_output(filepath, columns=None, **kwargs):
+    """Read a structured or templates result in any output format
+
+    The format is detected from the file extension. A `.csv` path also finds
+    a parquet or arrow result with the same name, so callers can keep using
+    the csv names of the benchmark settings. It is an error when results of
+    the same name exist in several formats, e.g. a stale csv result of an
+    earlier run next to a newer parquet one, pass the exact path then.
+
+    Arguments
+    ---------
+        filepath : str
+        columns : list, optional
+            only read these columns
+        kwargs : passed to `pandas.read_csv`
+
+    Returns
+    -------
+        dataframe : pandas.DataFrame
+    """
+    filepath = _find_output(filepath)
+    ext = os.path.splitext(filepath)[1]
+    if ext == OUTPUT_FORMATS["parquet"]:
+        pa = _import_pyarrow()
+        return pa.parquet.read_table(filepath, columns=columns).to_pandas()
+    if ext == OUTPUT_FORMATS["arrow"]:
+        pa = _import_pyarrow()
+        with pa.memory_map(filepath, "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+            if columns is not None:
+                table = table.select(columns)
+            return table.to_pandas()
+    return pd.read_csv(filepath, usecols=columns, **kwargs)
+
+
+def read_output_chunks(filepath, columns=None, chunksize=100000, **kwargs):
+    """Iterate over a structured or templates result in chunks of dataframes
+
+    Chunks of parquet and arrow results follow the row groups and record
+    batches of the file, so their sizes may differ from `chunksize`.
+
+    Arguments
+    ---------
+        filepath : str
+        columns : list, optional
+            only read these columns
+        chunksize : int
+            number of lines of each chunk of csv and parquet results
+        kwargs : passed to `pandas.read_csv`
+
+    Returns
+    -------
+        chunks : iterator of pandas.DataFrame
+    """
+    filepath = _find_output(filepath)
+    ext = os.path.splitext(filepath)[1]
+    if ext == OUTPUT_FORMATS["parquet"]:
+        pa = _import_pyarrow()
+        parquet_file = pa.parquet.ParquetFile(filepath)
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    elif ext == OUTPUT_FORMATS["arrow"]:
+        pa = _import_pyarrow()
+        with pa.memory_map(filepath, "r") as source:
+            reader = pa.ipc.open_file(source)
+            for idx in range(reader.num_record_batches):
+                batch = reader.get_batch(idx)
+                if columns is not None:
+                    batch = batch.select(columns)
+                yield batch.to_pandas()
+    else:
+        # Readers are context managers only from pandas 1.2
+        reader = pd.read_csv(filepath, usecols=columns, chunksize=chunksize, **kwargs)
+        try:
+            for chunk in reader:
+                yield chunk
+        finally:
+            reader.close()
+
+
+def _find_output(filepath):
+    """Find the result of a `.csv` path in any output format"""
+    if not filepath.endswith(".csv"):
+        return filepath
+    candidates = [
+        output_path(filepath, output_format)
+        for output_format in OUTPUT_FORMATS
+        if os.path.exists(output_path(filepath, output_format))
+    ]
+    if len(candidates) > 1:
+        raise ValueError(
+            "Results in several formats, remove the stale ones or pass the "
+            "exact path: {}".format(", ".join(candidates))
+        )
+    return candidates[0] if candidates else filepath
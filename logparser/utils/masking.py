@@ -0,0 +1,89 @@
+# =========================================================================
+# Copyright (C) 2016-2023 LOGPAI (https://github.com/logpai).
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+"""This file implements the masking of variables in log messages
+
+Parsers mask the parts of a log message matched by the regular expressions of
+a dataset, e.g. `benchmark_settings[dataset]["regex"]`, before parsing it.
+Instead of one `re.sub` per expression, `Masker` compiles all of them into a
+single alternation and replaces every match in one scan of the message:
+
+    masker = masking.get_masker(rex)
+    line = masker.mask(line)
+    lines = masker.mask_lines(lines)
+
+At each position the expressions are tried in their list order, so a single
+scan gives the same result as applying them one after the other, unless an
+expression matches across or inside the text masked by an earlier one. Since
+this depends on the expressions, they are applied one after the other unless
+`single_pass=True` is passed to `get_masker`, or to the parsers, e.g. by the
+benchmark scripts for the settings of the loghub datasets, whose results were
+checked to be the same.
+"""
+
+from functools import lru_cache
+import regex as re
+
+
+class Masker:
+    def __init__(self, patterns, replacement="<*>", single_pass=False):
+        """
+        Arguments
+        ---------
+            patterns : list of str, regular expressions of the variables, they
+                must not refer to their groups by number, e.g. `\\1`
+            replacement : str, replacement of every match
+            single_pass : bool, match all expressions in one scan, otherwise
+                apply them one after the other
+        """
+        self.patterns = list(patterns)
+        self.replacement = replacement
+        self.single_pass = single_pass
+        if single_pass and len(self.patterns) > 1:
+            self.compiled = [
+                re.compile(
+                    "|".join(
+                        "(?P<m{}>{})".format(idx, pattern)
+                        for idx, pattern in enumerate(self.patterns)
+                    )
+                )
+            ]
+        else:
+            self.compiled = [re.compile(pattern) for pattern in self.patterns]
+
+    def mask(self, line):
+        for pattern in self.compiled:
+            line = pattern.sub(self.replacement, line)
+        return line
+
+    def mask_lines(self, lines):
+        """Mask a list of log messages, see `mask`"""
+        if not self.compiled:
+            return list(lines)
+        if len(self.compiled) == 1:
+            sub = self.compiled[0].sub
+            replacement = self.replacement
+            return [sub(replacement, line) for line in lines]
+        return [self.mask(line) for line in lines]
+
+
+@lru_cache(maxsize=128)
+def _get_masker(patterns, replacement, single_pass):
+    return Masker(patterns, replacement, single_pass)
+
+
+def get_masker(patterns, replacement="<*>", single_pass=False):
+    """Return a shared `Masker`, expressions are compiled once per list"""
+    return _get_masker(tuple(patterns), replacement, single_pass)
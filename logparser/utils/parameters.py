@@ -0,0 +1,77 @@
+# =========================================================================
+# Copyright (C) 2016-2023 LOGPAI (https://github.com/logpai).
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+"""This file implements the extraction of parameters from parsed log messages
+
+The parameters of a log message are the parts of its content matched by the
+`<*>` wildcards of its template. Each distinct template is turned into a
+regular expression once, and the rows of a result are extracted template by
+template:
+
+    df_log["ParameterList"] = parameters.extract_parameters(df_log)
+"""
+
+from functools import lru_cache
+import regex as re
+
+
+@lru_cache(maxsize=4096)
+def template_regex(template):
+    """Compile the regular expression of a template, None without wildcards"""
+    template_regex = re.sub(r"<.{1,5}>", "<*>", template)
+    if "<*>" not in template_regex:
+        return None
+    template_regex = re.sub(r"([^A-Za-z0-9])", r"\\\1", template_regex)
+    template_regex = re.sub(r"\\ +", r"\\s+", template_regex)
+    template_regex = "^" + template_regex.replace(r"\<\*\>", "(.*?)") + "$"
+    return re.compile(template_regex)
+
+
+def get_parameter_list(template, content):
+    """Return the parameters of one log message as a list of str"""
+    pattern = template_regex(template)
+    if pattern is None:
+        return []
+    match = pattern.match(content)
+    return list(match.groups()) if match else []
+
+
+def extract_parameters(df_log, template_column="EventTemplate"):
+    """Return the parameters of every row of a structured result
+
+    Arguments
+    ---------
+        df_log : pandas.DataFrame, with the `Content` and `template_column`
+            columns
+        template_column : str, column of the templates
+
+    Returns
+    -------
+        paras : list of list of str, the parameters of each row in order
+    """
+    contents = df_log["Content"].tolist()
+    paras = [None] * len(contents)
+    groups = df_log.groupby(template_column, sort=False, dropna=False).indices
+    for template, indices in groups.items():
+        pattern = template_regex(template) if isinstance(template, str) else None
+        if pattern is None:
+            for idx in indices:
+                paras[idx] = []
+            continue
+        match = pattern.match
+        for idx in indices:
+            result = match(contents[idx])
+            paras[idx] = list(result.groups()) if result else []
+    return paras
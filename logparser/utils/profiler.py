@@ -0,0 +1,179 @@
+# =========================================================================
+# Copyright (C) 2016-2023 LOGPAI (https://github.com/logpai).
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+"""This file implements the per-phase instrumentation of log parsers
+
+Each parser records its phases, e.g. `load`, `parse` and `output`, and a few
+counters while parsing:
+
+    self.profiler = profiler.start("Drain")
+    with self.profiler.phase("load"):
+        self.load_data()
+    self.profiler.count("lines", len(self.df_log))
+
+and `parser.profiler.report()` returns the phase times in seconds, the
+counters and the peak memory in KB at the end of each phase. The peak memory
+is that of the whole process so far, so it never decreases from one phase to
+the next, and a phase only raises it when it uses more memory than all
+earlier phases.
+
+Profiling is disabled by default, `start` then returns a shared no-op
+profiler, so the instrumented code costs nothing. Enable it with
+`profiler.enable()` or with the environment variable `LOGPARSER_PROFILE=1`.
+"""
+
+import os
+import json
+import time
+import contextlib
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+    import psutil
+
+
+ENABLED = os.environ.get("LOGPARSER_PROFILE", "0") not in ("", "0")
+
+
+def enable(enabled=True):
+    """Turn the profiling of parsers started afterwards on or off"""
+    global ENABLED
+    ENABLED = enabled
+
+
+def start(name):
+    """Return a new profiler for a parse of parser `name` when profiling is enabled"""
+    if ENABLED:
+        return Profiler(name)
+    return NULL_PROFILER
+
+
+def peak_memory():
+    """Peak resident memory of the current process so far in KB"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in KB elsewhere
+        return peak / 1024 if os.uname().sysname == "Darwin" else peak
+    return psutil.Process().memory_info().peak_wset / 1024
+
+
+class Profiler:
+    enabled = True
+
+    def __init__(self, name):
+        self.name = name
+        self.phases = {}
+        self.counters = {}
+        self.peak_memory = {}
+        self._start = time.perf_counter()
+        self._end = self._start
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Time the enclosed block, repeated phases of the same name add up"""
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self._end = time.perf_counter()
+            self.phases[name] = self.phases.get(name, 0.0) + self._end - start
+            self.peak_memory[name] = peak_memory()
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def report(self):
+        """Return the phases, counters and peak memory as a dict
+
+        `peak_memory[name]` is the peak of the process when phase `name`
+        last ended, not the memory used by the phase itself.
+        """
+        return {
+            "parser": self.name,
+            "total": self._end - self._start,
+            "phases": dict(self.phases),
+            "counters": dict(self.counters),
+            "peak_memory": dict(self.peak_memory),
+        }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.report(), **kwargs)
+
+
+class NullPhase:
+    """Context manager that does nothing, `contextlib.nullcontext` needs 3.7"""
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class NullProfiler:
+    """Profiler used when profiling is disabled, all methods do nothing"""
+
+    enabled = False
+    _null_phase = NullPhase()
+
+    def phase(self, name):
+        return self._null_phase
+
+    def count(self, name, value=1):
+        pass
+
+    def report(self):
+        return None
+
+    def to_json(self, **kwargs):
+        return json.dumps(None)
+
+
+NULL_PROFILER = NullProfiler()
+
+
+def flatten(report):
+    """Flatten a report into one row, e.g. for a csv file of benchmark results"""
+    row = {"Total": report["total"]}
+    for name, seconds in report["phases"].items():
+        row["Time_" + name] = seconds
+    for name, value in report["counters"].items():
+        row["Count_" + name] = value
+    row["Peak_memory"] = max(report["peak_memory"].values(), default=float("nan"))
+    return row
+
+
+def write_reports(reports, filepath):
+    """Write reports of several datasets as a csv file of phase breakdowns
+
+    Arguments
+    ---------
+        reports : dict, dataset name -> report, or list of (dataset, report)
+        filepath : str, e.g. `Drain_time_phases.csv`
+    """
+    items = reports.items() if isinstance(reports, dict) else reports
+    rows = [
+        dict(Dataset=dataset, **flatten(report))
+        for dataset, report in items
+        if report is not None
+    ]
+    df_result = pd.DataFrame(rows)
+    if len(rows):
+        df_result.set_index("Dataset", inplace=True)
+    df_result.to_csv(filepath, float_format="%.6f")
+    return df_result
@@ -0,0 +1,403 @@
+# =========================================================================
+# Copyright (C) 2016-2023 LOGPAI (https://github.com/logpai).
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+"""This file implements the runner of the accuracy benchmark of all parsers
+
+Every (parser, dataset) cell of the benchmark is independent, so the runner
+parses them in parallel, each in its own process pinned to one CPU and
+killed after a timeout. A cell runs the `benchmark_accuracy` function of
+the `benchmark.py` of the parser restricted to one dataset of its
+`benchmark_settings`, in a working directory of its own. Finished cells are
+merged into `<result_dir>/<Parser>_benchmark_result.csv` as soon as they
+complete. Cells already in these files are skipped, so an interrupted run
+resumes where it stopped:
+
+    python -m logparser.utils.runner --parsers Drain Spell --workers 8
+
+The efficiency benchmarks, e.g. `benchmark_time`, are not run here since
+parallel runs would disturb their measurements, see `harness.py`.
+"""
+
+import os
+import sys
+import ast
+import json
+import time
+import signal
+import argparse
+import importlib
+import subprocess
+import pandas as pd
+from collections import deque
+from . import const
+
+
+# Parsers of `tests/eval_all.sh`, in the same order
+PARSERS = [
+    "AEL",
+    "Drain",
+    "IPLoM",
+    "LenMa",
+    "LFA",
+    "LKE",
+    "LogCluster",
+    "LogMine",
+    "LogSig",
+    "MoLFI",
+    "SHISO",
+    "SLCT",
+    "Spell",
+    "Brain",
+    "OSPattern",
+]
+
+# Parsers that run binaries and write temporary files relative to their own
+# directory. Their cells run there, one at a time.
+DIRECTORY_BOUND = ["SLCT"]
+
+# Relative data directories of `const`, resolved from the parser directories
+DATA_DIRS = ["input_dir", "corrected_input_dir", "all_log_input_dir"]
+
+# Suffix of the result files written by the benchmark scripts
+SCRIPT_RESULT_SUFFIX = "_bechmark_result.csv"
+RESULT_SUFFIX = "_benchmark_result.csv"
+RESULT_COLUMNS = ["Dataset", "F1_measure", "Accuracy"]
+
+# Seconds between two polls of the running cells
+POLL_INTERVAL = 0.5
+
+HOME = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_benchmark(parser):
+    """Read the accuracy benchmark of a parser from its `benchmark.py`
+
+    The script is parsed rather than imported, so the discovery does not
+    import the dependencies of every parser.
+
+    Returns
+    -------
+        settings : dict, dataset name -> setting, the `benchmark_settings`
+        function : str, name of the accuracy benchmark function
+        name : str, prefix of the result file, e.g. `Lenma` for LenMa
+    """
+    filepath = os.path.join(HOME, parser, "benchmark.py")
+    with open(filepath, "r") as fr:
+        tree = ast.parse(fr.read(), filepath)
+
+    settings, function, name = None, None, parser
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(
+            isinstance(target, ast.Name) and target.id == "benchmark_settings"
+            for target in node.targets
+        ):
+            settings = ast.literal_eval(node.value)
+        elif isinstance(node, ast.FunctionDef) and node.name.endswith("_accuracy"):
+            function = node.name
+            for child in ast.walk(node):
+                value = _string_literal(child)
+                if value is not None and value.endswith(SCRIPT_RESULT_SUFFIX):
+                    name = value[: -len(SCRIPT_RESULT_SUFFIX)]
+    if settings is None or function is None:
+        raise ValueError("No accuracy benchmark found in {}".format(filepath))
+    return settings, function, name
+
+
+def _string_literal(node):
+    """Value of a string literal node, ast.Str before Python 3.8"""
+    if isinstance(node, ast.Constant):
+        value = node.value
+    elif isinstance(node, getattr(ast, "Str", ())):
+        value = node.s
+    else:
+        return None
+    return value if isinstance(value, str) else None
+
+
+def discover(parsers=None, datasets=None):
+    """List the (parser, dataset) cells of the accuracy benchmark
+
+    Arguments
+    ---------
+        parsers : list of str, defaults to `PARSERS`
+        datasets : list of str, optional, only keep these datasets
+
+    Returns
+    -------
+        benchmarks : dict, parser -> (settings, function, name), see
+            `load_benchmark`
+        cells : list of (parser, dataset)
+    """
+    benchmarks = {}
+    cells = []
+    for parser in parsers or PARSERS:
+        benchmarks[parser] = load_benchmark(parser)
+        for dataset in benchmarks[parser][0]:
+            if datasets is None or dataset in datasets:
+                cells.append((parser, dataset))
+    return benchmarks, cells
+
+
+def result_path(result_dir, name):
+    return os.path.join(result_dir, name + RESULT_SUFFIX)
+
+
+def load_results(result_dir, name):
+    """Rows of a result file, indexed by dataset, empty when it does not exist"""
+    filepath = result_path(result_dir, name)
+    if not os.path.isfile(filepath):
+        return pd.DataFrame(columns=RESULT_COLUMNS).set_index("Dataset")
+    return pd.read_csv(filepath, index_col="Dataset")
+
+
+def merge_result(result_dir, name, order, row):
+    """Add or replace the row of one dataset in a result file
+
+    Rows follow the order of the datasets in `benchmark_settings`, and the
+    file is replaced atomically so that an interrupted run never leaves a
+    truncated result behind.
+    """
+    df_result = load_results(result_dir, name)
+    df_result.loc[row["Dataset"]] = [row[column] for column in RESULT_COLUMNS[1:]]
+    position = {dataset: idx for idx, dataset in enumerate(order)}
+    df_result = df_result.iloc[
+        sorted(
+            range(len(df_result)),
+            key=lambda idx: position.get(df_result.index[idx], len(order)),
+        )
+    ]
+    df_result.index.name = "Dataset"
+    if not os.path.isdir(result_dir):
+        os.makedirs(result_dir)
+    filepath = result_path(result_dir, name)
+    df_result.to_csv(filepath + ".tmp", float_format="%.6f")
+    os.replace(filepath + ".tmp", filepath)
+
+
+def run_cell(parser, dataset, cell_dir):
+    """Run the accuracy benchmark of one dataset, in the process of the cell
+
+    The row of the dataset is written to `cell_dir/result.json`.
+    """
+    settings, function, name = load_benchmark(parser)
+    parser_dir = os.path.join(HOME, parser)
+    cell_dir = os.path.abspath(cell_dir)
+    module = importlib.import_module("logparser.{}.benchmark".format(parser))
+    for attr in DATA_DIRS:
+        data_dir = os.path.abspath(os.path.join(parser_dir, getattr(const, attr)))
+        data_dir = os.path.join(data_dir, "")
+        setattr(const, attr, data_dir)
+        if hasattr(module, attr):
+            setattr(module, attr, data_dir)
+    module.benchmark_settings = {dataset: settings[dataset]}
+    module.output_dir = os.path.join(cell_dir, name + "_result", "")
+
+    os.chdir(parser_dir if parser in DIRECTORY_BOUND else cell_dir)
+    getattr(module, function)()
+    df_result = pd.read_csv(name + SCRIPT_RESULT_SUFFIX, index_col="Dataset")
+    row = {"Dataset": dataset}
+    for column in RESULT_COLUMNS[1:]:
+        row[column] = float(df_result.loc[dataset, column])
+    with open(os.path.join(cell_dir, "result.json"), "w") as fw:
+        json.dump(row, fw)
+
+
+def available_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _start_cell(parser, dataset, cell_dir, cpu):
+    if not os.path.isdir(cell_dir):
+        os.makedirs(cell_dir)
+    result_file = os.path.join(cell_dir, "result.json")
+    if os.path.exists(result_file):
+        os.remove(result_file)
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [os.path.dirname(HOME)] + env.get("PYTHONPATH", "").split(os.pathsep)
+    ).rstrip(os.pathsep)
+    # One CPU per cell, numeric libraries must not start more threads
+    for variable in ["OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"]:
+        env[variable] = "1"
+
+    def pin():
+        if cpu is not None:
+            os.sched_setaffinity(0, {cpu})
+
+    log = open(os.path.join(cell_dir, "run.log"), "w")
+    command = [sys.executable, "-m", "logparser.utils.runner", "--cell"]
+    command += [parser, dataset, "--work-dir", cell_dir]
+    process = subprocess.Popen(
+        command,
+        cwd=cell_dir,
+        env=env,
+        stdout=log,
+        stderr=subprocess.STDOUT,
+        preexec_fn=pin if os.name == "posix" else None,
+        start_new_session=os.name == "posix",
+    )
+    log.close()
+    return process
+
+
+def _kill(process):
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+    process.wait()
+
+
+def run(
+    parsers=None,
+    datasets=None,
+    workers=None,
+    timeout=3600,
+    result_dir="BenchmarkResult",
+    work_dir="BenchmarkRuns",
+    pin=True,
+    force=False,
+):
+    """Run the accuracy benchmark of several parsers in parallel
+
+    Arguments
+    ---------
+        parsers : list of str, defaults to `PARSERS`
+        datasets : list of str, optional, only run these datasets
+        workers : int, number of cells run at the same time, defaults to the
+            number of available CPUs
+        timeout : float, seconds after which a cell is killed, None to wait
+        result_dir : str, directory of the merged `*_benchmark_result.csv`
+        work_dir : str, working directories, parsing results and logs of cells
+        pin : bool, pin each cell to its own CPU
+        force : bool, also run the cells already in the result files
+
+    Returns
+    -------
+        failures : dict, (parser, dataset) -> `failed` or `timeout`
+    """
+    benchmarks, cells = discover(parsers, datasets)
+    if not force:
+        done = {
+            parser: set(load_results(result_dir, name).dropna().index)
+            for parser, (_, _, name) in benchmarks.items()
+        }
+        skipped = [cell for cell in cells if cell[1] in done[cell[0]]]
+        cells = [cell for cell in cells if cell[1] not in done[cell[0]]]
+        if skipped:
+            print("Skip {} cells already in {}".format(len(skipped), result_dir))
+    work_dir = os.path.abspath(work_dir)
+
+    cpus = available_cpus()
+    workers = workers or len(cpus)
+    pin = pin and hasattr(os, "sched_setaffinity")
+    # Each slot of the pool is pinned to a CPU, round-robin if workers > cpus
+    free_slots = deque(cpus[idx % len(cpus)] if pin else None for idx in range(workers))
+    pending = deque(cells)
+    running = {}
+    failures = {}
+    total = len(cells)
+    finished = 0
+    while pending or running:
+        busy = {cell[0] for cell, _, _ in running.values()}
+        for cell in list(pending):
+            if not free_slots:
+                break
+            if cell[0] in DIRECTORY_BOUND and cell[0] in busy:
+                continue
+            pending.remove(cell)
+            busy.add(cell[0])
+            cpu = free_slots.popleft()
+            cell_dir = os.path.join(work_dir, *cell)
+            process = _start_cell(cell[0], cell[1], cell_dir, cpu)
+            deadline = None if timeout is None else time.time() + timeout
+            running[process] = (cell, cpu, deadline)
+
+        time.sleep(POLL_INTERVAL)
+        for process, ((parser, dataset), cpu, deadline) in list(running.items()):
+            status = None
+            if process.poll() is not None:
+                status = "done" if process.returncode == 0 else "failed"
+            elif deadline is not None and time.time() > deadline:
+                _kill(process)
+                status = "timeout"
+            if status is None:
+                continue
+
+            del running[process]
+            free_slots.append(cpu)
+            finished += 1
+            cell_dir = os.path.join(work_dir, parser, dataset)
+            if status == "done":
+                settings, _, name = benchmarks[parser]
+                with open(os.path.join(cell_dir, "result.json"), "r") as fr:
+                    merge_result(result_dir, name, list(settings), json.load(fr))
+            else:
+                failures[(parser, dataset)] = status
+            print(
+                "[{}/{}] {} on {}: {}".format(finished, total, parser, dataset, status)
+            )
+
+    for (parser, dataset), status in failures.items():
+        log_file = os.path.join(work_dir, parser, dataset, "run.log")
+        print("{} on {} {}, see {}".format(parser, dataset, status, log_file))
+    return failures
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(
+        description="Run the accuracy benchmark of log parsers in parallel."
+    )
+    argparser.add_argument(
+        "--parsers", nargs="+", default=PARSERS, help="default: %(default)s"
+    )
+    argparser.add_argument("--datasets", nargs="+", help="default: all datasets")
+    argparser.add_argument("--workers", type=int, help="default: number of CPUs")
+    argparser.add_argument(
+        "--timeout", type=float, default=3600, help="seconds per cell, 0 to wait"
+    )
+    argparser.add_argument("--result-dir", default="BenchmarkResult")
+    argparser.add_argument("--work-dir", default="BenchmarkRuns")
+    argparser.add_argument("--no-pin", action="store_true", help="do not pin CPUs")
+    argparser.add_argument(
+        "--force", action="store_true", help="rerun cells already in the results"
+    )
+    argparser.add_argument("--cell", nargs=2, help=argparse.SUPPRESS)
+    args = argparser.parse_args(argv)
+
+    if args.cell:
+        run_cell(args.cell[0], args.cell[1], args.work_dir)
+        return 0
+    failures = run(
+        parsers=args.parsers,
+        datasets=args.datasets,
+        workers=args.workers,
+        timeout=args.timeout or None,
+        result_dir=args.result_dir,
+        work_dir=args.work_dir,
+        pin=not args.no_pin,
+        force=args.force,
+    )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -19,4 +19,5 @@ echo "=== Testing logmatch ===" && cd $home/logmatch && python demo.py &&\
 # echo "=== Testing NuLog ===" && cd $home/NuLog && python demo.py &&\
 echo "=== Testing Brain ===" && cd $home/Brain && python demo.py &&\
 # echo "=== Testing DivLog ===" && cd $home/DivLog && python demo.py &&\
+echo "=== Testing equivalence ===" && cd $home/../tests && python -m unittest -v test_equivalence &&\
 echo "All tests succeed!"
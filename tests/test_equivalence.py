@@ -0,0 +1,1069 @@
+# =========================================================================
+# Copyright (C) 2016-2023 LOGPAI (https://github.com/logpai).
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# =========================================================================
+"""Regression checks of the fast paths of the loaders, writers and parsers
+
+Each check compares a streaming, parallel, compressed or otherwise optimized
+path with the plain path it replaces, on the Loghub_2k logs in `data/`:
+
+    cd tests
+    python -m unittest -v test_equivalence
+"""
+
+import os
+import io
+import json
+import pickle
+import bz2
+import codecs
+import gzip
+import lzma
+import locale
+import sys
+import shutil
+import tempfile
+import warnings
+import contextlib
+import unittest
+
+HOME = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HOME, ".."))
+
+import numpy as np
+import pandas as pd
+import regex as re
+from logparser import Brain, Drain, Spell
+from logparser.utils import evaluator, logloader, logwriter, masking, parameters
+from logparser.utils import profiler
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+DATA_DIR = os.path.join(HOME, "..", "data", "loghub_2k")
+CORRECTED_DIR = os.path.join(HOME, "..", "data", "loghub_2k_corrected")
+
+DATASETS = {
+    "HDFS": {
+        "log_format": "<Date> <Time> <Pid> <Level> <Component>: <Content>",
+        "regex": [r"blk_-?\d+", r"(\d+\.){3}\d+(:\d+)?"],
+    },
+    "BGL": {
+        "log_format": "<Label> <Timestamp> <Date> <Node> <Time> <NodeRepeat> <Type> <Component> <Level> <Content>",
+        "regex": [r"core\.\d+"],
+    },
+    "Mac": {
+        "log_format": r"<Month>  <Date> <Time> <User> <Component>\[<PID>\]( \(<Address>\))?: <Content>",
+        "regex": [r"([\w-]+\.){2,}[\w-]+"],
+    },
+}
+
+
+def log_path(dataset):
+    return os.path.join(DATA_DIR, dataset, dataset + "_2k.log")
+
+
+def groundtruth_path(dataset):
+    return os.path.join(
+        CORRECTED_DIR, dataset, dataset + "_2k.log_structured_corrected.csv"
+    )
+
+
+def quiet():
+    """Silence the progress messages of loaders and parsers"""
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def load(log_file, log_format, **kwargs):
+    headers, regex = logloader.generate_logformat_regex(log_format)
+    with quiet():
+        return logloader.log_to_dataframe(log_file, regex, headers, **kwargs)
+
+
+def reference_load(log_file, log_format):
+    """Load a log file line by line like the parsers did before `LogStream`"""
+    headers, regex = logloader.generate_logformat_regex(log_format)
+    log_messages = []
+    with open(log_file, "r") as fin:
+        for line in fin.readlines():
+            match = regex.search(line.strip())
+            if match is not None:
+                log_messages.append([match.group(header) for header in headers])
+    logdf = pd.DataFrame(log_messages, columns=headers)
+    logdf.insert(0, "LineId", range(1, len(logdf) + 1))
+    return logdf
+
+
+class TempDirTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def drain(self, log_name, indir=None, dataset="HDFS", **kwargs):
+        """Parse a log file with Drain and return the structured dataframe"""
+        setting = DATASETS[dataset]
+        parser = Drain.LogParser(
+            setting["log_format"],
+            indir=indir or os.path.dirname(log_path(dataset)),
+            outdir=os.path.join(self.tmpdir, "result"),
+            rex=setting["regex"],
+            **kwargs
+        )
+        with quiet():
+            parser.parse(log_name)
+        return parser.df_log
+
+
+class TestLogStream(unittest.TestCase):
+    def test_batches_equal_line_by_line_load(self):
+        for dataset, setting in DATASETS.items():
+            expected = reference_load(log_path(dataset), setting["log_format"])
+            pd.testing.assert_frame_equal(
+                load(log_path(dataset), setting["log_format"]), expected
+            )
+            headers, regex = logloader.generate_logformat_regex(setting["log_format"])
+            stream = logloader.LogStream(log_path(dataset), regex, headers, 300)
+            batches = list(stream)
+            self.assertEqual(len(batches), -(-len(expected) // 300))
+            pd.testing.assert_frame_equal(
+                pd.concat(batches, ignore_index=True), expected
+            )
+            self.assertEqual(stream.total_lines, 2000)
+
+
+class TestLogLoader(TempDirTestCase):
+    def load(self, log_file, log_format, **kwargs):
+        loader = logloader.LogLoader(log_format, **kwargs)
+        with quiet():
+            return loader.load_to_dataframe(log_file)
+
+    def test_mmap_shards_equal_readlines(self):
+        for dataset, setting in DATASETS.items():
+            expected = self.load(log_path(dataset), setting["log_format"])
+            for n_workers in [1, 2, 3]:
+                for use_mmap in [False, True]:
+                    pd.testing.assert_frame_equal(
+                        self.load(
+                            log_path(dataset),
+                            setting["log_format"],
+                            n_workers=n_workers,
+                            use_mmap=use_mmap,
+                        ),
+                        expected,
+                    )
+
+    def test_mmap_shards_cover_file(self):
+        log_file = os.path.join(self.tmpdir, "small.log")
+        with open(log_file, "w") as fout:
+            fout.write("a 1\nb 2\n\nc 3")
+        for n_shards in range(1, 6):
+            shards = logloader.mmap_shards(log_file, n_shards)
+            self.assertEqual(shards[0][0], 0)
+            self.assertEqual(shards[-1][1], os.path.getsize(log_file))
+            for (_, end), (start, _) in zip(shards, shards[1:]):
+                self.assertEqual(end, start)
+            logdf = self.load(
+                log_file, "<Key> <Content>", n_workers=n_shards, use_mmap=True
+            )
+            self.assertEqual(logdf["Key"].tolist(), ["a", "b", "c"])
+
+    def test_mmap_lines_equal_text_lines(self):
+        log_file = os.path.join(self.tmpdir, "newlines.log")
+        with open(log_file, "wb") as fout:
+            fout.write(b"a 1\r\nb 2\rc 3\r\r\nd 4\n\re 5\xc3\xa9\r")
+        expected = self.load(log_file, "<Key> <Content>")
+        for n_workers in [1, 2, 4]:
+            pd.testing.assert_frame_equal(
+                self.load(
+                    log_file, "<Key> <Content>", n_workers=n_workers, use_mmap=True
+                ),
+                expected,
+            )
+
+        if codecs.lookup(locale.getpreferredencoding(False)).name != "utf-8":
+            return
+        with open(log_file, "wb") as fout:
+            fout.write(b"a 1\nb \xff\xfe\n")
+        for use_mmap in [False, True]:
+            with self.assertRaises(UnicodeDecodeError):
+                self.load(log_file, "<Key> <Content>", use_mmap=use_mmap)
+
+
+class TestLogFormat(unittest.TestCase):
+    def test_fast_split_equals_regex(self):
+        with warnings.catch_warnings():
+            # The benchmark settings predate raw strings for the log formats
+            warnings.simplefilter("ignore", DeprecationWarning)
+            from logparser.Drain.benchmark import benchmark_settings
+
+        for dataset, setting in benchmark_settings.items():
+            log_format = logloader.compile_logformat(
+                setting["log_format"]
+            )
+            split_regex = logloader.regex_splitter(
+                log_format.regex, log_format.headers
+            )
+            with open(log_path(dataset)) as fin:
+                lines = [line.strip() for line in fin]
+            # Unusual whitespace, missing separators and empty fields
+            for line in lines[:50]:
+                lines.append(line.replace(" ", "\t", 2))
+                lines.append(line.replace(" ", "  ", 3))
+                lines.append(line.replace(" ", "\x1c", 1))
+                lines.append(line[: len(line) // 2])
+            lines += ["", " ", ":", "[]"]
+            for line in lines:
+                self.assertEqual(
+                    log_format.split(line), split_regex(line), (dataset, line)
+                )
+
+
+class TestCompressedLogs(TempDirTestCase):
+    def setUp(self):
+        super(TestCompressedLogs, self).setUp()
+        with open(log_path("HDFS"), "rb") as fin:
+            self.data = fin.read()
+
+    def compressed_logs(self):
+        openers = [(".gz", gzip.open), (".bz2", bz2.open), (".xz", lzma.open)]
+        for suffix, opener in openers:
+            log_file = os.path.join(self.tmpdir, "HDFS_2k.log" + suffix)
+            with opener(log_file, "wb") as fout:
+                fout.write(self.data)
+            yield log_file
+        try:
+            import zstandard
+        except ImportError:
+            return
+        log_file = os.path.join(self.tmpdir, "HDFS_2k.log.zst")
+        with open(log_file, "wb") as fout:
+            fout.write(zstandard.ZstdCompressor().compress(self.data))
+        yield log_file
+
+    def test_compressed_equals_plain(self):
+        log_format = DATASETS["HDFS"]["log_format"]
+        expected = load(log_path("HDFS"), log_format)
+        expected_loader = logloader.LogLoader(log_format)
+        with quiet():
+            expected_loaded = expected_loader.load_to_dataframe(log_path("HDFS"))
+        expected_parsed = self.drain("HDFS_2k.log")
+        for log_file in self.compressed_logs():
+            self.assertIsNotNone(logloader.detect_compression(log_file))
+            pd.testing.assert_frame_equal(load(log_file, log_format), expected)
+            loader = logloader.LogLoader(log_format, use_mmap=True)
+            with quiet():
+                pd.testing.assert_frame_equal(
+                    loader.load_to_dataframe(log_file), expected_loaded
+                )
+            pd.testing.assert_frame_equal(
+                self.drain(os.path.basename(log_file), indir=self.tmpdir),
+                expected_parsed,
+            )
+
+    def test_rotated_files_equal_single_file(self):
+        log_format = DATASETS["HDFS"]["log_format"]
+        expected = load(log_path("HDFS"), log_format)
+        lines = self.data.splitlines(True)
+        log_files = []
+        for k, start in enumerate(range(0, len(lines), 700)):
+            log_file = os.path.join(self.tmpdir, "HDFS.log.{}.gz".format(k))
+            with gzip.open(log_file, "wb") as fout:
+                fout.writelines(lines[start : start + 700])
+            log_files.append(log_file)
+        pattern = os.path.join(self.tmpdir, "HDFS.log.*.gz")
+        self.assertEqual(logloader.expand_log_files(pattern), log_files)
+        for log_file in [log_files, pattern]:
+            pd.testing.assert_frame_equal(load(log_file, log_format), expected)
+
+
+def plain_frame(dataframe):
+    """Decode categorical columns and parameter arrays of a columnar result"""
+    dataframe = dataframe.copy()
+    for name in dataframe.columns:
+        if name == "ParameterList":
+            dataframe[name] = [list(paras) for paras in dataframe[name]]
+        elif isinstance(dataframe[name].dtype, pd.CategoricalDtype):
+            dataframe[name] = dataframe[name].astype(str)
+    return dataframe
+
+
+@unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+class TestColumnarOutput(TempDirTestCase):
+    def result_path(self, suffix):
+        return os.path.join(self.tmpdir, "result", "HDFS_2k.log_" + suffix)
+
+    def test_round_trip_equals_parsed(self):
+        for output_format in ["parquet", "arrow"]:
+            expected = self.drain("HDFS_2k.log", output_format=output_format)
+            filepath = self.result_path("structured.csv")
+            self.assertTrue(
+                os.path.exists(logwriter.output_path(filepath, output_format))
+            )
+            pd.testing.assert_frame_equal(
+                plain_frame(logwriter.read_output(filepath)),
+                expected,
+                check_dtype=False,
+            )
+            chunks = list(logwriter.read_output_chunks(filepath, chunksize=300))
+            if output_format == "parquet":
+                self.assertEqual(len(chunks), 7)
+            pd.testing.assert_frame_equal(
+                plain_frame(pd.concat(chunks, ignore_index=True)),
+                expected,
+                check_dtype=False,
+            )
+            templates = logwriter.read_output(self.result_path("templates.csv"))
+            self.assertEqual(templates["Occurrences"].sum(), len(expected))
+            self.assertEqual(
+                set(templates["EventTemplate"]), set(expected["EventTemplate"])
+            )
+            shutil.rmtree(os.path.join(self.tmpdir, "result"))
+
+    def test_stale_csv_is_ambiguous(self):
+        self.drain("HDFS_2k.log")
+        self.drain("HDFS_2k.log", output_format="parquet")
+        with self.assertRaises(ValueError):
+            logwriter.read_output(self.result_path("structured.csv"))
+        parquet_path = self.result_path("structured.parquet")
+        self.assertEqual(len(logwriter.read_output(parquet_path)), 2000)
+
+
+def reference_accuracy(series_groundtruth, series_parsedlog):
+    """Accuracy metrics computed one parsed event at a time as before"""
+
+    def pairs(counts):
+        return sum(count * (count - 1) // 2 for count in counts)
+
+    series_groundtruth = pd.Series(series_groundtruth)
+    series_parsedlog = pd.Series(series_parsedlog)
+    real_pairs = pairs(series_groundtruth.value_counts())
+    parsed_pairs = pairs(series_parsedlog.value_counts())
+    accurate_pairs = 0
+    accurate_events = 0
+    for parsed_eventId in series_parsedlog.value_counts().index:
+        logIds = series_parsedlog[series_parsedlog == parsed_eventId].index
+        groundtruth_counts = series_groundtruth[logIds].value_counts()
+        if groundtruth_counts.size == 1:
+            groundtruth_eventId = groundtruth_counts.index[0]
+            if logIds.size == (series_groundtruth == groundtruth_eventId).sum():
+                accurate_events += logIds.size
+        accurate_pairs += pairs(groundtruth_counts)
+    precision = float(accurate_pairs) / parsed_pairs
+    recall = float(accurate_pairs) / real_pairs
+    f_measure = 2 * precision * recall / (precision + recall)
+    accuracy = float(accurate_events) / series_groundtruth.size
+    return precision, recall, f_measure, accuracy
+
+
+class TestEvaluator(TempDirTestCase):
+    def assertAccuracyEqual(self, groundtruth, parsedlog):
+        for expected, actual in zip(
+            reference_accuracy(groundtruth, parsedlog),
+            evaluator.get_accuracy(groundtruth, parsedlog),
+        ):
+            self.assertAlmostEqual(expected, actual)
+
+    def test_contingency_table_equals_reference(self):
+        for dataset in DATASETS:
+            groundtruth = pd.read_csv(groundtruth_path(dataset))["EventId"]
+            parsedlog = self.drain(dataset + "_2k.log", dataset=dataset)["EventId"]
+            self.assertAccuracyEqual(groundtruth, parsedlog)
+
+        random = np.random.RandomState(0)
+        groundtruth = random.randint(0, 20, 1000).astype(str)
+        parsedlog = (random.randint(0, 10, 1000) * 3 % 25).astype(str)
+        self.assertAccuracyEqual(groundtruth, parsedlog)
+
+    def test_single_line_groups_raise(self):
+        groundtruth = pd.Series(["E1", "E1", "E2", "E3"])
+        parsedlog = pd.Series(["A", "B", "C", "D"])
+        for series_groundtruth in [groundtruth, parsedlog]:
+            with self.assertRaises(ZeroDivisionError):
+                reference_accuracy(series_groundtruth, parsedlog)
+            with warnings.catch_warnings():
+                warnings.simplefilter("error", RuntimeWarning)
+                with self.assertRaises(ZeroDivisionError):
+                    evaluator.get_accuracy(series_groundtruth, parsedlog)
+
+    def test_chunked_evaluation_equals_full(self):
+        groundtruth = groundtruth_path("HDFS")
+        self.drain("HDFS_2k.log")
+        parsedresult = os.path.join(
+            self.tmpdir, "result", "HDFS_2k.log_structured.csv"
+        )
+        with quiet():
+            expected = evaluator.evaluate(groundtruth, parsedresult)
+            for chunksize in [7, 300, 5000]:
+                self.assertEqual(
+                    evaluator.evaluate(groundtruth, parsedresult, chunksize),
+                    expected,
+                )
+
+        truncated = os.path.join(self.tmpdir, "truncated.csv")
+        pd.read_csv(parsedresult, nrows=1500).to_csv(truncated, index=False)
+        with self.assertRaises(ValueError):
+            evaluator.evaluate(groundtruth, truncated, chunksize=300)
+
+
+@unittest.skipIf(psutil is None, "psutil is not installed")
+class TestHarness(TempDirTestCase):
+    def drain_kwargs(self):
+        setting = DATASETS["HDFS"]
+        return dict(
+            log_format=setting["log_format"],
+            indir=os.path.dirname(log_path("HDFS")),
+            outdir=os.path.join(self.tmpdir, "result"),
+            rex=setting["regex"],
+        )
+
+    def test_run_records_every_metric(self):
+        from logparser.utils import harness
+
+        with quiet():
+            records = harness.run(
+                Drain.LogParser,
+                "HDFS_2k.log",
+                repeats=2,
+                warmup=1,
+                isolate=False,
+                **self.drain_kwargs()
+            )
+        self.assertEqual(len(records), 2)
+        for record in records:
+            self.assertEqual(sorted(record), sorted(harness.METRICS))
+            self.assertGreater(record["Time"], 0)
+            self.assertGreater(record["Peak_RSS"], 0)
+        summary = harness.summarize(records)
+        self.assertEqual(
+            summary["Time"]["Min"], min(record["Time"] for record in records)
+        )
+
+    def test_isolated_run_profiles_phases(self):
+        from logparser.utils import harness
+
+        with quiet():
+            row = harness.benchmark(
+                "HDFS",
+                Drain.LogParser,
+                "HDFS_2k.log",
+                repeats=1,
+                warmup=0,
+                profile=True,
+                **self.drain_kwargs()
+            )
+        for phase in ["load", "parse", "output"]:
+            self.assertGreater(row["Phase_Time_{}_Median".format(phase)], 0)
+        self.assertEqual(row["Phase_Count_lines_Median"], 2000)
+        self.assertGreater(row["Peak_USS_Median"], 0)
+
+
+class TestProfiler(TempDirTestCase):
+    def setUp(self):
+        super(TestProfiler, self).setUp()
+        self.enabled = profiler.ENABLED
+
+    def tearDown(self):
+        profiler.enable(self.enabled)
+        super(TestProfiler, self).tearDown()
+
+    def test_disabled_profiler_is_a_no_op(self):
+        profiler.enable(False)
+        prof = profiler.start("test")
+        self.assertIs(prof, profiler.NULL_PROFILER)
+        with prof.phase("parse") as phase:
+            self.assertIsNone(phase)
+        prof.count("lines")
+        self.assertIsNone(prof.report())
+
+    def test_phases_add_up(self):
+        profiler.enable(True)
+        prof = profiler.start("test")
+        for _ in range(3):
+            with prof.phase("parse"):
+                pass
+        prof.count("lines", 5)
+        prof.count("lines")
+        report = prof.report()
+        self.assertEqual(list(report["phases"]), ["parse"])
+        self.assertLessEqual(report["phases"]["parse"], report["total"])
+        self.assertEqual(report["counters"], {"lines": 6})
+        self.assertGreater(profiler.flatten(report)["Peak_memory"], 0)
+
+    def test_profiled_parse_equals_plain_parse(self):
+        profiler.enable(False)
+        expected = self.drain("HDFS_2k.log")
+        profiler.enable(True)
+        setting = DATASETS["HDFS"]
+        parser = Drain.LogParser(
+            setting["log_format"],
+            indir=os.path.dirname(log_path("HDFS")),
+            outdir=os.path.join(self.tmpdir, "profiled"),
+            rex=setting["regex"],
+        )
+        with quiet():
+            parser.parse("HDFS_2k.log")
+        pd.testing.assert_frame_equal(parser.df_log, expected)
+        report = parser.profiler.report()
+        self.assertEqual(sorted(report["phases"]), ["load", "output", "parse"])
+        self.assertEqual(report["counters"]["lines"], 2000)
+        self.assertEqual(report["counters"]["templates"], len(parser.logCluL))
+
+
+class TestRunner(TempDirTestCase):
+    def run_drain(self, datasets, result_dir, workers):
+        from logparser.utils import runner
+
+        result_dir = os.path.join(self.tmpdir, result_dir)
+        with quiet() as stdout, warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            failures = runner.run(
+                parsers=["Drain"],
+                datasets=datasets,
+                workers=workers,
+                result_dir=result_dir,
+                work_dir=os.path.join(self.tmpdir, "runs"),
+            )
+        self.assertEqual(failures, {})
+        df_result = runner.load_results(result_dir, "Drain")
+        return df_result, stdout.getvalue()
+
+    def test_resumed_parallel_run_equals_serial_run(self):
+        expected, _ = self.run_drain(["HDFS", "Apache"], "serial", 1)
+        self.assertEqual(list(expected.index), ["HDFS", "Apache"])
+        self.run_drain(["Apache"], "parallel", 2)
+        df_result, output = self.run_drain(["HDFS", "Apache"], "parallel", 2)
+        self.assertIn("Skip 1 cells", output)
+        pd.testing.assert_frame_equal(df_result, expected)
+
+    def test_result_names_of_scripts(self):
+        from logparser.utils import runner
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            self.assertEqual(runner.load_benchmark("LenMa")[2], "Lenma")
+            self.assertEqual(runner.load_benchmark("Drain")[2], "Drain")
+
+
+def cluster_list(parser):
+    """Templates and line ids of the clusters of a parser, in creation order"""
+    return [(logClust.logTemplate, logClust.logIDL) for logClust in parser.logCluL]
+
+
+class TestDrain(TempDirTestCase):
+    def parser(self, dataset="HDFS", outdir="result", **kwargs):
+        setting = DATASETS[dataset]
+        return Drain.LogParser(
+            setting["log_format"],
+            outdir=os.path.join(self.tmpdir, outdir),
+            rex=setting["regex"],
+            **kwargs
+        )
+
+    def test_stream_equals_parse(self):
+        for dataset in DATASETS:
+            expected = self.drain(dataset + "_2k.log", dataset=dataset)
+            lines = list(logloader.iter_log_lines(log_path(dataset)))
+            parser = self.parser(dataset, "stream")
+            results = list(parser.parse_stream(lines, dataset, flush_every=0))
+            df_stream = pd.read_csv(
+                os.path.join(self.tmpdir, "stream", dataset + "_structured.csv")
+            )
+            for column in ["LineId", "EventId", "EventTemplate"]:
+                self.assertEqual(
+                    df_stream[column].tolist(), expected[column].tolist()
+                )
+
+            parser = self.parser(dataset, "flushed", keep_para=False)
+            self.assertEqual(
+                list(parser.parse_stream(lines, dataset, flush_every=300)), results
+            )
+            self.assertEqual(parser.flushCount, 7)
+            df_flushed = pd.read_csv(
+                os.path.join(self.tmpdir, "flushed", dataset + "_structured.csv")
+            )
+            self.assertEqual(df_flushed["LineId"].tolist(), list(range(1, 2001)))
+
+    def contents(self, dataset):
+        log_format = logloader.compile_logformat(DATASETS[dataset]["log_format"])
+        content_idx = log_format.headers.index("Content")
+        records = [
+            log_format.split(line.strip())
+            for line in logloader.iter_log_lines(log_path(dataset))
+        ]
+        return [record[content_idx] for record in records if record is not None]
+
+    def test_snapshot_resume_equals_uninterrupted(self):
+        snapshot = os.path.join(self.tmpdir, "drain.snapshot")
+        for dataset in DATASETS:
+            contents = self.contents(dataset)
+            expected = self.parser(dataset, maxChild=8).add_log_messages(contents)
+            for cut in [1, 700, 1999]:
+                parser = self.parser(dataset, maxChild=8)
+                results = parser.add_log_messages(contents[:cut])
+                parser.save_snapshot(snapshot)
+                store = Drain.TemplateStore()
+                parser = Drain.LogParser.from_snapshot(snapshot, template_store=store)
+                self.assertIs(parser.template_store, store)
+                self.assertEqual(parser.maxChild, 8)
+                results += parser.add_log_messages(contents[cut:])
+                self.assertEqual(results, expected)
+
+        with open(snapshot, "wb") as fout:
+            fout.write(b"not a snapshot")
+        with self.assertRaises(ValueError):
+            Drain.LogParser.from_snapshot(snapshot)
+
+    def test_compact_clusters_and_nodes(self):
+        parser = self.parser(indir=os.path.dirname(log_path("HDFS")))
+        with quiet():
+            parser.parse("HDFS_2k.log")
+        for logClust in parser.logCluL:
+            self.assertFalse(hasattr(logClust, "__dict__"))
+            self.assertEqual(logClust.logIDL.typecode, Drain.Drain.LOGID_TYPECODE)
+            restored = pickle.loads(pickle.dumps(logClust))
+            self.assertEqual(restored.logTemplate, logClust.logTemplate)
+            self.assertEqual(restored.logIDL, logClust.logIDL)
+            self.assertEqual(restored.clusterId, logClust.clusterId)
+            self.assertEqual(restored.size, logClust.size)
+        self.assertFalse(hasattr(parser.rootNode, "__dict__"))
+        self.assertEqual(
+            cluster_list(pickle.loads(pickle.dumps(parser))), cluster_list(parser)
+        )
+        # Line ids of concatenated daily batches exceed 32 bits
+        logClust = Drain.Logcluster(logTemplate=["a"])
+        logClust.logIDL.append(2 ** 40)
+        self.assertEqual(list(logClust.logIDL), [2 ** 40])
+
+        snapshot = os.path.join(self.tmpdir, "drain.snapshot")
+        parser.save_snapshot(snapshot)
+        restored = Drain.LogParser.from_snapshot(snapshot)
+
+        def tree(node):
+            if isinstance(node.childD, list):
+                return [logClust.clusterId for logClust in node.childD]
+            return {key: tree(child) for key, child in node.childD.items()}
+
+        self.assertEqual(tree(restored.rootNode), tree(parser.rootNode))
+        self.assertEqual(
+            [(c.logTemplate, c.clusterId, c.size) for c in restored.logCluL],
+            [(c.logTemplate, c.clusterId, c.size) for c in parser.logCluL],
+        )
+        for logClust in restored.logCluL:
+            self.assertFalse(hasattr(logClust, "__dict__"))
+            self.assertEqual(len(logClust.logIDL), 0)
+            self.assertEqual(logClust.logIDL.typecode, Drain.Drain.LOGID_TYPECODE)
+
+    def test_sharded_parse_equals_serial(self):
+        for dataset in DATASETS:
+            expected = self.drain(dataset + "_2k.log", dataset=dataset)
+            for n_workers in [2, 3]:
+                pd.testing.assert_frame_equal(
+                    self.drain(
+                        dataset + "_2k.log", dataset=dataset, n_workers=n_workers
+                    ),
+                    expected,
+                )
+
+    def test_cached_parse_equals_uncached(self):
+        for dataset in DATASETS:
+            clusters = []
+            for cache_size in [0, 3, 100000]:
+                parser = self.parser(
+                    dataset,
+                    indir=os.path.dirname(log_path(dataset)),
+                    cache_size=cache_size,
+                )
+                with quiet():
+                    parser.parse(dataset + "_2k.log")
+                clusters.append(cluster_list(parser))
+                if not cache_size:
+                    self.assertEqual(parser.cache_info()["lookups"], 0)
+            self.assertEqual(clusters[1], clusters[0])
+            self.assertEqual(clusters[2], clusters[0])
+            self.assertGreater(parser.cache_info()["hits"], 0)
+
+    # Settings with wide and narrow leaves, and with and without wildcards
+    LEAF_SETTINGS = [
+        {},
+        {"maxChild": 3},
+        {"depth": 3},
+        {"st": 0.2},
+        {"st": 0.9, "maxChild": 2},
+    ]
+
+    def parse_contents(self, dataset, leaf_index_size, **kwargs):
+        """Cluster the contents of a dataset twice over, without cache"""
+        default_size = Drain.Drain.LEAF_INDEX_SIZE
+        Drain.Drain.LEAF_INDEX_SIZE = leaf_index_size
+        try:
+            parser = self.parser(dataset, cache_size=0, **kwargs)
+            for logID, content in enumerate(self.contents(dataset) * 2, 1):
+                logmessageL = parser.preprocess(content).strip().split()
+                parser.addSeq(logmessageL, logID).logIDL.append(logID)
+        finally:
+            Drain.Drain.LEAF_INDEX_SIZE = default_size
+        return cluster_list(parser)
+
+    def test_leaf_index_equals_scan(self):
+        for dataset in DATASETS:
+            for kwargs in self.LEAF_SETTINGS:
+                expected = self.parse_contents(dataset, 10 ** 9, **kwargs)
+                for leaf_index_size in [1, 8]:
+                    self.assertEqual(
+                        self.parse_contents(dataset, leaf_index_size, **kwargs),
+                        expected,
+                        (dataset, kwargs, leaf_index_size),
+                    )
+
+    def test_token_ids_equal_scan(self):
+        for dataset in DATASETS:
+            for kwargs in self.LEAF_SETTINGS + [{"st": 0.0}]:
+                expected = self.parse_contents(dataset, 10 ** 9, **kwargs)
+                for leaf_index_size in [1, 8]:
+                    self.assertEqual(
+                        self.parse_contents(
+                            dataset, leaf_index_size, token_ids=True, **kwargs
+                        ),
+                        expected,
+                        (dataset, kwargs, leaf_index_size),
+                    )
+            pd.testing.assert_frame_equal(
+                self.drain(dataset + "_2k.log", dataset=dataset, token_ids=True),
+                self.drain(dataset + "_2k.log", dataset=dataset),
+            )
+
+    def store_events(self, dataset, **kwargs):
+        """Parse a dataset and return the parser, its store and the callbacks"""
+        events_file = os.path.join(self.tmpdir, "events.jsonl")
+        if os.path.exists(events_file):
+            os.remove(events_file)
+        events = []
+        store = Drain.TemplateStore(
+            events_file, callback=lambda *event: events.append(event)
+        )
+        parser = self.parser(
+            dataset,
+            indir=os.path.dirname(log_path(dataset)),
+            template_store=store,
+            **kwargs
+        )
+        with quiet():
+            parser.parse(dataset + "_2k.log")
+        store.close()
+        with open(events_file) as fin:
+            file_events = [tuple(json.loads(line).values()) for line in fin]
+        self.assertEqual(file_events, events)
+        return parser, store, events
+
+    def test_template_store_follows_clusters(self):
+        for dataset in DATASETS:
+            parser, store, events = self.store_events(dataset)
+            for logClust in parser.logCluL:
+                self.assertEqual(
+                    store.template(logClust.clusterId), " ".join(logClust.logTemplate)
+                )
+                self.assertEqual(
+                    store.history[logClust.clusterId][0][0], logClust.logIDL[0]
+                )
+            self.assertEqual(store.events(), events)
+            line_ids = [event[3] for event in events]
+            self.assertEqual(line_ids, sorted(line_ids))
+            self.assertEqual(
+                self.store_events(dataset, n_workers=3)[2], events, dataset
+            )
+            self.assertEqual(self.store_events(dataset, token_ids=True)[2], events)
+
+
+class TestMasking(unittest.TestCase):
+    def test_benchmark_lists_mask_like_sequential_subs(self):
+        from logparser.utils import runner
+
+        for parser in ["AEL", "Brain", "Drain", "LenMa", "SHISO", "Spell"]:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", DeprecationWarning)
+                settings = runner.load_benchmark(parser)[0]
+            for dataset, setting in settings.items():
+                contents = pd.read_csv(
+                    os.path.join(DATA_DIR, dataset, dataset + "_2k.log_structured.csv")
+                )["Content"].tolist()
+                single = masking.Masker(setting["regex"], single_pass=True)
+                sequential = masking.Masker(setting["regex"])
+                self.assertEqual(
+                    single.mask_lines(contents),
+                    sequential.mask_lines(contents),
+                    (parser, dataset),
+                )
+
+    def test_single_pass_is_explicit(self):
+        patterns = [r"\d+", r"a\d"]
+        self.assertEqual(masking.get_masker(patterns).mask("a1 b2"), "a<*> b<*>")
+        self.assertEqual(
+            masking.get_masker(patterns, single_pass=True).mask("a1 b2"), "<*> b<*>"
+        )
+        for single_pass in [False, True]:
+            parsers = [
+                Drain.LogParser("<Content>", rex=patterns, single_pass=single_pass),
+                Spell.LogParser(rex=patterns, single_pass=single_pass),
+            ]
+            for parser in parsers:
+                self.assertEqual(parser.masker.single_pass, single_pass)
+
+
+def reference_parameter_list(row):
+    """Parameters of one row, with the regex built per row as before"""
+    template_regex = re.sub(r"<.{1,5}>", "<*>", row["EventTemplate"])
+    if "<*>" not in template_regex:
+        return []
+    template_regex = re.sub(r"([^A-Za-z0-9])", r"\\\1", template_regex)
+    template_regex = re.sub(r"\\ +", r"\\s+", template_regex)
+    template_regex = "^" + template_regex.replace(r"\<\*\>", "(.*?)") + "$"
+    parameter_list = re.findall(template_regex, row["Content"])
+    parameter_list = parameter_list[0] if parameter_list else ()
+    return (
+        list(parameter_list)
+        if isinstance(parameter_list, tuple)
+        else [parameter_list]
+    )
+
+
+class TestParameters(unittest.TestCase):
+    def test_extract_parameters_equals_per_row(self):
+        for dataset in sorted(os.listdir(CORRECTED_DIR)):
+            df_log = pd.read_csv(groundtruth_path(dataset))
+            self.assertEqual(
+                parameters.extract_parameters(df_log),
+                df_log.apply(reference_parameter_list, axis=1).tolist(),
+                dataset,
+            )
+        self.assertEqual(parameters.extract_parameters(df_log.iloc[:0]), [])
+
+
+class ReferenceSpell(Spell.LogParser):
+    """Spell comparing a message with every cluster, without the token index,
+    and walking the prefix tree recursively"""
+
+    def PrefixTreeMatch(self, parentn, seq, idx):
+        length = len(seq)
+        for i in range(idx, length):
+            if seq[i] in parentn.childD:
+                childn = parentn.childD[seq[i]]
+                if childn.logClust is not None:
+                    constLM = [w for w in childn.logClust.logTemplate if w != "<*>"]
+                    if float(len(constLM)) >= self.tau * length:
+                        return childn.logClust
+                else:
+                    return self.PrefixTreeMatch(childn, seq, i + 1)
+        return None
+
+    def SimpleLoopMatch(self, logClustL, seq):
+        token_set = set(seq)
+        for logClust in logClustL:
+            if float(len(logClust.logTemplate)) < 0.5 * len(seq):
+                continue
+            if all(
+                token in token_set or token == "<*>" for token in logClust.logTemplate
+            ):
+                return logClust
+        return None
+
+    def LCSMatch(self, logClustL, seq):
+        maxLen = -1
+        maxClust = None
+        set_seq = set(seq)
+        for logClust in logClustL:
+            if len(set_seq & set(logClust.logTemplate)) < 0.5 * len(seq):
+                continue
+            lcs = self.LCS(seq, logClust.logTemplate)
+            if len(lcs) > maxLen or (
+                len(lcs) == maxLen
+                and len(logClust.logTemplate) < len(maxClust.logTemplate)
+            ):
+                maxLen = len(lcs)
+                maxClust = logClust
+        if float(maxLen) >= self.tau * len(seq):
+            return maxClust
+        return None
+
+
+class TestSpell(TempDirTestCase):
+    def spell(self, dataset, LogParser=Spell.LogParser, **kwargs):
+        """Parse a dataset with Spell and return the parser"""
+        setting = DATASETS[dataset]
+        parser = LogParser(
+            indir=os.path.dirname(log_path(dataset)),
+            outdir=os.path.join(self.tmpdir, "result"),
+            log_format=setting["log_format"],
+            rex=setting["regex"],
+            keep_para=False,
+            **kwargs
+        )
+        with quiet():
+            parser.parse(dataset + "_2k.log")
+        return parser
+
+    def messages(self, dataset):
+        """Masked and tokenized contents of a dataset, as Spell parses them"""
+        setting = DATASETS[dataset]
+        contents = load(log_path(dataset), setting["log_format"])["Content"]
+        return Spell.Spell.tokenize_messages(setting["regex"], contents)
+
+    def test_bit_parallel_lcs_length_equals_lcs(self):
+        parser = Spell.LogParser()
+        pairs = []
+        for dataset in DATASETS:
+            messages = self.messages(dataset)
+            pairs += zip(messages[:200], messages[1:201])
+            pairs += zip(messages[:200:7], messages[1000:1200:7])
+        random = np.random.RandomState(0)
+        for size in [1, 10, 63, 64, 65, 200]:
+            seq1 = random.randint(0, 5, size).astype(str).tolist()
+            seq2 = random.randint(0, 5, random.randint(0, 2 * size)).astype(str)
+            pairs.append((seq1, seq2.tolist()))
+        pairs += [([], ["a"]), (["a"], []), ([], [])]
+        for seq1, seq2 in pairs:
+            self.assertEqual(
+                parser.LCSLength(parser.tokenMasks(seq1), len(seq1), seq2),
+                len(parser.LCS(seq1, seq2)),
+                (seq1, seq2),
+            )
+
+    def test_token_index_equals_full_scan(self):
+        for dataset in DATASETS:
+            for tau in [0.5, 0.8]:
+                expected = self.spell(dataset, ReferenceSpell, tau=tau)
+                parser = self.spell(dataset, tau=tau)
+                pd.testing.assert_frame_equal(parser.df_log, expected.df_log)
+
+    def test_prefix_tree_match_equals_recursive_match(self):
+        for dataset in DATASETS:
+            parser = self.spell(dataset)
+            reference = ReferenceSpell(tau=parser.tau)
+            messages = self.messages(dataset)
+            # Also try messages with their first or last constant token dropped
+            messages += [seq[1:] for seq in messages[::5]]
+            messages += [seq[:-1] for seq in messages[::5]]
+            for seq in messages:
+                constL = [w for w in seq if w != "<*>"]
+                self.assertIs(
+                    parser.PrefixTreeMatch(parser.rootNode, constL, 0),
+                    reference.PrefixTreeMatch(parser.rootNode, constL, 0),
+                )
+
+    def test_exact_sharded_parse_equals_serial(self):
+        for dataset in DATASETS:
+            expected = self.spell(dataset).df_log
+            parser = self.spell(dataset, n_workers=2)
+            pd.testing.assert_frame_equal(parser.df_log, expected)
+
+    def test_grouped_parse_matches_distinct_messages_once(self):
+        for dataset in DATASETS:
+            parser = self.spell(dataset, n_workers=3, exact=False)
+            logIDs = sorted(
+                logID for logClust in parser.logCluL for logID in logClust.logIDL
+            )
+            self.assertEqual(logIDs, list(range(1, 2001)))
+            # Lines of the same message are in one cluster
+            eventIds = {}
+            for message, eventId in zip(
+                self.messages(dataset), parser.df_log["EventId"]
+            ):
+                self.assertEqual(eventIds.setdefault(tuple(message), eventId), eventId)
+            self.assertEqual(
+                cluster_list(self.spell(dataset, n_workers=2, exact=False)),
+                cluster_list(parser),
+            )
+
+    def test_sharded_parse_of_no_lines(self):
+        with open(os.path.join(self.tmpdir, "empty.log"), "w"):
+            pass
+        with open(os.path.join(self.tmpdir, "skipped.log"), "w") as fout:
+            fout.write("x\n\n")
+        for logname in ["empty.log", "skipped.log"]:
+            for exact in [True, False]:
+                parser = Spell.LogParser(
+                    indir=self.tmpdir,
+                    outdir=os.path.join(self.tmpdir, "result"),
+                    log_format="<Date> <Time> <Content>",
+                    keep_para=False,
+                    n_workers=2,
+                    exact=exact,
+                )
+                with quiet():
+                    parser.parse(logname)
+                self.assertEqual(len(parser.df_log), 0)
+                self.assertEqual(parser.logCluL, [])
+
+
+def reference_frequency_vector(sentences, rex, delimiter):
+    """Brain's frequency vectors, counted word by word as before"""
+    group_len = {}
+    counts = {}
+    for line_id, s in enumerate(sentences):
+        for currentRex in rex:
+            s = re.sub(currentRex, "<*>", s)
+        for de in delimiter:
+            s = re.sub(de, "", s)
+        for de in [":", "=", "[", "]", "(", ")", "-", "|", ","]:
+            s = s.replace(de, de + " ")
+        s = [str(line_id)] + re.sub(" +", " ", s).split(" ")
+        for position, word in enumerate(s[1:]):
+            counts[(position, word)] = counts.get((position, word), 0) + 1
+        group_len.setdefault(len(s), []).append(s)
+    tuple_vector = {}
+    frequency_vector = {}
+    for key, logs in group_len.items():
+        for s in logs:
+            fre = [counts[(position, word)] for position, word in enumerate(s[1:])]
+            tuple_vector.setdefault(key, []).append(
+                list(zip(fre, s[1:], range(key - 1)))
+            )
+            frequency_vector.setdefault(key, []).append(fre)
+    return group_len, tuple_vector, frequency_vector
+
+
+class TestBrain(unittest.TestCase):
+    def test_frequency_vector_equals_word_counts(self):
+        from logparser.utils import runner
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            settings = runner.load_benchmark("Brain")[0]
+        for dataset, setting in settings.items():
+            sentences = pd.read_csv(
+                os.path.join(DATA_DIR, dataset, dataset + "_2k.log_structured.csv")
+            )["Content"].tolist()
+            parser = Brain.LogParser(dataset, setting["log_format"])
+            self.assertEqual(
+                parser.get_frequecy_vector(
+                    sentences, setting["regex"], setting["delimiter"], dataset
+                ),
+                reference_frequency_vector(
+                    sentences, setting["regex"], setting["delimiter"]
+                ),
+                dataset,
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()